@@ -0,0 +1,57 @@
+"""compact vector storage
+
+Revision ID: 9d5e2f8a1b47
+Revises: 7c4e1a9b2d36
+Create Date: 2026-10-17 16:42:08.331275
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '9d5e2f8a1b47'
+down_revision: Union[str, Sequence[str], None] = '7c4e1a9b2d36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _set_storage(storage: str) -> None:
+    """Convert chunks.embedding to storage, recreating chunks_embedding_idx with its opclass."""
+    bind = op.get_bind()
+    current = bind.execute(sa.text(
+        "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+        "WHERE attrelid = CAST('chunks' AS regclass) AND attname = 'embedding'"
+    )).scalar().split("(")[0]
+    if current == storage:
+        return
+    definition = bind.execute(sa.text(
+        "SELECT indexdef FROM pg_indexes WHERE tablename = 'chunks' AND indexname = 'chunks_embedding_idx'"
+    )).scalar()
+    op.execute("DROP INDEX IF EXISTS chunks_embedding_idx")
+    op.execute(f"ALTER TABLE chunks ALTER COLUMN embedding TYPE {storage}(768) USING embedding::{storage}(768)")
+    if definition:
+        op.execute(definition.replace(f"{current}_cosine_ops", f"{storage}_cosine_ops"))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # halfvec storage and the binary-quantized index need pgvector 0.7+ and
+    # are opt-in: alembic -x storage=halfvec -x binary_index=1 upgrade head
+    # (or later with `main.py index storage halfvec` / `main.py index rebuild-binary`)
+    args = context.get_x_argument(as_dictionary=True)
+    if args.get('storage', 'vector') == 'halfvec':
+        _set_storage('halfvec')
+    if args.get('binary_index') == '1':
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS chunks_embedding_bq_idx ON chunks "
+            "USING hnsw ((binary_quantize(embedding)::bit(768)) bit_hamming_ops) "
+            "WITH (m = 16, ef_construction = 64)"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS chunks_embedding_bq_idx")
+    _set_storage('vector')
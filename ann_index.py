@@ -0,0 +1,262 @@
+from db import get_engine
+from sqlalchemy import text
+from typing import Dict, Optional, Tuple
+import math
+import re
+
+EMBEDDING_INDEX = "chunks_embedding_idx"
+# HNSW index over binary_quantize(embedding) for the Hamming-distance first pass
+BINARY_INDEX = "chunks_embedding_bq_idx"
+STORAGE_TYPES = ("vector", "halfvec")
+# pgvector release that added hnsw.iterative_scan and ivfflat.iterative_scan
+ITERATIVE_SCAN_VERSION = (0, 8)
+
+def choose_ivfflat_lists(row_count: int) -> int:
+    """
+    Pick the number of ivfflat lists for a table size, following pgvector's
+    guidance: rows / 1000 up to a million rows, sqrt(rows) beyond that.
+
+    Args:
+        row_count: Number of rows with an embedding
+
+    Returns:
+        Number of lists (at least 1)
+    """
+    if row_count <= 1_000_000:
+        return max(1, row_count // 1000)
+    return int(math.sqrt(row_count))
+
+def build_index_sql(
+    method: str,
+    name: str = EMBEDDING_INDEX,
+    lists: int = 100,
+    m: int = 16,
+    ef_construction: int = 64,
+    concurrently: bool = False,
+    storage: str = "vector"
+) -> str:
+    """
+    Build the CREATE INDEX statement for the chunk embedding index.
+
+    Args:
+        method: "ivfflat" or "hnsw"
+        name: Index name
+        lists: ivfflat lists
+        m: HNSW connections per node
+        ef_construction: HNSW candidate list size while building
+        concurrently: Build without blocking writes
+        storage: Column type of the embedding ("vector" or "halfvec")
+
+    Returns:
+        SQL statement
+    """
+    if method == "ivfflat":
+        options = f"lists = {int(lists)}"
+    elif method == "hnsw":
+        options = f"m = {int(m)}, ef_construction = {int(ef_construction)}"
+    else:
+        raise ValueError(f"Unknown index method: {method}")
+    return (
+        f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}{name} ON chunks "
+        f"USING {method} (embedding {storage}_cosine_ops) WITH ({options})"
+    )
+
+def build_binary_index_sql(dimension: int, m: int = 16, ef_construction: int = 64) -> str:
+    """
+    Build the CREATE INDEX statement for the binary-quantized expression
+    index (one bit per dimension, compared by Hamming distance).
+
+    Args:
+        dimension: Embedding dimension
+        m: HNSW connections per node
+        ef_construction: HNSW candidate list size while building
+
+    Returns:
+        SQL statement
+    """
+    return (
+        f"CREATE INDEX {BINARY_INDEX} ON chunks "
+        f"USING hnsw ((binary_quantize(embedding)::bit({int(dimension)})) bit_hamming_ops) "
+        f"WITH (m = {int(m)}, ef_construction = {int(ef_construction)})"
+    )
+
+def embedding_storage(connection) -> str:
+    """Return the column type of chunks.embedding ("vector" or "halfvec")"""
+    column_type = connection.execute(text(
+        "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+        "WHERE attrelid = CAST('chunks' AS regclass) AND attname = 'embedding'"
+    )).scalar()
+    return column_type.split("(")[0]
+
+def pgvector_version(connection) -> Tuple[int, ...]:
+    """Return the installed pgvector version, e.g. (0, 8, 0), or () if it is not installed"""
+    version = connection.execute(text(
+        "SELECT extversion FROM pg_extension WHERE extname = 'vector'"
+    )).scalar()
+    return tuple(int(part) for part in re.findall(r"\d+", version or ""))
+
+def set_embedding_storage(connection, storage: str, dimension: int) -> bool:
+    """
+    Convert chunks.embedding between full (vector) and half (halfvec)
+    precision in place. The embedding indexes are dropped and recreated with
+    the same method and options, switching their operator class.
+
+    Args:
+        connection: Connection inside the transaction to run in
+        storage: "vector" or "halfvec"
+        dimension: Embedding dimension
+
+    Returns:
+        False if the column already had that type, True if it was converted
+    """
+    if storage not in STORAGE_TYPES:
+        raise ValueError(f"Unknown embedding storage: {storage}")
+    current = embedding_storage(connection)
+    if current == storage:
+        return False
+
+    indexes = connection.execute(text(
+        "SELECT indexname, indexdef FROM pg_indexes "
+        "WHERE tablename = 'chunks' AND indexname IN (:embedding_index, :binary_index)"
+    ), {"embedding_index": EMBEDDING_INDEX, "binary_index": BINARY_INDEX}).all()
+    for name, _ in indexes:
+        connection.execute(text(f"DROP INDEX {name}"))
+    connection.execute(text(
+        f"ALTER TABLE chunks ALTER COLUMN embedding TYPE {storage}({int(dimension)}) "
+        f"USING embedding::{storage}({int(dimension)})"
+    ))
+    for _, definition in indexes:
+        connection.execute(text(re.sub(rf"\b{current}_(cosine|l2|ip)_ops\b", rf"{storage}_\1_ops", definition)))
+    return True
+
+def rebuild_embedding_index(
+    db_url: str,
+    method: str = "ivfflat",
+    lists: int = None,
+    m: int = 16,
+    ef_construction: int = 64,
+    maintenance_work_mem: str = None,
+    concurrently: bool = False
+) -> Dict:
+    """
+    Drop and recreate the chunk embedding index, typically after a bulk load
+    so ivfflat centroids are trained on the real data.
+
+    With concurrently=True the new index is built next to the old one and
+    swapped in, so searches keep using an index throughout.
+
+    Args:
+        db_url: SQLAlchemy database URL
+        method: "ivfflat" or "hnsw"
+        lists: ivfflat lists (chosen from the row count when omitted)
+        m: HNSW connections per node
+        ef_construction: HNSW candidate list size while building
+        maintenance_work_mem: Memory for the build, e.g. "2GB" (server default when omitted)
+        concurrently: Build without blocking writes
+
+    Returns:
+        Dictionary with the row count and the index definition
+    """
+    engine = get_engine(db_url)
+    with engine.connect() as connection:
+        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+        rows = connection.execute(text("SELECT count(*) FROM chunks WHERE embedding IS NOT NULL")).scalar()
+        storage = embedding_storage(connection)
+        if method == "ivfflat" and not lists:
+            lists = choose_ivfflat_lists(rows)
+        if maintenance_work_mem:
+            connection.execute(text("SELECT set_config('maintenance_work_mem', :value, false)"),
+                               {"value": maintenance_work_mem})
+
+        if concurrently:
+            staging = f"{EMBEDDING_INDEX}_new"
+            connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {staging}"))
+            connection.execute(text(build_index_sql(
+                method, staging, lists, m, ef_construction, concurrently=True, storage=storage)))
+            connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {EMBEDDING_INDEX}"))
+            connection.execute(text(f"ALTER INDEX {staging} RENAME TO {EMBEDDING_INDEX}"))
+        else:
+            connection.execute(text(f"DROP INDEX IF EXISTS {EMBEDDING_INDEX}"))
+            connection.execute(text(build_index_sql(
+                method, EMBEDDING_INDEX, lists, m, ef_construction, storage=storage)))
+
+        if maintenance_work_mem:
+            connection.execute(text("RESET maintenance_work_mem"))
+        connection.execute(text("ANALYZE chunks"))
+
+    info = describe_embedding_index(db_url)
+    info['rows'] = rows
+    return info
+
+def rebuild_binary_index(db_url: str, dimension: int, m: int = 16, ef_construction: int = 64) -> Dict:
+    """
+    Drop and recreate the binary-quantized index used by the "binary" search mode.
+
+    Args:
+        db_url: SQLAlchemy database URL
+        dimension: Embedding dimension
+        m: HNSW connections per node
+        ef_construction: HNSW candidate list size while building
+
+    Returns:
+        Dictionary with the index definition and size
+    """
+    with get_engine(db_url).begin() as connection:
+        connection.execute(text(f"DROP INDEX IF EXISTS {BINARY_INDEX}"))
+        connection.execute(text(build_binary_index_sql(dimension, m, ef_construction)))
+    return describe_embedding_index(db_url, BINARY_INDEX)
+
+def describe_embedding_index(db_url: str, name: str = EMBEDDING_INDEX) -> Optional[Dict]:
+    """
+    Describe a chunk embedding index.
+
+    Args:
+        db_url: SQLAlchemy database URL
+        name: Index name
+
+    Returns:
+        Dictionary with the index definition and size, or None if it does not exist
+    """
+    with get_engine(db_url).connect() as connection:
+        row = connection.execute(text(
+            "SELECT indexdef, pg_size_pretty(pg_relation_size(CAST(indexname AS regclass))) AS size "
+            "FROM pg_indexes WHERE tablename = 'chunks' AND indexname = :name"
+        ), {"name": name}).mappings().first()
+    if row is None:
+        return None
+    return {'definition': row['indexdef'], 'size': row['size']}
+
+def ann_settings_statement(probes: int = 0, ef_search: int = 0, iterative_scan: str = None) -> Optional[Tuple]:
+    """
+    Build a statement that sets the per-query ANN search parameters for the
+    current transaction only (the equivalent of SET LOCAL). Zero or None
+    leaves the server default in place.
+
+    Args:
+        probes: ivfflat.probes, the number of lists scanned
+        ef_search: hnsw.ef_search, the candidate list size while searching
+        iterative_scan: "relaxed_order", "strict_order" or "off"; ivfflat only
+            supports relaxed_order, which it uses for either mode. Only pass it
+            on pgvector 0.8+: older versions reserve the hnsw and ivfflat
+            prefixes and reject the unknown setting
+
+    Returns:
+        (statement, params) tuple, or None when nothing needs setting
+    """
+    settings = {}
+    if probes:
+        settings['ivfflat.probes'] = str(int(probes))
+    if ef_search:
+        settings['hnsw.ef_search'] = str(int(ef_search))
+    if iterative_scan:
+        settings['hnsw.iterative_scan'] = iterative_scan
+        settings['ivfflat.iterative_scan'] = "off" if iterative_scan == "off" else "relaxed_order"
+    if not settings:
+        return None
+
+    calls = ", ".join(f"set_config(:name_{i}, :value_{i}, true)" for i in range(len(settings)))
+    params = {}
+    for i, (name, value) in enumerate(settings.items()):
+        params[f"name_{i}"] = name
+        params[f"value_{i}"] = value
+    return text(f"SELECT {calls}"), params
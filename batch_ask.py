@@ -0,0 +1,147 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from scheduler import BULK
+from typing import Dict, Iterator, List, Set, Tuple
+import json
+import os
+
+def read_questions(path: str) -> Iterator[Tuple[str, Dict]]:
+    """
+    Read questions from a JSONL file, one {"id": ..., "question": ...} object
+    per line. Lines without an id are identified by their line number.
+
+    Args:
+        path: Path of the questions file
+
+    Yields:
+        (question_id, record) tuples
+    """
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not record.get('question'):
+                raise ValueError(f"{path}:{line_number}: missing \"question\"")
+            yield str(record.get('id', line_number)), record
+
+def completed_ids(path: str) -> Set[str]:
+    """
+    Return the ids already answered in an output file. A line left half
+    written by a crash is truncated away so appending can resume cleanly.
+
+    Args:
+        path: Path of the answers file
+
+    Returns:
+        Set of question ids
+    """
+    if not os.path.exists(path):
+        return set()
+
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+    return {str(json.loads(line)['id']) for line in data[:end].splitlines() if line.strip()}
+
+class BatchAsker:
+    """
+    Answers a file of questions and streams the results to a JSONL file.
+
+    Questions are taken in batches: each batch is embedded in batched API
+    calls and searched together (on one pooled database connection with the
+    Postgres backend), then answered with
+    at most `concurrency` LLM requests in flight. The next batch is searched
+    while the previous one is still being answered. Every answer is appended
+    and flushed as soon as it is ready, so an interrupted run picks up where
+    it left off.
+    """
+
+    def __init__(
+        self,
+        rag,
+        batch_size: int = 100,
+        concurrency: int = 8,
+        top_k: int = 5,
+        mode: str = None,
+        filters: Dict = None
+    ):
+        self.rag = rag
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.top_k = top_k
+        self.mode = mode
+        self.filters = filters
+
+    def _answer(self, question_id: str, record: Dict, contexts: List[Dict]) -> Dict:
+        # Batch answers yield to interactive queries sharing the quota
+        answer = self.rag.ask_llm(record['question'], contexts, priority=BULK)
+        return {
+            **record,
+            'id': record.get('id', question_id),
+            'answer': answer,
+            'contexts': [
+                {key: c[key] for key in ('id', 'chunk_index', 'chunk_hash', 'similarity', 'score') if key in c}
+                for c in contexts
+            ]
+        }
+
+    def run(self, input_path: str, output_path: str) -> Dict[str, int]:
+        """
+        Answer every question in input_path not already in output_path.
+
+        Args:
+            input_path: JSONL file of questions
+            output_path: JSONL file the answers are appended to
+
+        Returns:
+            Dictionary of counters (answered, skipped, failed)
+        """
+        done = completed_ids(output_path)
+        stats = {'answered': 0, 'skipped': 0, 'failed': 0}
+
+        def batches():
+            batch = []
+            for question_id, record in read_questions(input_path):
+                if question_id in done:
+                    stats['skipped'] += 1
+                    continue
+                batch.append((question_id, record))
+                if len(batch) == self.batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+        with open(output_path, "a", encoding="utf-8") as out, \
+                ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            pending = {}
+
+            def drain(keep: int):
+                while len(pending) > keep:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        question_id = pending.pop(future)
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            print(f"Question {question_id} failed: {e}")
+                            stats['failed'] += 1
+                            continue
+                        out.write(json.dumps(result, default=str) + "\n")
+                        out.flush()
+                        stats['answered'] += 1
+
+            for batch in batches():
+                questions = [record['question'] for _, record in batch]
+                all_contexts = self.rag.search_similar_many(
+                    questions, self.top_k, self.mode, filters=self.filters)
+                for (question_id, record), contexts in zip(batch, all_contexts):
+                    pending[executor.submit(self._answer, question_id, record, contexts)] = question_id
+                # Keep at most one batch answering while the next is searched
+                drain(keep=self.batch_size)
+                print(f"{stats['answered']} answered, {stats['failed']} failed, {stats['skipped']} already done.")
+            drain(keep=0)
+
+        return stats
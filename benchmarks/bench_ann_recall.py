@@ -0,0 +1,110 @@
+"""
+Recall-vs-latency of the chunk embedding index against exact search.
+
+Synthetic embeddings with a low intrinsic dimension (like real text
+embeddings) are loaded under a temporary "benchmark-ann"
+document (removed afterwards). For each index configuration the index is
+rebuilt and every probes / ef_search value is timed; recall@k is measured
+against an exact sequential scan.
+
+Usage:
+    DATABASE_URL=postgresql+psycopg://... python -m benchmarks.bench_ann_recall --rows 100000
+"""
+import time
+
+import click
+import numpy as np
+from sqlalchemy import select, text
+
+from ann_index import ann_settings_statement, rebuild_embedding_index
+from config import Config
+from db import DBSession
+from models.chunk import Chunk
+
+
+def make_embeddings(count: int, dimension: int, latent: int = 32, seed: int = 0) -> np.ndarray:
+    projection = np.random.default_rng(0).standard_normal((latent, dimension)).astype(np.float32)
+    rng = np.random.default_rng(seed)
+    points = rng.standard_normal((count, latent)).astype(np.float32) @ projection
+    return points + 0.1 * rng.standard_normal((count, dimension)).astype(np.float32)
+
+
+def seed_rows(db_url: str, embeddings: np.ndarray) -> int:
+    with DBSession(db_url, write_method="copy") as session:
+        document = session.upsert_document("benchmark-ann", "0" * 64, {})
+        session.commit()
+        session.bulk_load_chunks({
+            "document_id": document.id,
+            "chunk_index": i,
+            "original_text": f"chunk {i}",
+            "context": "",
+            "contextualized_text": f"chunk {i}",
+            "chunk_hash": f"{i:064x}",
+            "embedding": embedding,
+            "meta": {}
+        } for i, embedding in enumerate(embeddings))
+        return document.id
+
+
+def nearest(session, query, top_k: int, settings=None, exact: bool = False):
+    if exact:
+        session.execute(text("SET LOCAL enable_indexscan = off"))
+    if settings is not None:
+        session.execute(*settings)
+    statement = select(Chunk.id).order_by(Chunk.embedding.cosine_distance(query)).limit(top_k)
+    ids = session.execute(statement).scalars().all()
+    session.commit()
+    return ids
+
+
+def measure(db_url: str, queries, truth, top_k: int, settings=None, exact: bool = False):
+    recalls, times = [], []
+    with DBSession(db_url) as session:
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            ids = nearest(session.session, query, top_k, settings, exact)
+            times.append(time.perf_counter() - start)
+            recalls.append(len(set(ids) & set(expected)) / len(expected))
+    return np.mean(recalls), np.percentile(times, 50) * 1000, np.percentile(times, 99) * 1000
+
+
+@click.command()
+@click.option('--rows', default=50000, help='Synthetic chunk rows to load.')
+@click.option('--queries', 'num_queries', default=100, help='Queries per setting.')
+@click.option('--top-k', default=10, help='Neighbours per query.')
+@click.option('--probes', default='1,5,10,20,40', help='ivfflat.probes values to try.')
+@click.option('--ef-search', default='10,40,100,200', help='hnsw.ef_search values to try.')
+def main(rows, num_queries, top_k, probes, ef_search):
+    config = Config()
+    db_url = config.DATABASE_URL
+    dimension = config.EMBEDDING_DIMENSION
+    embeddings = make_embeddings(rows, dimension)
+    queries = make_embeddings(num_queries, dimension, seed=1)
+
+    document_id = seed_rows(db_url, embeddings)
+    try:
+        with DBSession(db_url) as session:
+            truth = [nearest(session.session, q, top_k, exact=True) for q in queries]
+        _, exact_p50, exact_p99 = measure(db_url, queries, truth, top_k, exact=True)
+        print(f"{'exact (index off)':<28} recall 1.000  p50 {exact_p50:7.2f}ms  p99 {exact_p99:7.2f}ms")
+
+        configurations = [
+            ("ivfflat", {}, [("probes", int(p)) for p in probes.split(",")]),
+            ("hnsw", {"m": config.HNSW_M, "ef_construction": config.HNSW_EF_CONSTRUCTION},
+             [("ef_search", int(e)) for e in ef_search.split(",")]),
+        ]
+        for method, options, settings in configurations:
+            start = time.perf_counter()
+            info = rebuild_embedding_index(db_url, method=method, **options)
+            print(f"\n{method}: built in {time.perf_counter() - start:.1f}s, {info['size']}")
+            for name, value in settings:
+                recall, p50, p99 = measure(db_url, queries, truth, top_k, ann_settings_statement(**{name: value}))
+                print(f"  {f'{name}={value}':<26} recall {recall:.3f}  p50 {p50:7.2f}ms  p99 {p99:7.2f}ms")
+    finally:
+        with DBSession(db_url) as session:
+            session.session.execute(text("DELETE FROM documents WHERE id = :id"), {"id": document_id})
+        rebuild_embedding_index(db_url, method=config.ANN_INDEX_METHOD)
+
+
+if __name__ == "__main__":
+    main()
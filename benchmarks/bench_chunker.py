@@ -0,0 +1,92 @@
+"""
+Compare the old whitespace chunker (document.split() and rejoined word
+slices) with StreamingChunker on a synthetic multi-MB document.
+
+Reports throughput, and peak Python memory allocated while chunking
+(tracemalloc, measured in a separate run), for chunking the whole string and
+for streaming the same text as page-sized pieces, as PdfParser yields them.
+
+Usage:
+    python -m benchmarks.bench_chunker --mb 16
+"""
+import time
+import tracemalloc
+
+import click
+import numpy as np
+
+from chunker import StreamingChunker, iter_text_windows
+
+WORDS = (
+    "retrieval context embedding vector index query document chunk token "
+    "model latency throughput cache database search answer question page"
+).split()
+
+
+def make_pages(total_chars: int, page_chars: int = 3000, seed: int = 0):
+    """Yield pages of sentences and paragraphs until total_chars is reached"""
+    rng = np.random.default_rng(seed)
+    produced = 0
+    while produced < total_chars:
+        paragraphs = []
+        size = 0
+        while size < page_chars:
+            sentences = [
+                " ".join(rng.choice(WORDS, size=rng.integers(5, 30))).capitalize() + "."
+                for _ in range(rng.integers(1, 7))
+            ]
+            paragraphs.append(" ".join(sentences))
+            size += len(paragraphs[-1]) + 2
+        page = "\n\n".join(paragraphs) + "\n"
+        produced += len(page)
+        yield page
+
+
+def word_chunks(document: str, chunk_size: int, chunk_overlap: int):
+    """The previous chunk_document"""
+    chunks = []
+    words = document.split()
+    for i in range(0, len(words), chunk_size - chunk_overlap):
+        chunks.append({'text': ' '.join(words[i:i + chunk_size]), 'chunk_index': len(chunks)})
+    return chunks
+
+
+def measure(fn):
+    start = time.perf_counter()
+    count = fn()
+    elapsed = time.perf_counter() - start
+    # tracemalloc slows allocation down, so peak memory gets its own run
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, elapsed, peak
+
+
+@click.command()
+@click.option('--mb', default=8, help='Document size in MB.')
+@click.option('--max-tokens', default=800, help='StreamingChunker token budget.')
+@click.option('--overlap-tokens', default=100, help='StreamingChunker overlap budget.')
+@click.option('--chunk-words', default=800, help='Word chunker chunk size.')
+@click.option('--overlap-words', default=100, help='Word chunker overlap.')
+def main(mb, max_tokens, overlap_tokens, chunk_words, overlap_words):
+    total_chars = mb * 2**20
+    pages = list(make_pages(total_chars))
+    document = "".join(pages)
+    size_mb = len(document) / 2**20
+    chunker = StreamingChunker(max_tokens, overlap_tokens)
+
+    runs = {
+        "words (string)": lambda: len(word_chunks(document, chunk_words, overlap_words)),
+        "streaming (string)": lambda: sum(1 for _ in chunker.chunks(iter_text_windows(document))),
+        "streaming (pages)": lambda: sum(1 for _ in chunker.chunks(iter(pages))),
+    }
+    print(f"document: {size_mb:.1f} MB")
+    print(f"{'chunker':<20} {'chunks':>8} {'time':>8} {'MB/s':>8} {'peak mem':>10}")
+    for name, fn in runs.items():
+        count, elapsed, peak = measure(fn)
+        print(f"{name:<20} {count:8d} {elapsed:7.2f}s {size_mb / elapsed:8.1f} {peak / 2**20:9.1f}M")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Compare context generation strategies against a fake model:
+sequential per-chunk requests, concurrent per-chunk requests, and concurrent
+packed requests sharing one document prefix.
+
+Usage:
+    python -m benchmarks.bench_context --chunks 300 --latency 0.05 --concurrency 16 --pack 8
+"""
+import time
+
+import click
+
+from benchmarks.fakes import FakeGenerativeModel
+from text_chunk import GeminiContextualRetrieval
+
+
+def make_document(num_chunks: int, chunk_size: int) -> str:
+    words = [f"word{i % 997}" for i in range(num_chunks * chunk_size)]
+    return " ".join(words)
+
+
+def run(document: str, latency: float, concurrency: int, pack: int):
+    retriever = GeminiContextualRetrieval(
+        google_api_key="benchmark",
+        google_model="fake",
+        google_embedding_model="fake",
+        chunk_size=100,
+        chunk_overlap=0,
+        max_concurrency=concurrency,
+        chunks_per_request=pack)
+    model = FakeGenerativeModel(latency=latency)
+    retriever.gemini_model = model
+    
+    start = time.perf_counter()
+    chunks = retriever.process_document(document)
+    elapsed = time.perf_counter() - start
+    
+    assert [c['chunk_index'] for c in chunks] == list(range(len(chunks)))
+    assert all(c['context'] for c in chunks)
+    return elapsed, model
+
+
+@click.command()
+@click.option('--chunks', default=300, help='Number of chunks in the synthetic document.')
+@click.option('--latency', default=0.05, help='Injected latency per LLM call, in seconds.')
+@click.option('--concurrency', default=16, help='Max in-flight requests for the concurrent runs.')
+@click.option('--pack', default=8, help='Chunks per request for the packed run.')
+def main(chunks, latency, concurrency, pack):
+    document = make_document(chunks, 100)
+    results = [
+        ("sequential", *run(document, latency, 1, 1)),
+        ("concurrent", *run(document, latency, concurrency, 1)),
+        ("packed", *run(document, latency, concurrency, pack)),
+    ]
+    baseline = results[0][1]
+    for name, elapsed, model in results:
+        print(f"{name:<11} {elapsed:7.2f}s  {model.calls:5d} calls  "
+              f"{model.input_chars:12,d} input chars  {baseline / elapsed:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
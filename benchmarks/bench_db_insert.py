@@ -0,0 +1,61 @@
+"""
+Compare ORM inserts with binary COPY for chunk rows against a local Postgres.
+
+Rows are attached to a temporary "benchmark" document and removed afterwards.
+
+Usage:
+    DATABASE_URL=postgresql+psycopg://... python -m benchmarks.bench_db_insert --rows 100000
+"""
+import time
+
+import click
+import numpy as np
+
+from config import Config
+from db import DBSession
+
+
+def make_rows(document_id: int, count: int, dimension: int):
+    rng = np.random.default_rng(0)
+    for i in range(count):
+        yield {
+            "document_id": document_id,
+            "chunk_index": i,
+            "original_text": f"original text {i} " * 20,
+            "context": f"context {i}",
+            "contextualized_text": f"context {i}\n\noriginal text {i} " * 20,
+            "chunk_hash": f"{i:064x}",
+            "embedding": rng.standard_normal(dimension).astype(np.float32),
+            "meta": {"source": "benchmark", "chunk": i}
+        }
+
+
+def run(db_url: str, method: str, count: int, batch_size: int, dimension: int) -> float:
+    with DBSession(db_url, write_method=method, copy_batch_size=batch_size) as session:
+        document = session.upsert_document(f"benchmark-{method}", "0" * 64, {})
+        session.commit()
+        rows = list(make_rows(document.id, count, dimension))
+        
+        start = time.perf_counter()
+        for i in range(0, count, batch_size):
+            session.store_chunks(rows[i:i + batch_size])
+            session.commit()
+        elapsed = time.perf_counter() - start
+        
+        session.session.delete(document)
+        session.commit()
+    return elapsed
+
+
+@click.command()
+@click.option('--rows', default=20000, help='Number of chunk rows to insert per method.')
+@click.option('--batch-size', default=5000, help='Rows per commit.')
+def main(rows, batch_size):
+    config = Config()
+    for method in ("orm", "copy"):
+        elapsed = run(config.DATABASE_URL, method, rows, batch_size, config.EMBEDDING_DIMENSION)
+        print(f"{method:<5} {elapsed:7.2f}s  {rows / elapsed:10,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
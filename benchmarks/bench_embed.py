@@ -0,0 +1,49 @@
+"""
+Compare one-request-per-text embedding with batched, concurrent embedding
+against a fake embed_content.
+
+Usage:
+    python -m benchmarks.bench_embed --texts 2000 --latency 0.02 --batch-size 100 --concurrency 4
+"""
+import time
+
+import click
+
+from benchmarks.fakes import FakeEmbedContent
+from embedder import BatchEmbedder
+
+
+def run(texts, latency: float, batch_size: int, concurrency: int, throttle_every: int):
+    fake = FakeEmbedContent(latency=latency, throttle_every=throttle_every)
+    embedder = BatchEmbedder(
+        model="fake",
+        batch_size=batch_size,
+        max_concurrency=concurrency,
+        initial_backoff=0.01,
+        embed_fn=fake)
+    
+    start = time.perf_counter()
+    embeddings = embedder.embed(texts)
+    elapsed = time.perf_counter() - start
+    
+    assert embeddings.shape == (len(texts), fake.dimension)
+    assert (embeddings[-1] == fake.vector(texts[-1])).all()
+    return elapsed, fake.calls
+
+
+@click.command()
+@click.option('--texts', 'num_texts', default=2000, help='Number of texts to embed.')
+@click.option('--latency', default=0.02, help='Injected latency per API call, in seconds.')
+@click.option('--batch-size', default=100, help='Texts per batched request.')
+@click.option('--concurrency', default=4, help='Concurrent batched requests.')
+@click.option('--throttle-every', default=7, help='Raise a rate-limit error every N calls (0 disables).')
+def main(num_texts, latency, batch_size, concurrency, throttle_every):
+    texts = [f"chunk {i} " + "lorem ipsum " * 50 for i in range(num_texts)]
+    single, single_calls = run(texts, latency, 1, 1, throttle_every)
+    batched, batched_calls = run(texts, latency, batch_size, concurrency, throttle_every)
+    print(f"per-text: {single:7.2f}s  {single_calls:6d} calls")
+    print(f"batched:  {batched:7.2f}s  {batched_calls:6d} calls  {single / batched:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark LexicalIndex build, load and query latency on a synthetic Zipfian
+corpus, and check its scores against rank_bm25.BM25Okapi.
+
+Usage:
+    python -m benchmarks.bench_lexical --docs 1000000 --parity-docs 20000
+"""
+import os
+import tempfile
+import time
+
+import click
+import numpy as np
+from rank_bm25 import BM25Okapi
+
+from lexical_index import LexicalIndex
+
+
+def make_corpus(num_docs: int, vocab_size: int, doc_length: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, vocab_size + 1)
+    weights /= weights.sum()
+    lengths = rng.integers(doc_length // 2, doc_length * 3 // 2, size=num_docs)
+    words = rng.choice(vocab_size, size=int(lengths.sum()), p=weights)
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    for i in range(num_docs):
+        yield [f"t{w}" for w in words[offsets[i]:offsets[i + 1]]]
+
+
+def percentile_ms(samples, q):
+    return np.percentile(samples, q) * 1000
+
+
+@click.command()
+@click.option('--docs', 'num_docs', default=100000, help='Documents in the latency corpus.')
+@click.option('--parity-docs', default=5000, help='Documents in the BM25Okapi parity corpus.')
+@click.option('--vocab', default=50000, help='Vocabulary size.')
+@click.option('--doc-length', default=60, help='Mean tokens per document.')
+@click.option('--queries', 'num_queries', default=200, help='Queries to time.')
+@click.option('--top-k', default=10, help='Results per query.')
+def main(num_docs, parity_docs, vocab, doc_length, num_queries, top_k):
+    queries = [list(q) for q in make_corpus(num_queries, vocab, 4, seed=2)]
+
+    corpus = list(make_corpus(parity_docs, vocab, doc_length))
+    reference = BM25Okapi(corpus)
+    index = LexicalIndex()
+    index.add_documents(range(parity_docs), corpus)
+    max_error = max(np.abs(reference.get_scores(q) - index.get_scores(q)).max() for q in queries[:50])
+    print(f"parity ({parity_docs:,} docs): max |score difference| = {max_error:.2e}")
+
+    reference_times = []
+    for q in queries[:50]:
+        start = time.perf_counter()
+        np.argsort(-reference.get_scores(q))[:top_k]
+        reference_times.append(time.perf_counter() - start)
+    print(f"BM25Okapi query ({parity_docs:,} docs): p50 {percentile_ms(reference_times, 50):.2f}ms")
+    del reference, corpus
+
+    start = time.perf_counter()
+    index = LexicalIndex(compact_threshold=num_docs + 1)
+    index.add_documents(range(num_docs), make_corpus(num_docs, vocab, doc_length))
+    index.compact()
+    print(f"build ({num_docs:,} docs): {time.perf_counter() - start:.1f}s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "index")
+        index.save(path)
+        start = time.perf_counter()
+        index = LexicalIndex.load(path)
+        print(f"load (mmap): {(time.perf_counter() - start) * 1000:.1f}ms")
+
+        for name, search in (
+                ("exhaustive", lambda q: np.argsort(-index.get_scores(q))[:top_k]),
+                ("max-score", lambda q: index.search(q, top_k))):
+            times = []
+            for q in queries:
+                start = time.perf_counter()
+                search(q)
+                times.append(time.perf_counter() - start)
+            print(f"{name:<10} query: p50 {percentile_ms(times, 50):7.2f}ms  p99 {percentile_ms(times, 99):7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
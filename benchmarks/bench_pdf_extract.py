@@ -0,0 +1,82 @@
+"""
+Compare serial PdfParser.read_pages_generator with the multi-process extractor.
+
+Without --pdf a synthetic text PDF is generated.
+
+Usage:
+    python -m benchmarks.bench_pdf_extract --pages 2000 --workers 8
+    python -m benchmarks.bench_pdf_extract --pdf manual.pdf
+"""
+import os
+import tempfile
+import time
+
+import click
+
+from pdf_parser import PdfParser
+
+
+def make_pdf(path: str, pages: int, lines_per_page: int = 40) -> None:
+    """Write a minimal PDF with one Helvetica text stream per page"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for p in range(pages):
+        lines = b"".join(
+            b"(Page %d line %d: the quick brown fox jumps over the lazy dog) Tj T* " % (p, i)
+            for i in range(lines_per_page)
+        )
+        stream = b"BT /F1 10 Tf 12 TL 40 760 Td " + lines + b"ET"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for i, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (i, body))
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+@click.command()
+@click.option('--pdf', 'pdf_path', type=click.Path(exists=True), help='PDF to extract (default: synthetic).')
+@click.option('--pages', default=500, help='Pages in the synthetic PDF.')
+@click.option('--workers', default=os.cpu_count(), help='Worker processes for the parallel run.')
+@click.option('--pages-per-shard', default=16, help='Pages per worker task.')
+def main(pdf_path, pages, workers, pages_per_shard):
+    with tempfile.TemporaryDirectory() as tmp:
+        if pdf_path is None:
+            pdf_path = os.path.join(tmp, "synthetic.pdf")
+            make_pdf(pdf_path, pages)
+        parser = PdfParser(pdf_path)
+
+        start = time.perf_counter()
+        serial = list(parser.read_pages_generator())
+        serial_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        parallel = list(parser.read_pages_parallel(workers=workers, pages_per_shard=pages_per_shard))
+        parallel_time = time.perf_counter() - start
+
+    assert parallel == serial
+    print(f"serial:   {serial_time:7.2f}s  {len(serial) / serial_time:8.1f} pages/s")
+    print(f"parallel: {parallel_time:7.2f}s  {len(parallel) / parallel_time:8.1f} pages/s "
+          f"({workers} workers, {serial_time / parallel_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Measure how queue ingestion scales with the number of worker processes,
+against a local Postgres (DATABASE_URL, migrated to head) and fake Gemini
+clients.
+
+For each worker count, a job of synthetic documents is queued and that many
+`QueueWorker` processes drain it; each worker runs its own pipeline with the
+fakes' per-call latency standing in for the API. Timing starts once every
+worker has started up, so interpreter start-up is not measured. Documents,
+chunks and the job are removed afterwards.
+
+Usage:
+    DATABASE_URL=postgresql+psycopg://... python -m benchmarks.bench_queue --workers 1,2,4,8 --docs 128
+"""
+import contextlib
+import io
+import multiprocessing
+import time
+
+import click
+from sqlalchemy import text
+
+from config import Config
+from db import DBSession
+
+WORDS = "queue worker lease claim retry document chunk context embedding database".split()
+
+
+def make_document(index: int, chunks: int) -> str:
+    """`chunks` paragraphs of about 700 tokens (one chunk each), unique to the document"""
+    sentence = " ".join(WORDS) + f" document {index}."
+    paragraph = " ".join([sentence] * 30)
+    return "\n\n".join(f"{paragraph} Paragraph {i}." for i in range(chunks))
+
+
+def run_worker(ready, start, latency: float, concurrency: int, batch_size: int) -> None:
+    from benchmarks.fakes import FakeEmbedContent, FakeGenerativeModel
+    from rag import RAG
+    from worker import QueueWorker
+    Config.GEMINI_API_KEY = "benchmark"
+    Config.CACHE_PATH = ""
+    Config.CONTEXT_CONCURRENCY = concurrency
+    with contextlib.redirect_stdout(io.StringIO()):
+        rag = RAG(Config())
+        rag.preprocessor.gemini_model = FakeGenerativeModel(latency=latency)
+        rag.preprocessor.embedder.embed_fn = FakeEmbedContent(latency=latency)
+        ready.release()
+        start.wait()
+        QueueWorker(rag, batch_size=batch_size, poll_seconds=0.1).run(exit_when_empty=True)
+
+
+def run(workers: int, docs: int, chunks: int, latency: float, concurrency: int, batch_size: int) -> float:
+    config = Config()
+    prefix = f"bench-queue-{workers}-"
+    with DBSession(config.DATABASE_URL) as session:
+        job_id = session.create_job("queue", {'benchmark': True}).id
+        session.enqueue_tasks(job_id, (
+            (f"{prefix}{i}", {'text': make_document(i, chunks), 'metadata': {}})
+            for i in range(docs)
+        ))
+        session.commit()
+
+    try:
+        context = multiprocessing.get_context("spawn")
+        ready = context.Semaphore(0)
+        go = context.Event()
+        processes = [
+            context.Process(target=run_worker, args=(ready, go, latency, concurrency, batch_size))
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        for _ in processes:
+            ready.acquire()
+        start = time.perf_counter()
+        go.set()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+        with DBSession(config.DATABASE_URL) as session:
+            counts = session.queue_counts(job_id)
+        assert counts == {'done': docs}, counts
+        return elapsed
+    finally:
+        with DBSession(config.DATABASE_URL) as session:
+            session.session.execute(text("DELETE FROM documents WHERE source LIKE :prefix"), {'prefix': prefix + "%"})
+            session.session.execute(text("DELETE FROM ingestion_jobs WHERE id = :id"), {'id': job_id})
+            session.commit()
+
+
+@click.command()
+@click.option('--workers', default="1,2,4,8", help='Comma-separated worker process counts.')
+@click.option('--docs', default=128, help='Documents queued per run.')
+@click.option('--chunks', default=8, help='Chunks per document.')
+@click.option('--latency', default=0.2, help='Injected latency per API call, in seconds.')
+@click.option('--concurrency', default=2, help='Context requests in flight per worker.')
+@click.option('--batch-size', default=4, help='Documents claimed at a time.')
+def main(workers, docs, chunks, latency, concurrency, batch_size):
+    print(f"{'workers':>7} {'time':>8} {'docs/s':>8} {'speedup':>8} {'efficiency':>10}")
+    base = None
+    for count in (int(value) for value in workers.split(",")):
+        elapsed = run(count, docs, chunks, latency, concurrency, batch_size)
+        rate = docs / elapsed
+        base = base or rate
+        print(f"{count:7d} {elapsed:7.2f}s {rate:8.1f} {rate / base:7.2f}x {rate / base / count:9.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Drive a rate-limited fake model with bulk traffic from many threads, with
+and without RateLimitScheduler, while interactive requests arrive on the
+side.
+
+The unscheduled run is the previous behaviour: every thread calls the API
+directly and retries on its own with exponential backoff. Reports quota
+utilization (requests served / quota for the elapsed time), throttled
+requests and interactive latency.
+
+Usage:
+    python -m benchmarks.bench_scheduler --rpm 300 --window 5 --seconds 15 --threads 32
+"""
+import random
+import statistics
+import threading
+import time
+
+import click
+
+from benchmarks.fakes import FakeGenerativeModel
+from embedder import RETRYABLE_ERRORS
+from scheduler import BULK, INTERACTIVE, RateLimitScheduler
+
+
+def call_with_backoff(fn, *args, max_retries: int = 6, initial_backoff: float = 0.05, **kwargs):
+    for attempt in range(max_retries + 1):
+        try:
+            return fn(*args, **kwargs)
+        except RETRYABLE_ERRORS:
+            if attempt == max_retries:
+                raise
+            time.sleep(initial_backoff * 2 ** attempt * random.uniform(0.5, 1.0))
+
+
+def run(scheduled: bool, rpm: int, window: float, seconds: float, threads: int, latency: float, interactive_every: float):
+    model = FakeGenerativeModel(latency=latency, rpm=rpm, window=window)
+    scheduler = RateLimitScheduler(
+        "bench", rpm=rpm, max_concurrency=threads, initial_backoff=0.05,
+        retryable=RETRYABLE_ERRORS, window=window)
+    deadline = time.monotonic() + seconds
+    served = []
+    failed = []
+    interactive = []
+
+    def request(priority: str):
+        if scheduled:
+            scheduler.call(model.generate_content, "prompt", tokens=2, priority=priority)
+        else:
+            call_with_backoff(model.generate_content, "prompt")
+
+    def bulk():
+        while time.monotonic() < deadline:
+            try:
+                request(BULK)
+                served.append(1)
+            except RETRYABLE_ERRORS:
+                failed.append(1)
+
+    def interactive_user():
+        while time.monotonic() < deadline:
+            time.sleep(interactive_every)
+            start = time.perf_counter()
+            try:
+                request(INTERACTIVE)
+                served.append(1)
+                interactive.append(time.perf_counter() - start)
+            except RETRYABLE_ERRORS:
+                failed.append(1)
+
+    workers = [threading.Thread(target=bulk) for _ in range(threads)]
+    workers.append(threading.Thread(target=interactive_user))
+    start = time.monotonic()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.monotonic() - start
+    quota = rpm * elapsed / window
+    return {
+        'utilization': len(served) / quota,
+        'throttled': model.rate_limit.rejected,
+        'failed': len(failed),
+        'interactive_p50': statistics.median(interactive) if interactive else float("nan"),
+        'interactive_max': max(interactive, default=float("nan")),
+    }
+
+
+@click.command()
+@click.option('--rpm', default=300, help='Fake requests quota per window.')
+@click.option('--window', default=5.0, help='Quota window in seconds (60 for a real per-minute quota).')
+@click.option('--seconds', default=15.0, help='Duration of each run.')
+@click.option('--threads', default=32, help='Bulk threads.')
+@click.option('--latency', default=0.05, help='Injected latency per API call, in seconds.')
+@click.option('--interactive-every', default=0.5, help='Seconds between interactive requests.')
+def main(rpm, window, seconds, threads, latency, interactive_every):
+    print(f"{'mode':<12} {'utilization':>11} {'throttled':>9} {'failed':>6} {'interactive p50':>15} {'max':>7}")
+    for name, scheduled in (("unscheduled", False), ("scheduled", True)):
+        result = run(scheduled, rpm, window, seconds, threads, latency, interactive_every)
+        print(f"{name:<12} {result['utilization']:10.1%} {result['throttled']:9d} {result['failed']:6d} "
+              f"{result['interactive_p50']:14.3f}s {result['interactive_max']:6.3f}s")
+
+
+if __name__ == "__main__":
+    main()
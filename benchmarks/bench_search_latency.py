@@ -0,0 +1,54 @@
+"""
+Measure back-to-back search_similar latency with a fresh engine per query
+(the old behaviour) and with the shared, pooled engine.
+
+Query embeddings come from a fake embedder, so only database time is measured.
+
+Usage:
+    DATABASE_URL=postgresql+psycopg://... python -m benchmarks.bench_search_latency --queries 500
+"""
+import time
+
+import click
+import numpy as np
+
+from benchmarks.fakes import FakeEmbedContent, FakeGenerativeModel
+from config import Config
+from db import dispose_engines
+from rag import RAG
+
+
+def make_rag() -> RAG:
+    config = Config()
+    config.GEMINI_API_KEY = config.GEMINI_API_KEY or "benchmark"
+    config.CACHE_PATH = ""
+    rag = RAG(config)
+    rag.preprocessor.gemini_model = FakeGenerativeModel(latency=0)
+    rag.preprocessor.embedder.embed_fn = FakeEmbedContent(dimension=config.EMBEDDING_DIMENSION, latency=0)
+    return rag
+
+
+def run(rag: RAG, queries, mode: str, fresh_engine: bool):
+    times = []
+    for query in queries:
+        if fresh_engine:
+            dispose_engines()
+        start = time.perf_counter()
+        rag.search_similar(query, top_k=5, mode=mode)
+        times.append(time.perf_counter() - start)
+    return np.array(times) * 1000
+
+
+@click.command()
+@click.option('--queries', 'num_queries', default=500, help='Queries per configuration.')
+@click.option('--mode', type=click.Choice(['vector', 'hybrid']), default='vector')
+def main(num_queries, mode):
+    rag = make_rag()
+    queries = [f"question {i} about revenue growth" for i in range(num_queries)]
+    for name, fresh in (("fresh engine", True), ("pooled", False)):
+        times = run(rag, queries, mode, fresh)
+        print(f"{name:<13} p50 {np.percentile(times, 50):7.2f}ms  p99 {np.percentile(times, 99):7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark VectorIndex (the file retrieval backend) on synthetic, topic-clustered embeddings:
+build time, query latency and recall@k of IVF search against exact search.
+
+Usage:
+    python -m benchmarks.bench_vector_index --rows 100000
+"""
+import os
+import tempfile
+import time
+
+import click
+import numpy as np
+
+from vector_index import VectorIndex
+
+
+def make_embeddings(count: int, dimension: int, topics: int = 1000, seed: int = 0) -> np.ndarray:
+    """Topic-clustered embeddings: a shared topic direction plus per-item variation"""
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((topics, dimension)).astype(np.float32)
+    rng = np.random.default_rng(seed)
+    labels = rng.integers(0, topics, size=count)
+    return centers[labels] + 1.0 * rng.standard_normal((count, dimension)).astype(np.float32)
+
+
+def timed_search(index: VectorIndex, queries, top_k: int):
+    results, times = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append([doc_id for doc_id, _ in index.search(query, top_k)])
+        times.append(time.perf_counter() - start)
+    return results, np.array(times) * 1000
+
+
+@click.command()
+@click.option('--rows', default=100000, help='Embeddings in the index.')
+@click.option('--dimension', default=768, help='Embedding dimension.')
+@click.option('--queries', 'num_queries', default=200, help='Queries to time.')
+@click.option('--top-k', default=10, help='Results per query.')
+@click.option('--lists', default=0, help='IVF lists (0 = sqrt of the row count).')
+@click.option('--probes', default='1,4,8,16,32', help='IVF probes values to try.')
+def main(rows, dimension, num_queries, top_k, lists, probes):
+    embeddings = make_embeddings(rows, dimension)
+    queries = make_embeddings(num_queries, dimension, seed=1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        np.save(os.path.join(tmp, "embeddings.npy"), embeddings)
+        source = np.load(os.path.join(tmp, "embeddings.npy"), mmap_mode="r")
+
+        start = time.perf_counter()
+        exact = VectorIndex(source)
+        exact.save(os.path.join(tmp, "exact"))
+        print(f"exact: normalized and saved in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        ivf = VectorIndex(source)
+        ivf.build_ivf(lists or None)
+        ivf.save(os.path.join(tmp, "ivf"))
+        print(f"ivf:   {len(ivf.centroids)} lists built in {time.perf_counter() - start:.1f}s")
+
+        exact = VectorIndex.load(os.path.join(tmp, "exact"))
+        truth, times = timed_search(exact, queries, top_k)
+        print(f"\nexact              recall 1.000  p50 {np.percentile(times, 50):7.3f}ms  p99 {np.percentile(times, 99):7.3f}ms")
+
+        ivf = VectorIndex.load(os.path.join(tmp, "ivf"))
+        for value in probes.split(","):
+            ivf.probes = int(value)
+            results, times = timed_search(ivf, queries, top_k)
+            recall = np.mean([len(set(r) & set(t)) / top_k for r, t in zip(results, truth)])
+            print(f"ivf probes={int(value):<7} recall {recall:.3f}  p50 {np.percentile(times, 50):7.3f}ms  "
+                  f"p99 {np.percentile(times, 99):7.3f}ms")
+        del exact, ivf, source
+
+
+if __name__ == "__main__":
+    main()
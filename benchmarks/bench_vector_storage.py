@@ -0,0 +1,119 @@
+"""
+Compare embedding storage layouts: float32 vector with an HNSW index (the
+current schema), halfvec with an HNSW index, and a binary-quantized HNSW
+first pass re-ranked by exact cosine on the stored vectors.
+
+Each layout is loaded into its own scratch table (dropped afterwards) so the
+chunks table is untouched. Reports table and index size, recall@k against
+exact float32 search computed in numpy, and query latency. Requires
+pgvector 0.7+.
+
+Usage:
+    DATABASE_URL=postgresql+psycopg://... python -m benchmarks.bench_vector_storage --rows 100000
+"""
+import time
+
+import click
+import numpy as np
+from pgvector.psycopg import register_vector
+
+from benchmarks.bench_ann_recall import make_embeddings
+from config import Config
+from db import get_engine
+
+LAYOUTS = {
+    # name: (column type, index expression, probe query)
+    "vector + hnsw": (
+        "vector",
+        "USING hnsw (embedding vector_cosine_ops)",
+        "SELECT id FROM {table} ORDER BY embedding <=> %(q)s::vector({d}) LIMIT %(k)s"),
+    "halfvec + hnsw": (
+        "halfvec",
+        "USING hnsw (embedding halfvec_cosine_ops)",
+        "SELECT id FROM {table} ORDER BY embedding <=> %(q)s::halfvec({d}) LIMIT %(k)s"),
+    "halfvec + binary rerank": (
+        "halfvec",
+        "USING hnsw ((binary_quantize(embedding)::bit({d})) bit_hamming_ops)",
+        "SELECT id FROM ("
+        "  SELECT id, embedding FROM {table}"
+        "  ORDER BY binary_quantize(embedding)::bit({d}) <~> binary_quantize(%(q)s::vector({d}))"
+        "  LIMIT %(candidates)s"
+        ") candidates ORDER BY embedding <=> %(q)s::halfvec({d}) LIMIT %(k)s"),
+}
+
+
+def exact_neighbours(embeddings: np.ndarray, queries: np.ndarray, top_k: int) -> np.ndarray:
+    data = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    q = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    scores = q @ data.T
+    return np.argsort(-scores, axis=1)[:, :top_k]
+
+
+def load(connection, table: str, column_type: str, index: str, embeddings: np.ndarray) -> float:
+    dimension = embeddings.shape[1]
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute(f"CREATE TABLE {table} (id int PRIMARY KEY, embedding {column_type}({dimension}))")
+        with cursor.copy(f"COPY {table} (id, embedding) FROM STDIN (FORMAT BINARY)") as copy:
+            copy.set_types(["int4", column_type])
+            for i, embedding in enumerate(embeddings):
+                copy.write_row((i, embedding))
+        start = time.perf_counter()
+        cursor.execute(f"CREATE INDEX ON {table} {index.format(d=dimension)}")
+        cursor.execute(f"ANALYZE {table}")
+    connection.commit()
+    return time.perf_counter() - start
+
+
+def sizes(connection, table: str):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT pg_table_size('{table}'), pg_indexes_size('{table}')")
+        return cursor.fetchone()
+
+
+@click.command()
+@click.option('--rows', default=50000, help='Embeddings to load per layout.')
+@click.option('--queries', 'num_queries', default=100, help='Queries per layout.')
+@click.option('--top-k', default=10, help='Neighbours per query.')
+@click.option('--candidates', default=200, help='Binary first-pass candidates to re-rank.')
+@click.option('--ef-search', default=100, help='hnsw.ef_search for the float layouts.')
+def main(rows, num_queries, top_k, candidates, ef_search):
+    config = Config()
+    dimension = config.EMBEDDING_DIMENSION
+    embeddings = make_embeddings(rows, dimension)
+    queries = make_embeddings(num_queries, dimension, seed=1)
+    truth = exact_neighbours(embeddings, queries, top_k)
+
+    raw = get_engine(config.DATABASE_URL).raw_connection()
+    connection = raw.driver_connection
+    register_vector(connection)
+    try:
+        print(f"{'layout':<26} {'table':>9} {'index':>9} {'build':>7} {'recall':>7} {'p50':>8} {'p99':>8}")
+        for i, (name, (column_type, index, query_sql)) in enumerate(LAYOUTS.items()):
+            table = f"bench_storage_{i}"
+            build = load(connection, table, column_type, index, embeddings)
+            table_size, index_size = sizes(connection, table)
+
+            ef = candidates if "binary" in name else ef_search
+            recalls, times = [], []
+            with connection.cursor() as cursor:
+                cursor.execute(f"SET hnsw.ef_search = {int(ef)}")
+                for query, expected in zip(queries, truth):
+                    start = time.perf_counter()
+                    cursor.execute(query_sql.format(table=table, d=dimension),
+                                   {"q": query, "k": top_k, "candidates": candidates})
+                    ids = [row[0] for row in cursor.fetchall()]
+                    times.append(time.perf_counter() - start)
+                    recalls.append(len(set(ids) & set(expected.tolist())) / top_k)
+                cursor.execute(f"DROP TABLE {table}")
+            connection.commit()
+
+            print(f"{name:<26} {table_size / 2**20:8.1f}M {index_size / 2**20:8.1f}M {build:6.1f}s "
+                  f"{np.mean(recalls):7.3f} {np.percentile(times, 50) * 1000:6.2f}ms "
+                  f"{np.percentile(times, 99) * 1000:6.2f}ms")
+    finally:
+        raw.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import re
+import threading
+import time
+import zlib
+from collections import deque
+from dataclasses import dataclass
+
+import numpy as np
+from google.api_core import exceptions as google_exceptions
+
+
+@dataclass
+class FakeResponse:
+    text: str
+
+
+class FakeRateLimit:
+    """
+    Server-side quota of a fake API: at most `rpm` requests and `tpm`
+    estimated tokens (4 characters per token) in any `window`-second window.
+    Requests over quota raise TooManyRequests, like the real API's 429.
+    A limit of 0 disables it.
+    """
+    
+    def __init__(self, rpm: int = 0, tpm: int = 0, window: float = 60.0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = window
+        self.rejected = 0
+        self._requests = deque()   # (timestamp, tokens)
+        self._tokens = 0
+        self._lock = threading.Lock()
+    
+    def check(self, chars: int) -> None:
+        if not self.rpm and not self.tpm:
+            return
+        tokens = chars // 4 + 1
+        now = time.monotonic()
+        with self._lock:
+            while self._requests and self._requests[0][0] <= now - self.window:
+                self._tokens -= self._requests.popleft()[1]
+            if ((self.rpm and len(self._requests) >= self.rpm)
+                    or (self.tpm and self._tokens + tokens > self.tpm)):
+                self.rejected += 1
+                raise google_exceptions.TooManyRequests("fake rate limit")
+            self._requests.append((now, tokens))
+            self._tokens += tokens
+
+
+class FakeGenerativeModel:
+    """
+    Local stand-in for genai.GenerativeModel.
+    
+    Sleeps for `latency` seconds per call to simulate a network round trip and
+    returns a deterministic answer. Packed prompts containing several
+    <chunk id="N"> elements get one <context id="N"> element per chunk.
+    Optional rpm/tpm quotas reject calls over the limit (see FakeRateLimit).
+    """
+    
+    CHUNK_ID_PATTERN = re.compile(r'<chunk id="(\d+)">')
+    
+    def __init__(self, latency: float = 0.05, rpm: int = 0, tpm: int = 0, window: float = 60.0):
+        self.latency = latency
+        self.rate_limit = FakeRateLimit(rpm, tpm, window)
+        self.calls = 0
+        self.input_chars = 0
+    
+    def generate_content(self, prompt: str) -> FakeResponse:
+        self.calls += 1
+        self.input_chars += len(prompt)
+        time.sleep(self.latency)
+        self.rate_limit.check(len(prompt))
+        
+        chunk_ids = self.CHUNK_ID_PATTERN.findall(prompt)
+        if chunk_ids:
+            return FakeResponse(text="\n".join(
+                f'<context id="{i}">Context for chunk {i}.</context>' for i in chunk_ids
+            ))
+        return FakeResponse(text=f"Context for a prompt of {len(prompt)} characters.")
+
+
+class FakeEmbedContent:
+    """
+    Local stand-in for genai.embed_content.
+    
+    Returns deterministic unit vectors seeded from the text, sleeps `latency`
+    seconds per call and raises TooManyRequests on every `throttle_every`-th
+    call, or when over the optional rpm/tpm quotas, to exercise retry paths.
+    """
+    
+    def __init__(
+        self,
+        dimension: int = 768,
+        latency: float = 0.05,
+        throttle_every: int = 0,
+        rpm: int = 0,
+        tpm: int = 0,
+        window: float = 60.0
+    ):
+        self.dimension = dimension
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.rate_limit = FakeRateLimit(rpm, tpm, window)
+        self.calls = 0
+        self.texts = 0
+    
+    def vector(self, text: str):
+        rng = np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+        v = rng.standard_normal(self.dimension).astype(np.float32)
+        return v / np.linalg.norm(v)
+    
+    def __call__(self, model: str, content, task_type: str = None, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        if self.throttle_every and self.calls % self.throttle_every == 0:
+            raise google_exceptions.TooManyRequests("fake rate limit")
+        self.rate_limit.check(len(content) if isinstance(content, str) else sum(len(text) for text in content))
+        
+        if isinstance(content, str):
+            return {'embedding': self.vector(content).tolist()}
+        self.texts += len(content)
+        return {'embedding': [self.vector(text).tolist() for text in content]}
@@ -0,0 +1,93 @@
+"""
+Load test the query server.
+
+By default the server runs in-process with a fake LLM and a fake embedder
+(only the database is real), so the numbers reflect the server itself. Pass
+--url to drive an already running server instead.
+
+Usage:
+    DATABASE_URL=postgresql+psycopg://... python -m benchmarks.load_test --requests 2000 --concurrency 64
+    python -m benchmarks.load_test --url http://127.0.0.1:8080 --endpoint search
+"""
+import asyncio
+import time
+
+import aiohttp
+import click
+import numpy as np
+from aiohttp import web
+
+from benchmarks.fakes import FakeEmbedContent, FakeGenerativeModel
+from config import Config
+from rag import RAG
+from server import RAGServer
+
+
+async def start_fake_server(llm_latency: float, embed_latency: float):
+    config = Config()
+    config.GEMINI_API_KEY = config.GEMINI_API_KEY or "benchmark"
+    config.CACHE_PATH = ""
+    rag = RAG(config)
+    rag.preprocessor.gemini_model = FakeGenerativeModel(latency=llm_latency)
+    rag.preprocessor.embedder.embed_fn = FakeEmbedContent(dimension=config.EMBEDDING_DIMENSION, latency=embed_latency)
+
+    runner = web.AppRunner(RAGServer(rag).create_app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+async def drive(url: str, endpoint: str, total: int, concurrency: int):
+    field = "question" if endpoint == "ask" else "query"
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(i)
+
+    async def worker(session):
+        nonlocal errors
+        while not queue.empty():
+            i = queue.get_nowait()
+            start = time.perf_counter()
+            async with session.post(f"{url}/{endpoint}", json={field: f"question {i} about revenue"}) as response:
+                await response.read()
+                if response.status != 200:
+                    errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+    return time.perf_counter() - start, np.array(latencies) * 1000, errors
+
+
+async def run(url, endpoint, total, concurrency, llm_latency, embed_latency):
+    runner = None
+    if url is None:
+        runner, url = await start_fake_server(llm_latency, embed_latency)
+    try:
+        elapsed, latencies, errors = await drive(url, endpoint, total, concurrency)
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+    print(f"{total} /{endpoint} requests, concurrency {concurrency}: "
+          f"{total / elapsed:.0f} req/s, p50 {np.percentile(latencies, 50):.1f}ms, "
+          f"p99 {np.percentile(latencies, 99):.1f}ms, {errors} errors")
+
+
+@click.command()
+@click.option('--url', help='Target server (default: start one in-process with fake backends).')
+@click.option('--endpoint', type=click.Choice(['ask', 'search']), default='ask')
+@click.option('--requests', 'total', default=1000, help='Total requests.')
+@click.option('--concurrency', default=32, help='Concurrent clients.')
+@click.option('--llm-latency', default=0.2, help='Fake LLM latency in seconds.')
+@click.option('--embed-latency', default=0.02, help='Fake embedding latency in seconds.')
+def main(url, endpoint, total, concurrency, llm_latency, embed_latency):
+    asyncio.run(run(url, endpoint, total, concurrency, llm_latency, embed_latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+"""
+Offline benchmark suite: chunking, context generation, embedding, BM25
+build/query, DB insert and search_similar at several corpus sizes, with the
+fake Gemini clients from benchmarks.fakes (configurable latency and rpm/tpm
+quotas), so no API key is needed.
+
+Search runs against Postgres (--db postgres: a local scratch database from
+DATABASE_URL; rows are loaded with COPY, the ANN index is rebuilt and the
+rows are deleted afterwards) or against the in-process file backend
+(--db memory, the default: a temporary snapshot). The DB insert case needs
+Postgres.
+
+Results are written as JSON. Passing a previous result file as --baseline
+compares every metric with it and exits non-zero when one regressed by more
+than --tolerance, so the same command serves as a CI check.
+
+Usage:
+    python -m benchmarks.suite run --sizes 1k,100k --output baseline.json
+    python -m benchmarks.suite run --sizes 1k,100k --baseline baseline.json
+    python -m benchmarks.suite run --sizes 1M --db postgres --dimension 768
+    python -m benchmarks.suite compare baseline.json results.json
+"""
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import click
+import numpy as np
+
+from benchmarks.bench_db_insert import make_rows
+from benchmarks.bench_lexical import make_corpus
+from benchmarks.fakes import FakeEmbedContent, FakeGenerativeModel
+from chunker import StreamingChunker
+from config import Config
+from embedder import BatchEmbedder, RETRYABLE_ERRORS
+from lexical_index import LexicalIndex
+from scheduler import RateLimitScheduler
+from snapshot import Snapshot
+
+FORMAT_VERSION = 1
+CASES = ("chunk", "context", "embed", "bm25", "db_insert", "search")
+
+# Words per synthetic chunk; the vocabulary is Zipfian like real text
+CHUNK_WORDS = 120
+CHUNK_TOKENS = 200
+VOCAB = 50000
+DOCUMENT_CHUNKS = 50
+EMBED_BLOCK = 10000
+
+
+def parse_size(value: str) -> int:
+    value = value.strip().lower()
+    scale = {"k": 1000, "m": 1000000}.get(value[-1:], 1)
+    return int(float(value.rstrip("km")) * scale)
+
+
+def format_size(size: int) -> str:
+    if size >= 1000000 and size % 1000000 == 0:
+        return f"{size // 1000000}M"
+    if size >= 1000 and size % 1000 == 0:
+        return f"{size // 1000}k"
+    return str(size)
+
+
+def chunk_texts(count: int, seed: int = 0):
+    """Yield `count` chunk texts of about CHUNK_WORDS words"""
+    for tokens in make_corpus(count, VOCAB, CHUNK_WORDS, seed=seed):
+        yield " ".join(tokens) + "."
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000)
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence progress prints of the code under test"""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+class Suite:
+    """Benchmark cases; each returns a list of (metric, value, better) tuples"""
+
+    def __init__(self, db: str, dimension: int, latency: float, rpm: int, tpm: int,
+                 concurrency: int, pack: int, queries: int, top_k: int):
+        self.db = db
+        # The chunks table fixes the dimension for Postgres
+        self.dimension = Config.EMBEDDING_DIMENSION if db == "postgres" else dimension
+        self.latency = latency
+        self.rpm = rpm
+        self.tpm = tpm
+        self.concurrency = concurrency
+        self.pack = pack
+        self.queries = queries
+        self.top_k = top_k
+
+    def case_chunk(self, size: int):
+        # One page of sentences and paragraphs, repeated, keeps input generation
+        # out of the measurement; about `size` chunks of CHUNK_TOKENS come out
+        paragraphs = []
+        for text in chunk_texts(64):
+            words = text.split()
+            paragraphs.append(". ".join(" ".join(words[i:i + 15]) for i in range(0, len(words), 15)))
+        page = "\n\n".join(paragraphs) + "\n"
+        chunker = StreamingChunker(max_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_TOKENS // 10)
+        total_chars = size * CHUNK_TOKENS * 4
+
+        def pages():
+            for _ in range(0, total_chars, len(page)):
+                yield page
+
+        start = time.perf_counter()
+        count = sum(1 for _ in chunker.chunks(pages()))
+        elapsed = time.perf_counter() - start
+        return [
+            ("chunks_per_second", count / elapsed, "higher"),
+            ("mb_per_second", total_chars / 2**20 / elapsed, "higher"),
+        ]
+
+    def case_context(self, size: int):
+        from text_chunk import GeminiContextualRetrieval
+        retriever = GeminiContextualRetrieval(
+            google_api_key="benchmark",
+            google_model="fake",
+            google_embedding_model="fake",
+            max_concurrency=self.concurrency,
+            chunks_per_request=self.pack,
+            generate_rpm=self.rpm,
+            generate_tpm=self.tpm)
+        retriever.gemini_model = FakeGenerativeModel(latency=self.latency, rpm=self.rpm, tpm=self.tpm)
+
+        texts = chunk_texts(size)
+        elapsed = 0.0
+        done = 0
+        while done < size:
+            count = min(DOCUMENT_CHUNKS, size - done)
+            chunks = [
+                {'text': next(texts), 'chunk_index': i, 'metadata': {}}
+                for i in range(count)
+            ]
+            document = "\n\n".join(chunk['text'] for chunk in chunks)
+            start = time.perf_counter()
+            with quiet():
+                retriever.contextualize_chunks(document, chunks)
+            elapsed += time.perf_counter() - start
+            done += count
+        return [("chunks_per_second", size / elapsed, "higher")]
+
+    def case_embed(self, size: int):
+        fake = FakeEmbedContent(dimension=self.dimension, latency=self.latency, rpm=self.rpm, tpm=self.tpm)
+        embedder = BatchEmbedder(
+            model="fake",
+            dimension=self.dimension,
+            max_concurrency=self.concurrency,
+            initial_backoff=0.01,
+            embed_fn=fake,
+            scheduler=RateLimitScheduler(
+                "embed", rpm=self.rpm, tpm=self.tpm, max_concurrency=self.concurrency,
+                initial_backoff=0.01, retryable=RETRYABLE_ERRORS))
+        texts = chunk_texts(size)
+        elapsed = 0.0
+        done = 0
+        while done < size:
+            block = [next(texts) for _ in range(min(EMBED_BLOCK, size - done))]
+            start = time.perf_counter()
+            with quiet():
+                embedder.embed(block)
+            elapsed += time.perf_counter() - start
+            done += len(block)
+        return [("texts_per_second", size / elapsed, "higher")]
+
+    def case_bm25(self, size: int):
+        # Documents cycle through a pre-generated pool so generation is not timed
+        pool = list(make_corpus(min(size, 10000), VOCAB, CHUNK_WORDS))
+        index = LexicalIndex(compact_threshold=size + 1)
+        start = time.perf_counter()
+        index.add_documents(range(size), (pool[i % len(pool)] for i in range(size)))
+        index.compact()
+        build = time.perf_counter() - start
+
+        times = []
+        for query in make_corpus(self.queries, VOCAB, 4, seed=2):
+            start = time.perf_counter()
+            index.search(query, self.top_k)
+            times.append(time.perf_counter() - start)
+        return [
+            ("build_docs_per_second", size / build, "higher"),
+            ("query_p50_ms", percentile_ms(times, 50), "lower"),
+            ("query_p99_ms", percentile_ms(times, 99), "lower"),
+        ]
+
+    # --- Search corpora ---
+
+    @contextlib.contextmanager
+    def memory_corpus(self, size: int):
+        """RAG on the file backend over a temporary snapshot of `size` chunks"""
+        from rag import RAG
+        rng = np.random.default_rng(0)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "snapshot")
+            snapshot = Snapshot.create(path, self.dimension)
+            lexical = LexicalIndex(compact_threshold=size + 1)
+            texts = chunk_texts(size)
+            for start in range(0, size, EMBED_BLOCK):
+                count = min(EMBED_BLOCK, size - start)
+                block = [next(texts) for _ in range(count)]
+                chunks = [{
+                    'original_text': text,
+                    'context': "",
+                    'contextualized_text': text,
+                    'chunk_index': start + i,
+                    'metadata': {'source': 'benchmark'}
+                } for i, text in enumerate(block)]
+                snapshot.append(chunks, rng.standard_normal((count, self.dimension)).astype(np.float32))
+                lexical.add_documents(range(start, start + count), block)
+            lexical.save(os.path.join(path, "bm25"))
+
+            config = Config()
+            config.GEMINI_API_KEY = "benchmark"
+            config.CACHE_PATH = ""
+            config.RETRIEVAL_BACKEND = "file"
+            config.RETRIEVAL_DATA_PATH = path
+            with quiet():
+                rag = RAG(config)
+            yield rag
+
+    @contextlib.contextmanager
+    def postgres_corpus(self, size: int, timings: dict):
+        """RAG on Postgres with `size` chunks loaded under a scratch document"""
+        from ann_index import rebuild_embedding_index
+        from db import DBSession
+        from rag import RAG
+        config = Config()
+        config.GEMINI_API_KEY = "benchmark"
+        config.CACHE_PATH = ""
+        with DBSession(config.DATABASE_URL, write_method="copy") as session:
+            document = session.upsert_document("benchmark-suite", "0" * 64, {"source": "benchmark-suite"})
+            session.commit()
+            try:
+                start = time.perf_counter()
+                session.bulk_load_chunks(make_rows(document.id, size, self.dimension))
+                timings['insert'] = time.perf_counter() - start
+                with quiet():
+                    rebuild_embedding_index(config.DATABASE_URL, method=config.ANN_INDEX_METHOD)
+                    rag = RAG(config)
+                yield rag
+            finally:
+                session.session.delete(document)
+                session.commit()
+
+    def search_metrics(self, rag):
+        rag.preprocessor.embedder.embed_fn = FakeEmbedContent(dimension=self.dimension, latency=0)
+        queries = [" ".join(q) for q in make_corpus(self.queries, VOCAB, 4, seed=3)]
+        results = []
+        for mode in ("vector", "hybrid"):
+            times = []
+            for query in queries:
+                # Distinct query text per mode so the embedding cache is cold
+                query = f"{mode} {query}"
+                start = time.perf_counter()
+                rag.search_similar(query, top_k=self.top_k, mode=mode)
+                times.append(time.perf_counter() - start)
+            results.append((f"{mode}_p50_ms", percentile_ms(times, 50), "lower"))
+            results.append((f"{mode}_p99_ms", percentile_ms(times, 99), "lower"))
+        return results
+
+    def case_db_insert_and_search(self, size: int, cases):
+        """db_insert and search share one loaded corpus"""
+        results = {}
+        if self.db == "postgres":
+            timings = {}
+            with self.postgres_corpus(size, timings) as rag:
+                if "db_insert" in cases:
+                    results["db_insert"] = [("rows_per_second", size / timings['insert'], "higher")]
+                if "search" in cases:
+                    results["search"] = self.search_metrics(rag)
+        elif "search" in cases:
+            with self.memory_corpus(size) as rag:
+                results["search"] = self.search_metrics(rag)
+        return results
+
+    def run(self, sizes, cases, repeat: int):
+        results = []
+
+        def record(case, size, metrics):
+            for metric, value, better in metrics:
+                results.append({'case': case, 'size': size, 'metric': metric, 'value': value, 'better': better})
+                print(f"{case:<10} {format_size(size):>6} {metric:<24} {value:14.3f}")
+
+        for size in sizes:
+            for case in cases:
+                if case in ("db_insert", "search"):
+                    continue
+                runs = [getattr(self, f"case_{case}")(size) for _ in range(repeat)]
+                record(case, size, best_of(runs))
+            if "db_insert" in cases or "search" in cases:
+                if "db_insert" in cases and self.db != "postgres":
+                    print(f"{'db_insert':<10} {format_size(size):>6} skipped (needs --db postgres)")
+                runs = [self.case_db_insert_and_search(size, cases) for _ in range(repeat)]
+                for case in ("db_insert", "search"):
+                    if case in runs[0]:
+                        record(case, size, best_of([run[case] for run in runs]))
+        return results
+
+
+def best_of(runs):
+    """Best value of each metric over repeated runs"""
+    best = {}
+    for metrics in runs:
+        for metric, value, better in metrics:
+            if metric not in best:
+                best[metric] = (value, better)
+            elif (value > best[metric][0]) == (better == "higher"):
+                best[metric] = (value, better)
+    return [(metric, value, better) for metric, (value, better) in best.items()]
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> int:
+    """
+    Print a comparison of two result files.
+
+    Returns:
+        Number of metrics that regressed by more than tolerance
+    """
+    current_values = {(r['case'], r['size'], r['metric']): r for r in current['results']}
+    regressions = 0
+    print(f"{'case':<10} {'size':>6} {'metric':<24} {'baseline':>12} {'current':>12} {'change':>8}")
+    for entry in baseline['results']:
+        key = (entry['case'], entry['size'], entry['metric'])
+        result = current_values.get(key)
+        if result is None:
+            print(f"{key[0]:<10} {format_size(key[1]):>6} {key[2]:<24} {entry['value']:12.3f} {'missing':>12}")
+            continue
+        change = (result['value'] - entry['value']) / entry['value'] if entry['value'] else 0.0
+        worse = -change if entry['better'] == "higher" else change
+        status = ""
+        if worse > tolerance:
+            regressions += 1
+            status = "  REGRESSION"
+        print(f"{key[0]:<10} {format_size(key[1]):>6} {key[2]:<24} {entry['value']:12.3f} "
+              f"{result['value']:12.3f} {change:+8.1%}{status}")
+    return regressions
+
+
+@click.group()
+def main():
+    """Offline benchmark suite."""
+
+
+@main.command('run')
+@click.option('--sizes', default='1k', show_default=True, help='Comma-separated corpus sizes in chunks, e.g. 1k,100k,1M.')
+@click.option('--cases', default=','.join(CASES), show_default=True, help='Comma-separated cases to run.')
+@click.option('--db', type=click.Choice(['memory', 'postgres']), default='memory', show_default=True, help='Search backend.')
+@click.option('--dimension', default=768, show_default=True, help='Embedding dimension (fixed by the schema with --db postgres).')
+@click.option('--latency', default=0.0, show_default=True, help='Fake API latency per call, in seconds.')
+@click.option('--rpm', default=0, show_default=True, help='Fake API requests-per-minute quota (0 disables).')
+@click.option('--tpm', default=0, show_default=True, help='Fake API tokens-per-minute quota (0 disables).')
+@click.option('--concurrency', default=8, show_default=True, help='Concurrent context/embedding requests.')
+@click.option('--pack', default=8, show_default=True, help='Chunks per context request.')
+@click.option('--queries', default=200, show_default=True, help='Queries per latency measurement.')
+@click.option('--top-k', default=10, show_default=True, help='Results per query.')
+@click.option('--repeat', default=1, show_default=True, help='Runs per case; the best value of each metric is kept.')
+@click.option('--output', type=click.Path(dir_okay=False), help='Write results to this JSON file.')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False), help='Compare with this result file and fail on regressions.')
+@click.option('--tolerance', default=0.2, show_default=True, help='Allowed relative slowdown before a metric counts as a regression.')
+def run_command(sizes, cases, db, dimension, latency, rpm, tpm, concurrency, pack, queries, top_k,
+                repeat, output, baseline, tolerance):
+    """Run the suite."""
+    sizes = [parse_size(size) for size in sizes.split(",")]
+    cases = [case.strip() for case in cases.split(",")]
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        raise click.BadParameter(f"unknown cases: {', '.join(sorted(unknown))}", param_hint='--cases')
+
+    suite = Suite(db, dimension, latency, rpm, tpm, concurrency, pack, queries, top_k)
+    settings = {
+        'db': db, 'dimension': dimension, 'latency': latency, 'rpm': rpm, 'tpm': tpm,
+        'concurrency': concurrency, 'pack': pack, 'queries': queries, 'top_k': top_k, 'repeat': repeat
+    }
+    report = {
+        'version': FORMAT_VERSION,
+        'created_at': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'numpy': np.__version__
+        },
+        'settings': settings,
+        'results': suite.run(sizes, cases, repeat)
+    }
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote results to {output}")
+
+    if baseline:
+        with open(baseline) as f:
+            baseline_report = json.load(f)
+        if baseline_report.get('settings') != settings:
+            print("Warning: baseline was recorded with different settings.")
+        print()
+        regressions = compare(baseline_report, report, tolerance)
+        if regressions:
+            print(f"{regressions} metrics regressed by more than {tolerance:.0%}.")
+            sys.exit(1)
+
+
+@main.command('compare')
+@click.argument('baseline', type=click.Path(exists=True, dir_okay=False))
+@click.argument('current', type=click.Path(exists=True, dir_okay=False))
+@click.option('--tolerance', default=0.2, show_default=True, help='Allowed relative slowdown before a metric counts as a regression.')
+def compare_command(baseline, current, tolerance):
+    """Compare two result files; exits non-zero on regressions."""
+    with open(baseline) as f:
+        baseline_report = json.load(f)
+    with open(current) as f:
+        current_report = json.load(f)
+    regressions = compare(baseline_report, current_report, tolerance)
+    if regressions:
+        print(f"{regressions} metrics regressed by more than {tolerance:.0%}.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+from cachetools import LRUCache, TTLCache
+from typing import Dict, Iterable, List, Optional
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+
+def make_key(*parts: str) -> str:
+    """
+    Build a content-addressed cache key from its parts.
+    
+    Args:
+        parts: Strings that together identify the cached value
+        
+    Returns:
+        Hex SHA-256 digest of the parts
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+def hash_text(text: str) -> str:
+    """Hex SHA-256 digest of a text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class ContentCache:
+    """
+    Persistent content-addressed cache backed by SQLite.
+    
+    Values are stored as blobs keyed by make_key(). The total stored size is
+    capped at max_bytes; when the cap is exceeded the least recently used
+    entries are evicted. The size is kept in the database by triggers and
+    checked in the same write transaction as the insert, so processes sharing
+    a cache file (workers, the query server) share one cap. Hit and miss
+    counters are kept per process.
+    """
+    
+    def __init__(self, path: str, max_bytes: int = 1024 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access_idx ON entries (last_access)")
+        self._conn.execute("BEGIN IMMEDIATE")
+        if self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'cache_size'").fetchone() is None:
+            self._conn.execute("CREATE TABLE cache_size (bytes INTEGER NOT NULL)")
+            self._conn.execute("INSERT INTO cache_size SELECT COALESCE(SUM(size), 0) FROM entries")
+            self._conn.execute(
+                "CREATE TRIGGER entries_insert_size AFTER INSERT ON entries "
+                "BEGIN UPDATE cache_size SET bytes = bytes + NEW.size; END")
+            self._conn.execute(
+                "CREATE TRIGGER entries_update_size AFTER UPDATE OF size ON entries "
+                "BEGIN UPDATE cache_size SET bytes = bytes + NEW.size - OLD.size; END")
+            self._conn.execute(
+                "CREATE TRIGGER entries_delete_size AFTER DELETE ON entries "
+                "BEGIN UPDATE cache_size SET bytes = bytes - OLD.size; END")
+        self._conn.execute("COMMIT")
+    
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        """
+        Look up several keys at once.
+        
+        Args:
+            keys: Cache keys
+            
+        Returns:
+            Dictionary of the keys that were found and their values
+        """
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM entries WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE entries SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+    
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the value for key, or None on a miss"""
+        return self.get_many([key]).get(key)
+    
+    def put_many(self, items: Dict[str, bytes]) -> None:
+        """
+        Store several values at once, evicting least recently used entries
+        if the size cap is exceeded.
+        
+        Args:
+            items: Dictionary of cache keys to values
+        """
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, so the size read below
+            # includes every other process's committed writes
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # An upsert (unlike INSERT OR REPLACE) fires the size triggers
+                self._conn.executemany(
+                    "INSERT INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET "
+                    "value = excluded.value, size = excluded.size, last_access = excluded.last_access",
+                    [(key, value, len(value), now) for key, value in items.items()]
+                )
+                if self._total_bytes() > self.max_bytes:
+                    self._evict()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+    
+    def put(self, key: str, value: bytes) -> None:
+        """Store a single value"""
+        self.put_many({key: value})
+    
+    def _total_bytes(self) -> int:
+        return self._conn.execute("SELECT bytes FROM cache_size").fetchone()[0]
+    
+    def _evict(self) -> None:
+        """
+        Delete least recently used entries until the cache is back under 90%
+        of the cap. Runs inside put_many's write transaction.
+        """
+        target = int(self.max_bytes * 0.9)
+        total = self._total_bytes()
+        cursor = self._conn.execute("SELECT key, size FROM entries ORDER BY last_access")
+        evicted = []
+        for key, size in cursor:
+            if total <= target:
+                break
+            evicted.append((key,))
+            total -= size
+        cursor.close()
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+    
+    def get_texts(self, keys: Iterable[str]) -> Dict[str, str]:
+        """Look up several text values"""
+        return {key: value.decode("utf-8") for key, value in self.get_many(keys).items()}
+    
+    def put_texts(self, items: Dict[str, str]) -> None:
+        """Store several text values"""
+        self.put_many({key: value.encode("utf-8") for key, value in items.items()})
+    
+    def get_vectors(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Look up several float32 vectors"""
+        return {key: np.frombuffer(value, dtype=np.float32) for key, value in self.get_many(keys).items()}
+    
+    def put_vectors(self, items: Dict[str, np.ndarray]) -> None:
+        """Store several vectors as float32"""
+        self.put_many({key: np.asarray(value, dtype=np.float32).tobytes() for key, value in items.items()})
+    
+    def stats(self) -> Dict[str, float]:
+        """
+        Return cache counters.
+        
+        Returns:
+            Dictionary with hits, misses, hit_rate and stored bytes
+        """
+        lookups = self.hits + self.misses
+        with self._lock:
+            stored = self._total_bytes()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'bytes': stored
+        }
+    
+    def close(self):
+        """Close the underlying database"""
+        with self._lock:
+            self._conn.close()
+
+def normalize_question(question: str) -> str:
+    """Case- and whitespace-insensitive form of a question used in cache keys"""
+    return " ".join(question.lower().split())
+
+class QueryCache:
+    """
+    Caches for the query path: query embeddings in an in-process LRU, and
+    answers in an in-process TTL cache. Both are optionally backed by a
+    ContentCache (under their own keys), so repeated questions also hit
+    across processes and restarts; hits from either level count as hits.
+    
+    Answer keys include the id and content hash of every retrieved chunk, so
+    an answer is never served once the chunks it was generated from change.
+    """
+    
+    def __init__(
+        self,
+        model: str,
+        embedding_model: str,
+        max_embeddings: int = 10000,
+        max_answers: int = 10000,
+        answer_ttl: float = 3600,
+        disk: ContentCache = None
+    ):
+        self.model = model
+        self.embedding_model = embedding_model
+        self.answer_ttl = answer_ttl
+        self.disk = disk
+        self._embeddings = LRUCache(maxsize=max_embeddings)
+        self._answers = TTLCache(maxsize=max_answers, ttl=answer_ttl) if answer_ttl > 0 else None
+        self._lock = threading.Lock()
+        self.counters = {'embedding_hits': 0, 'embedding_misses': 0, 'answer_hits': 0, 'answer_misses': 0}
+    
+    def embedding_key(self, query: str) -> str:
+        return make_key(self.embedding_model, "query-embedding", normalize_question(query))
+    
+    def get_embedding(self, query: str) -> Optional[List[float]]:
+        """Return the cached embedding of a query, or None"""
+        key = self.embedding_key(query)
+        with self._lock:
+            embedding = self._embeddings.get(key)
+        
+        if embedding is None and self.disk is not None:
+            vector = self.disk.get_vectors([key]).get(key)
+            if vector is not None:
+                embedding = vector.tolist()
+                with self._lock:
+                    self._embeddings[key] = embedding
+        
+        with self._lock:
+            self.counters['embedding_hits' if embedding is not None else 'embedding_misses'] += 1
+        return embedding
+    
+    def put_embedding(self, query: str, embedding: List[float]) -> None:
+        key = self.embedding_key(query)
+        with self._lock:
+            self._embeddings[key] = embedding
+        if self.disk is not None:
+            self.disk.put_vectors({key: embedding})
+    
+    def answer_key(self, question: str, contexts: List[Dict]) -> str:
+        chunks = ",".join(f"{c['id']}:{c.get('chunk_hash') or ''}" for c in contexts)
+        return make_key(self.model, "answer", normalize_question(question), chunks)
+    
+    def get_answer(self, question: str, contexts: List[Dict]) -> Optional[str]:
+        """Return a cached, unexpired answer for a question over these chunks, or None"""
+        if self._answers is None:
+            return None
+        key = self.answer_key(question, contexts)
+        now = time.time()
+        answer = None
+        with self._lock:
+            # Entries keep the expiry of the answer, which for one read back
+            # from disk is sooner than the in-process TTL
+            entry = self._answers.get(key)
+        if entry is not None and entry[1] > now:
+            answer = entry[0]
+        
+        if answer is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                entry = json.loads(value)
+                if entry['expires_at'] > now:
+                    answer = entry['answer']
+                    with self._lock:
+                        self._answers[key] = (answer, entry['expires_at'])
+        
+        with self._lock:
+            self.counters['answer_hits' if answer is not None else 'answer_misses'] += 1
+        return answer
+    
+    def put_answer(self, question: str, contexts: List[Dict], answer: str) -> None:
+        if self._answers is None:
+            return
+        key = self.answer_key(question, contexts)
+        expires_at = time.time() + self.answer_ttl
+        with self._lock:
+            self._answers[key] = (answer, expires_at)
+        if self.disk is not None:
+            self.disk.put(key, json.dumps({
+                'answer': answer,
+                'expires_at': expires_at
+            }).encode("utf-8"))
+    
+    def invalidate_answers(self) -> None:
+        """Drop in-process answers (persisted answers are keyed by chunk content)"""
+        with self._lock:
+            if self._answers is not None:
+                self._answers.clear()
+    
+    def stats(self) -> Dict[str, float]:
+        """
+        Return cache counters.
+        
+        Returns:
+            Dictionary with hits, misses and hit rates for embeddings and answers
+        """
+        with self._lock:
+            stats = dict(self.counters)
+        for kind in ('embedding', 'answer'):
+            lookups = stats[f'{kind}_hits'] + stats[f'{kind}_misses']
+            stats[f'{kind}_hit_rate'] = stats[f'{kind}_hits'] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,210 @@
+from embedder import estimate_tokens
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple
+import re
+
+# Per-chunk position keys added to chunk metadata
+POSITION_KEYS = ("start_char", "end_char", "page")
+
+# End of a unit: a blank line (paragraph break), or sentence-ending
+# punctuation with optional closing quotes/brackets, followed by whitespace
+_BOUNDARY = re.compile(r'\n[ \t]*\n\s*|[.!?]["\')\]]*\s+')
+
+CHARS_PER_TOKEN = 4
+
+class _Unit(NamedTuple):
+    start: int
+    end: int
+    tokens: int
+    paragraph_end: bool
+    page: int
+
+def iter_text_windows(text: str, window_chars: int = 65536) -> Iterator[str]:
+    """Yield a string in fixed-size slices, so it can be fed to StreamingChunker"""
+    for start in range(0, len(text), window_chars):
+        yield text[start:start + window_chars]
+
+class StreamingChunker:
+    """
+    Structure-aware chunker over a stream of text pieces (e.g. PDF pages).
+
+    Text is split into sentences and paragraphs, which are packed into chunks
+    of at most max_tokens estimated tokens. When a chunk is full it ends at
+    the last paragraph break past half the budget, or else at the last
+    sentence; only sentences longer than the budget are cut, at whitespace.
+    A chunk cut inside a paragraph shares up to overlap_tokens of whole
+    trailing sentences with the next one.
+
+    Only the text not yet emitted is buffered, so memory use is bounded by the
+    chunk size and the size of one input piece, not by the document. Every
+    chunk records its character offsets in the concatenated input, and the
+    index of the piece it starts in.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 800,
+        overlap_tokens: int = 100,
+        token_estimator: Callable[[str], int] = estimate_tokens
+    ):
+        """
+        Args:
+            max_tokens: Token budget of a chunk
+            overlap_tokens: Token budget of the sentences repeated at the start
+                of the next chunk
+            token_estimator: Function estimating the tokens of a text
+        """
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.estimate = token_estimator
+
+    def _split_long(self, buffer: str, offset: int, unit: _Unit) -> List[_Unit]:
+        """Cut a unit longer than the budget at whitespace"""
+        max_chars = (self.max_tokens - 1) * CHARS_PER_TOKEN
+        units = []
+        start = unit.start
+        while unit.end - start > max_chars:
+            window = buffer[start - offset:start - offset + max_chars]
+            cut = max(window.rfind(" "), window.rfind("\n"))
+            end = start + (cut + 1 if cut > 0 else max_chars)
+            units.append(_Unit(start, end, self.estimate(buffer[start - offset:end - offset]), False, unit.page))
+            start = end
+        text = buffer[start - offset:unit.end - offset]
+        units.append(_Unit(start, unit.end, self.estimate(text), unit.paragraph_end, unit.page))
+        return units
+
+    def _chunk(self, buffer: str, offset: int, units: List[_Unit], chunk_index: int, metadata: Dict, pages: bool) -> Dict:
+        start, end = units[0].start, units[-1].end
+        raw = buffer[start - offset:end - offset]
+        text = raw.strip()
+        start += len(raw) - len(raw.lstrip())
+        position = {'start_char': start, 'end_char': start + len(text)}
+        if pages:
+            position['page'] = units[0].page
+        return {'text': text, 'chunk_index': chunk_index, 'metadata': {**metadata, **position}}
+
+    def chunks(self, pieces: Iterable[str], metadata: Dict = None, pages: bool = True) -> Iterator[Dict]:
+        """
+        Chunk a stream of text.
+
+        Args:
+            pieces: Iterable of text pieces (pages, or windows of a larger
+                string); their concatenation is the source text
+            metadata: Metadata copied into every chunk
+            pages: Whether the pieces are pages, whose index is recorded
+
+        Yields:
+            Chunk dictionaries with text, chunk_index and metadata; the
+            metadata also holds start_char and end_char (offsets of text in
+            the source) and, with pages, page (index of the piece the chunk
+            starts in)
+        """
+        metadata = metadata or {}
+        buffer = ""          # source text from offset on
+        offset = 0           # source offset of buffer[0]
+        scanned = 0          # source offset up to which units were found
+        units: List[_Unit] = []   # pending units, in order
+        tokens = 0           # tokens of the pending units
+        chunk_index = 0
+        piece_starts = []    # (source offset, piece index) of buffered pieces
+
+        def page_at(position: int) -> int:
+            page = piece_starts[0][1]
+            for start, index in piece_starts:
+                if start > position:
+                    break
+                page = index
+            return page
+
+        def scan(final: bool) -> None:
+            nonlocal scanned, tokens
+            for match in _BOUNDARY.finditer(buffer, scanned - offset):
+                end = match.end() + offset
+                # A boundary at the very end may continue in the next piece
+                if end == offset + len(buffer) and not final:
+                    break
+                tokens += self._add_unit(
+                    units, buffer, offset, scanned, end, match.group().count("\n") >= 2, page_at(scanned))
+                scanned = end
+            if final and scanned < offset + len(buffer):
+                tokens += self._add_unit(
+                    units, buffer, offset, scanned, offset + len(buffer), True, page_at(scanned))
+                scanned = offset + len(buffer)
+
+        def emit(final: bool) -> Iterator[Dict]:
+            nonlocal buffer, offset, tokens, chunk_index
+            while units and (tokens > self.max_tokens or final):
+                count, total = 0, 0
+                for unit in units:
+                    if count and total + unit.tokens > self.max_tokens:
+                        break
+                    count += 1
+                    total += unit.tokens
+                if count < len(units):
+                    # Prefer ending at a paragraph break past half the budget
+                    running, paragraph_count = 0, 0
+                    for i, unit in enumerate(units[:count]):
+                        running += unit.tokens
+                        if unit.paragraph_end and running * 2 >= self.max_tokens:
+                            paragraph_count = i + 1
+                    count = paragraph_count or count
+                    chunk_units = units[:count]
+                else:
+                    chunk_units = units[:]
+
+                chunk = self._chunk(buffer, offset, chunk_units, chunk_index, metadata, pages)
+                if chunk['text']:
+                    yield chunk
+                    chunk_index += 1
+
+                if count == len(units) or units[count - 1].paragraph_end:
+                    del units[:count]
+                else:
+                    # Carry whole trailing sentences of the chunk as overlap,
+                    # unless it ended a paragraph
+                    keep, kept_tokens = count, 0
+                    while keep > 1 and kept_tokens + units[keep - 1].tokens <= self.overlap_tokens:
+                        keep -= 1
+                        kept_tokens += units[keep].tokens
+                    del units[:keep]
+                tokens = sum(unit.tokens for unit in units)
+
+                # Drop buffered text no pending unit refers to
+                start = units[0].start if units else scanned
+                buffer = buffer[start - offset:]
+                offset = start
+                while len(piece_starts) > 1 and piece_starts[1][0] <= offset:
+                    piece_starts.pop(0)
+                if final and not units:
+                    break
+
+        for page, piece in enumerate(pieces):
+            if not piece:
+                continue
+            piece_starts.append((offset + len(buffer), page))
+            buffer += piece
+            scan(final=False)
+            yield from emit(final=False)
+        if piece_starts:
+            scan(final=True)
+            yield from emit(final=True)
+
+    def _add_unit(
+        self,
+        units: List[_Unit],
+        buffer: str,
+        offset: int,
+        start: int,
+        end: int,
+        paragraph_end: bool,
+        page: int
+    ) -> int:
+        """Append the unit source[start:end], split if over budget, and return its tokens"""
+        tokens = self.estimate(buffer[start - offset:end - offset])
+        if tokens <= self.max_tokens:
+            units.append(_Unit(start, end, tokens, paragraph_end, page))
+            return tokens
+        parts = self._split_long(buffer, offset, _Unit(start, end, tokens, paragraph_end, page))
+        units.extend(parts)
+        return sum(part.tokens for part in parts)
@@ -1,8 +1,76 @@
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy import create_engine
+from sqlalchemy import bindparam, create_engine, func, make_url, select, text, update
+from sqlalchemy.engine import Engine
+from config import Config
+from metrics import METRICS
 from models.chunk import Chunk
-from typing import List, Dict, Any, Optional
+from models.document import Document
+from models.job import IngestionJob, IngestionJobItem, IngestionTask
+from sqlalchemy.dialects.postgresql import insert
+from typing import List, Dict, Any, Iterable, Optional, Tuple
 from contextlib import contextmanager
+from pgvector.psycopg import register_vector
+from psycopg.types.json import Jsonb
+import numpy as np
+import threading
+
+# Column order and binary types for COPY ... FROM STDIN (FORMAT BINARY)
+COPY_COLUMNS = (
+    "document_id", "chunk_index", "original_text", "context",
+    "contextualized_text", "chunk_hash", "embedding", "metadata"
+)
+COPY_TYPES = ("int4", "int4", "text", "text", "text", "varchar", "vector", "jsonb")
+
+_engines: Dict[str, Engine] = {}
+_session_factories: Dict[str, sessionmaker] = {}
+_engines_lock = threading.Lock()
+
+def get_engine(db_url: str) -> Engine:
+    """
+    Return the process-wide engine for a database URL, creating it on first use.
+    
+    Every DBSession and DatabaseManager for the same URL shares this engine and
+    its connection pool, so connections (and the statements prepared on them)
+    are reused across ingestion and queries instead of reconnecting each time.
+    
+    Args:
+        db_url: SQLAlchemy database URL
+        
+    Returns:
+        Shared Engine
+    """
+    with _engines_lock:
+        engine = _engines.get(db_url)
+        if engine is None:
+            connect_args = {}
+            if make_url(db_url).get_driver_name() == "psycopg":
+                # Server-side prepare statements after this many executions per connection
+                connect_args["prepare_threshold"] = Config.DB_PREPARE_THRESHOLD
+            engine = create_engine(
+                db_url,
+                echo=False,
+                pool_size=Config.DB_POOL_SIZE,
+                max_overflow=Config.DB_MAX_OVERFLOW,
+                pool_pre_ping=Config.DB_POOL_PRE_PING,
+                pool_recycle=Config.DB_POOL_RECYCLE,
+                connect_args=connect_args
+            )
+            _engines[db_url] = engine
+            _session_factories[db_url] = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        return engine
+
+def get_session_factory(db_url: str) -> sessionmaker:
+    """Return the session factory bound to the shared engine for a URL"""
+    get_engine(db_url)
+    return _session_factories[db_url]
+
+def dispose_engines() -> None:
+    """Close every pooled connection (e.g. at shutdown or after fork)"""
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+        _session_factories.clear()
 
 class DatabaseManager:
     def __init__(self, db_url: str):
@@ -13,8 +81,8 @@ class DatabaseManager:
     
     def _initialize_engine(self):
         """Initialize database engine and session factory"""
-        self.engine = create_engine(self.db_url, echo=False)
-        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.engine = get_engine(self.db_url)
+        self.session_factory = get_session_factory(self.db_url)
     
     def create_session(self) -> Session:
         """Create and return a new database session"""
@@ -36,17 +104,30 @@ class DatabaseManager:
             session.close()
 
 class DBSession:
-    def __init__(self, db_url: str):
+    def __init__(self, db_url: str, write_method: str = "orm", copy_batch_size: int = 5000):
+        """
+        Args:
+            db_url: SQLAlchemy database URL
+            write_method: "orm" to insert chunks through session.add, or "copy"
+                to stream them with binary COPY; COPY needs the psycopg (3)
+                driver, so other drivers (e.g. psycopg2) fall back to "orm"
+            copy_batch_size: Rows per COPY statement
+        """
+        if write_method not in ("orm", "copy"):
+            raise ValueError(f"Unknown write method: {write_method}")
+        if write_method == "copy" and make_url(db_url).get_driver_name() != "psycopg":
+            write_method = "orm"
         self.db_url = db_url
+        self.write_method = write_method
+        self.copy_batch_size = copy_batch_size
         self.engine = None
         self.session = None
         self._initialize()
     
     def _initialize(self):
         """Initialize database engine and session"""
-        self.engine = create_engine(self.db_url, echo=False)
-        Session = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
-        self.session = Session()
+        self.engine = get_engine(self.db_url)
+        self.session = get_session_factory(self.db_url)()
     
     def store_chunk(self, chunk_data: Dict[str, Any]) -> None:
         """
@@ -71,8 +152,509 @@ class DBSession:
         if self.session is None:
             raise RuntimeError("Session not initialized. Call _initialize() first.")
         
-        chunks = [Chunk(**chunk_data) for chunk_data in chunks_data]
-        self.session.add_all(chunks)
+        if self.write_method == "copy":
+            for i in range(0, len(chunks_data), self.copy_batch_size):
+                self._copy_chunks(chunks_data[i:i + self.copy_batch_size])
+            return
+        
+        with METRICS.timer("db_write"):
+            chunks = [Chunk(**chunk_data) for chunk_data in chunks_data]
+            self.session.add_all(chunks)
+            self.session.flush()
+        METRICS.inc("db_rows", len(chunks), operation="write")
+    
+    def bulk_load_chunks(self, chunks_data: Iterable[Dict[str, Any]], batch_size: int = None) -> int:
+        """
+        Stream chunks into the database with binary COPY, committing after
+        every batch so arbitrarily large loads use bounded memory.
+        
+        Args:
+            chunks_data: Iterable of chunk dictionaries
+            batch_size: Rows per COPY and commit (defaults to copy_batch_size)
+            
+        Returns:
+            Number of rows written
+        """
+        if self.session is None:
+            raise RuntimeError("Session not initialized. Call _initialize() first.")
+        
+        batch_size = batch_size or self.copy_batch_size
+        total = 0
+        batch = []
+        for chunk_data in chunks_data:
+            batch.append(chunk_data)
+            if len(batch) == batch_size:
+                self._copy_chunks(batch)
+                self.commit()
+                total += len(batch)
+                batch = []
+        if batch:
+            self._copy_chunks(batch)
+            self.commit()
+            total += len(batch)
+        return total
+    
+    def _copy_chunks(self, chunks_data: List[Dict[str, Any]]) -> None:
+        """Write chunks with COPY FROM STDIN in binary format inside the current transaction"""
+        # Raw psycopg connection behind the session's current transaction
+        connection = self.session.connection().connection.driver_connection
+        if connection.adapters.types.get("vector") is None:
+            register_vector(connection)
+        
+        with METRICS.timer("db_write"), connection.cursor() as cursor:
+            with cursor.copy(f"COPY chunks ({', '.join(COPY_COLUMNS)}) FROM STDIN (FORMAT BINARY)") as copy:
+                copy.set_types([Config.EMBEDDING_STORAGE if t == "vector" else t for t in COPY_TYPES])
+                for chunk_data in chunks_data:
+                    embedding = chunk_data.get('embedding')
+                    meta = chunk_data.get('meta', chunk_data.get('metadata'))
+                    copy.write_row((
+                        chunk_data.get('document_id'),
+                        chunk_data['chunk_index'],
+                        chunk_data['original_text'],
+                        chunk_data['context'],
+                        chunk_data['contextualized_text'],
+                        chunk_data.get('chunk_hash'),
+                        None if embedding is None else np.asarray(embedding, dtype=np.float32),
+                        None if meta is None else Jsonb(meta)
+                    ))
+        METRICS.inc("db_rows", len(chunks_data), operation="write")
+    
+    def get_document(self, source: str) -> Optional[Document]:
+        """
+        Look up a document by its source.
+        
+        Args:
+            source: Document source identifier
+            
+        Returns:
+            Document row, or None if the source has not been ingested
+        """
+        if self.session is None:
+            raise RuntimeError("Session not initialized. Call _initialize() first.")
+        
+        return self.session.query(Document).filter(Document.source == source).one_or_none()
+    
+    def upsert_document(self, source: str, content_hash: str, metadata: Dict[str, Any]) -> Document:
+        """
+        Create a document or update its fingerprint and metadata.
+        
+        Args:
+            source: Document source identifier
+            content_hash: Hash of the full document text
+            metadata: Document metadata
+            
+        Returns:
+            Flushed Document row with its id assigned
+        """
+        if self.session is None:
+            raise RuntimeError("Session not initialized. Call _initialize() first.")
+        
+        document = self.get_document(source)
+        if document is None:
+            document = Document(source=source)
+            self.session.add(document)
+        document.content_hash = content_hash
+        document.meta = metadata
+        self.session.flush()
+        return document
+    
+    def get_chunk_hashes(self, document_id: int) -> List[Tuple[int, str, bool]]:
+        """
+        List the stored chunks of a document.
+        
+        Args:
+            document_id: Document id
+            
+        Returns:
+            List of (chunk id, chunk hash, has context) tuples ordered by
+            chunk_index; has context is False for chunks whose context
+            request failed
+        """
+        if self.session is None:
+            raise RuntimeError("Session not initialized. Call _initialize() first.")
+        
+        return self.session.query(Chunk.id, Chunk.chunk_hash, Chunk.context != "").filter(
+            Chunk.document_id == document_id
+        ).order_by(Chunk.chunk_index).all()
+    
+    def update_chunks(self, chunks_data: List[Dict[str, Any]]) -> None:
+        """
+        Update existing chunks in bulk.
+        
+        Args:
+            chunks_data: List of dictionaries with 'id' and the attributes to change
+        """
+        if self.session is None:
+            raise RuntimeError("Session not initialized. Call _initialize() first.")
+        
+        if chunks_data:
+            self.session.bulk_update_mappings(Chunk, chunks_data)
+            METRICS.inc("db_rows", len(chunks_data), operation="update")
+    
+    def delete_chunks(self, chunk_ids: List[int]) -> None:
+        """
+        Delete chunks by id.
+        
+        Args:
+            chunk_ids: Ids of the chunks to delete
+        """
+        if self.session is None:
+            raise RuntimeError("Session not initialized. Call _initialize() first.")
+        
+        if chunk_ids:
+            self.session.query(Chunk).filter(Chunk.id.in_(chunk_ids)).delete(synchronize_session=False)
+            METRICS.inc("db_rows", len(chunk_ids), operation="delete")
+    
+    def create_job(self, kind: str, params: Dict[str, Any]) -> IngestionJob:
+        """
+        Record a new ingestion job.
+        
+        Args:
+            kind: What is ingested ("documents" or "pdf")
+            params: Inputs needed to run the job again
+            
+        Returns:
+            Flushed IngestionJob row with its id assigned
+        """
+        if self.session is None:
+            raise RuntimeError("Session not initialized. Call _initialize() first.")
+        
+        job = IngestionJob(kind=kind, params=params, status="running")
+        self.session.add(job)
+        self.session.flush()
+        return job
+    
+    def get_job(self, job_id: int) -> Optional[IngestionJob]:
+        """
+        Look up an ingestion job.
+        
+        Args:
+            job_id: Job id
+            
+        Returns:
+            IngestionJob row, or None if there is no such job
+        """
+        if self.session is None:
+            raise RuntimeError("Session not initialized. Call _initialize() first.")
+        
+        return self.session.get(IngestionJob, job_id)
+    
+    def update_job(self, job_id: int, status: str, stats: Dict[str, Any] = None, error: str = None) -> None:
+        """
+        Set the status of an ingestion job.
+        
+        Args:
+            job_id: Job id
+            status: "running", "completed" or "failed"
+            stats: Counters of the run
+            error: Error message of a failed run
+        """
+        if self.session is None:
+            raise RuntimeError("Session not initialized. Call _initialize() first.")
+        
+        self.session.execute(
+            update(IngestionJob).where(IngestionJob.id == job_id).values(status=status, stats=stats, error=error)
+        )
+    
+    def get_job_sources(self, job_id: int, status: str = "done") -> set:
+        """
+        List the sources of a job's items in a given status.
+        
+        Args:
+            job_id: Job id
+            status: Item status
+            
+        Returns:
+            Set of document sources
+        """
+        if self.session is None:
+            raise RuntimeError("Session not initialized. Call _initialize() first.")
+        
+        return set(self.session.scalars(
+            select(IngestionJobItem.source).where(
+                IngestionJobItem.job_id == job_id,
+                IngestionJobItem.status == status)
+        ))
+    
+    def start_job_item(self, job_id: int, source: str, chunks_total: int) -> None:
+        """
+        Record that a job started (or restarted) writing a document.
+        
+        Args:
+            job_id: Job id
+            source: Document source
+            chunks_total: Chunks still to be written for the document
+        """
+        if self.session is None:
+            raise RuntimeError("Session not initialized. Call _initialize() first.")
+        
+        statement = insert(IngestionJobItem).values(
+            job_id=job_id, source=source, status="running", chunks_total=chunks_total, chunks_written=0)
+        self.session.execute(statement.on_conflict_do_update(
+            index_elements=["job_id", "source"],
+            set_={'status': "running", 'chunks_total': chunks_total, 'chunks_written': 0}
+        ))
+    
+    def add_job_progress(self, job_id: int, written: Dict[str, int]) -> None:
+        """
+        Count chunks written for a job's documents, in the current transaction
+        so the checkpoint commits together with the chunk rows.
+        
+        Args:
+            job_id: Job id
+            written: Chunks written per document source
+        """
+        if self.session is None:
+            raise RuntimeError("Session not initialized. Call _initialize() first.")
+        
+        if written:
+            items = IngestionJobItem.__table__
+            self.session.execute(
+                update(items).where(
+                    items.c.job_id == job_id,
+                    items.c.source == bindparam("item_source")
+                ).values(chunks_written=items.c.chunks_written + bindparam("item_written")),
+                [{'item_source': source, 'item_written': count} for source, count in written.items()]
+            )
+    
+    def finish_job_item(self, job_id: int, source: str) -> None:
+        """
+        Mark a job's document as fully ingested.
+        
+        Args:
+            job_id: Job id
+            source: Document source
+        """
+        if self.session is None:
+            raise RuntimeError("Session not initialized. Call _initialize() first.")
+        
+        statement = insert(IngestionJobItem).values(job_id=job_id, source=source, status="done")
+        self.session.execute(statement.on_conflict_do_update(
+            index_elements=["job_id", "source"],
+            set_={'status': "done"}
+        ))
+    
+    def enqueue_tasks(self, job_id: int, tasks: Iterable[Tuple[str, Dict[str, Any]]], max_attempts: int = 3) -> int:
+        """
+        Add documents to the work queue; sources already queued for the job
+        are left as they are.
+        
+        Args:
+            job_id: Job the tasks belong to
+            tasks: (source, payload) tuples
+            max_attempts: Claims of a task before it is marked failed
+            
+        Returns:
+            Number of tasks added
+        """
+        if self.session is None:
+            raise RuntimeError("Session not initialized. Call _initialize() first.")
+        
+        added = 0
+        rows = []
+        for source, payload in tasks:
+            rows.append({'job_id': job_id, 'source': source, 'payload': payload, 'max_attempts': max_attempts})
+            if len(rows) == 1000:
+                added += self._insert_tasks(rows)
+                rows = []
+        if rows:
+            added += self._insert_tasks(rows)
+        return added
+    
+    def _insert_tasks(self, rows: List[Dict[str, Any]]) -> int:
+        result = self.session.execute(
+            insert(IngestionTask).values(rows).on_conflict_do_nothing(
+                index_elements=["job_id", "source"]).returning(IngestionTask.id)
+        )
+        return len(result.all())
+    
+    def claim_tasks(self, worker: str, limit: int, lease_seconds: float) -> List[Dict[str, Any]]:
+        """
+        Lease up to `limit` queued tasks to a worker.
+        
+        Pending tasks, and running tasks whose lease expired (their worker
+        died), are claimed in queue order with FOR UPDATE SKIP LOCKED, so
+        concurrent workers never block on or claim the same task. Expired
+        tasks out of attempts are marked failed instead. Leases use the
+        database clock, so worker clocks do not matter.
+        
+        Args:
+            worker: Worker name
+            limit: Maximum tasks to claim
+            lease_seconds: Lease duration; renew it with renew_leases
+            
+        Returns:
+            Claimed tasks as dictionaries with id, job_id, source, payload
+            and attempts
+        """
+        if self.session is None:
+            raise RuntimeError("Session not initialized. Call _initialize() first.")
+        
+        self.session.execute(text("""
+            UPDATE ingestion_tasks
+            SET status = 'failed', error = coalesce(error, 'lease expired'), updated_at = now()
+            WHERE id IN (
+                SELECT id FROM ingestion_tasks
+                WHERE status = 'running' AND lease_until < now() AND attempts >= max_attempts
+                FOR UPDATE SKIP LOCKED
+            )
+        """))
+        rows = self.session.execute(text("""
+            UPDATE ingestion_tasks
+            SET status = 'running', attempts = attempts + 1, worker = :worker,
+                lease_until = now() + make_interval(secs => :lease_seconds), updated_at = now()
+            WHERE id IN (
+                SELECT id FROM ingestion_tasks
+                WHERE status = 'pending'
+                   OR (status = 'running' AND lease_until < now() AND attempts < max_attempts)
+                ORDER BY id
+                LIMIT :limit
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, job_id, source, payload, attempts
+        """), {'worker': worker, 'limit': limit, 'lease_seconds': lease_seconds}).mappings().all()
+        return sorted((dict(row) for row in rows), key=lambda row: row['id'])
+    
+    def renew_leases(self, worker: str, task_ids: List[int], lease_seconds: float) -> int:
+        """
+        Extend the leases a worker holds.
+        
+        Args:
+            worker: Worker name
+            task_ids: Ids of the tasks being processed
+            lease_seconds: New lease duration from now
+            
+        Returns:
+            Number of leases still held (a task whose lease expired and was
+            claimed by another worker is not renewed)
+        """
+        if self.session is None:
+            raise RuntimeError("Session not initialized. Call _initialize() first.")
+        
+        if not task_ids:
+            return 0
+        result = self.session.execute(
+            update(IngestionTask).where(
+                IngestionTask.id.in_(task_ids),
+                IngestionTask.worker == worker,
+                IngestionTask.status == "running"
+            ).values(lease_until=func.now() + func.make_interval(0, 0, 0, 0, 0, 0, lease_seconds))
+        )
+        return result.rowcount
+    
+    def complete_tasks(self, worker: str, task_ids: List[int]) -> int:
+        """
+        Mark tasks leased to a worker as done.
+        
+        Args:
+            worker: Worker name
+            task_ids: Task ids
+            
+        Returns:
+            Number of tasks completed (tasks claimed by another worker since
+            are left alone)
+        """
+        if self.session is None:
+            raise RuntimeError("Session not initialized. Call _initialize() first.")
+        
+        if not task_ids:
+            return 0
+        result = self.session.execute(
+            update(IngestionTask).where(
+                IngestionTask.id.in_(task_ids),
+                IngestionTask.worker == worker
+            ).values(status="done", lease_until=None, error=None)
+        )
+        return result.rowcount
+    
+    def release_tasks(self, worker: str, task_ids: List[int], error: str) -> int:
+        """
+        Give failed tasks back to the queue for a retry, or mark them failed
+        once they are out of attempts.
+        
+        Args:
+            worker: Worker name
+            task_ids: Task ids
+            error: Error message
+            
+        Returns:
+            Number of tasks released (tasks claimed by another worker since
+            are left alone)
+        """
+        if self.session is None:
+            raise RuntimeError("Session not initialized. Call _initialize() first.")
+        
+        if not task_ids:
+            return 0
+        result = self.session.execute(text("""
+            UPDATE ingestion_tasks
+            SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END,
+                lease_until = NULL, error = :error, updated_at = now()
+            WHERE id = ANY(:ids) AND worker = :worker
+        """), {'ids': list(task_ids), 'worker': worker, 'error': error})
+        return result.rowcount
+    
+    def finish_drained_jobs(self, job_ids: Iterable[int]) -> None:
+        """
+        Mark queued jobs with no pending or running task left as completed
+        (or failed, if any task failed).
+        
+        Args:
+            job_ids: Job ids
+        """
+        if self.session is None:
+            raise RuntimeError("Session not initialized. Call _initialize() first.")
+        
+        self.session.execute(text("""
+            UPDATE ingestion_jobs j
+            SET status = CASE WHEN EXISTS (
+                    SELECT 1 FROM ingestion_tasks t WHERE t.job_id = j.id AND t.status = 'failed'
+                ) THEN 'failed' ELSE 'completed' END,
+                updated_at = now()
+            WHERE j.id = ANY(:ids) AND NOT EXISTS (
+                SELECT 1 FROM ingestion_tasks t
+                WHERE t.job_id = j.id AND t.status IN ('pending', 'running')
+            )
+        """), {'ids': list(job_ids)})
+    
+    def requeue_failed_tasks(self, job_id: int) -> int:
+        """
+        Put a job's failed tasks back in the queue with fresh attempts.
+        
+        Args:
+            job_id: Job id
+            
+        Returns:
+            Number of tasks requeued
+        """
+        if self.session is None:
+            raise RuntimeError("Session not initialized. Call _initialize() first.")
+        
+        result = self.session.execute(
+            update(IngestionTask).where(
+                IngestionTask.job_id == job_id,
+                IngestionTask.status == "failed"
+            ).values(status="pending", attempts=0, lease_until=None)
+        )
+        return result.rowcount
+    
+    def queue_counts(self, job_id: int = None) -> Dict[str, int]:
+        """
+        Count queued tasks by status.
+        
+        Args:
+            job_id: Only count this job's tasks
+            
+        Returns:
+            Dictionary of status -> count
+        """
+        if self.session is None:
+            raise RuntimeError("Session not initialized. Call _initialize() first.")
+        
+        statement = select(IngestionTask.status, func.count()).group_by(IngestionTask.status)
+        if job_id is not None:
+            statement = statement.where(IngestionTask.job_id == job_id)
+        return {status: count for status, count in self.session.execute(statement)}
     
     def commit(self):
         """Commit the current transaction"""
@@ -104,12 +686,16 @@ class DBSession:
     
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Context manager exit with automatic cleanup"""
-        if exc_type is not None:
-            self.rollback()
-        else:
-            try:
-                self.commit()
-            except Exception:
+        try:
+            if exc_type is not None:
                 self.rollback()
-                raise
+            else:
+                try:
+                    self.commit()
+                except Exception:
+                    self.rollback()
+                    raise
+        finally:
+            # Return the connection to the pool
+            self.close()
     
\ No newline at end of file
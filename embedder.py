@@ -0,0 +1,140 @@
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+from cache import ContentCache, make_key
+from concurrent.futures import ThreadPoolExecutor
+from metrics import METRICS
+from scheduler import BULK, RateLimitScheduler
+from typing import Callable, Iterator, List, Sequence, Tuple
+import numpy as np
+
+# Errors that mean "slow down and try again" rather than "this request is bad"
+RETRYABLE_ERRORS = (
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+)
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (about 4 characters per token)"""
+    return len(text) // 4 + 1
+
+class BatchEmbedder:
+    """
+    Batched embedding client.
+    
+    Groups texts into requests of at most batch_size texts and max_batch_tokens
+    estimated tokens, runs up to max_concurrency requests at once and writes the
+    results straight into a preallocated float32 matrix. Requests go through a
+    RateLimitScheduler, which keeps them within the API quota and retries a
+    throttled batch on its own with exponential backoff. When a cache is
+    given, only texts missing from it are sent to the API.
+    """
+    
+    def __init__(
+        self,
+        model: str,
+        dimension: int = 768,
+        batch_size: int = 100,
+        max_batch_tokens: int = 32000,
+        max_concurrency: int = 4,
+        max_retries: int = 6,
+        initial_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        embed_fn: Callable = None,
+        cache: ContentCache = None,
+        scheduler: RateLimitScheduler = None
+    ):
+        self.model = model
+        self.dimension = dimension
+        self.batch_size = max(1, batch_size)
+        self.max_batch_tokens = max_batch_tokens
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.embed_fn = embed_fn or genai.embed_content
+        self.cache = cache
+        # Without a shared scheduler, only concurrency and retries are managed
+        self.scheduler = scheduler or RateLimitScheduler(
+            "embed",
+            max_concurrency=self.max_concurrency,
+            max_retries=max_retries,
+            initial_backoff=initial_backoff,
+            max_backoff=max_backoff,
+            retryable=RETRYABLE_ERRORS
+        )
+    
+    def iter_batches(self, texts: Sequence[str]) -> Iterator[Tuple[int, int]]:
+        """
+        Split texts into batches bounded by batch_size and max_batch_tokens.
+        
+        Args:
+            texts: Texts to embed
+            
+        Yields:
+            (start, end) index ranges into texts
+        """
+        start = 0
+        tokens = 0
+        for i, text in enumerate(texts):
+            text_tokens = estimate_tokens(text)
+            if i > start and (i - start >= self.batch_size or tokens + text_tokens > self.max_batch_tokens):
+                yield start, i
+                start = i
+                tokens = 0
+            tokens += text_tokens
+        if start < len(texts):
+            yield start, len(texts)
+    
+    def _embed_batch(self, texts: List[str], task_type: str, priority: str = BULK) -> List[List[float]]:
+        """Embed one batch through the scheduler, which retries only this batch when throttled"""
+        tokens = sum(estimate_tokens(text) for text in texts)
+        METRICS.inc("tokens", tokens, api="embed", direction="input")
+        METRICS.inc("api_calls", api="embed", purpose=task_type)
+        
+        def request():
+            with METRICS.timer("embed"):
+                return self.embed_fn(model=self.model, content=texts, task_type=task_type)
+        
+        return self.scheduler.call(request, tokens=tokens, priority=priority)['embedding']
+    
+    def embed(self, texts: Sequence[str], task_type: str = "retrieval_document", priority: str = BULK) -> np.ndarray:
+        """
+        Embed texts in batches.
+        
+        Args:
+            texts: Texts to embed
+            task_type: Gemini embedding task type
+            priority: Scheduler lane, INTERACTIVE or BULK
+            
+        Returns:
+            float32 array of shape (len(texts), dimension), in input order
+        """
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+        pending = np.arange(len(texts))
+        keys = None
+        
+        if self.cache is not None:
+            keys = [make_key(self.model, "embedding", task_type, text) for text in texts]
+            cached = self.cache.get_vectors(keys)
+            for i, key in enumerate(keys):
+                if key in cached:
+                    embeddings[i] = cached[key]
+            pending = np.array([i for i, key in enumerate(keys) if key not in cached], dtype=np.int64)
+        
+        pending_texts = [texts[i] for i in pending]
+        
+        def run(batch: Tuple[int, int]) -> None:
+            start, end = batch
+            indices = pending[start:end]
+            vectors = self._embed_batch(pending_texts[start:end], task_type, priority)
+            embeddings[indices] = vectors
+            if keys is not None:
+                self.cache.put_vectors({keys[i]: embeddings[i] for i in indices})
+        
+        batches = list(self.iter_batches(pending_texts))
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            # Consume the iterator so exceptions from any batch propagate
+            for _ in executor.map(run, batches):
+                pass
+        
+        return embeddings
@@ -0,0 +1,431 @@
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import json
+import os
+import numpy as np
+
+FORMAT_VERSION = 1
+
+def tokenize(text: str) -> List[str]:
+    """Tokenize text the same way create_bm25_index always has"""
+    return text.lower().split()
+
+class _GrowableArray:
+    """Append-only numpy buffer with amortized O(1) appends"""
+
+    def __init__(self, dtype, data: np.ndarray = None):
+        if data is None:
+            self._data = np.empty(16, dtype=dtype)
+            self._size = 0
+        else:
+            self._data = np.array(data, dtype=dtype)
+            self._size = len(self._data)
+
+    def extend(self, values) -> None:
+        values = np.asarray(values, dtype=self._data.dtype)
+        needed = self._size + len(values)
+        if needed > len(self._data):
+            grown = np.empty(max(needed, 2 * len(self._data)), dtype=self._data.dtype)
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown
+        self._data[self._size:needed] = values
+        self._size = needed
+
+    def view(self) -> np.ndarray:
+        return self._data[:self._size]
+
+    def __len__(self) -> int:
+        return self._size
+
+class LexicalIndex:
+    """
+    Persistent BM25 inverted index.
+
+    Scores are identical to rank_bm25.BM25Okapi (same k1, b, epsilon and idf
+    floor), but postings are stored as sorted numpy arrays so a query only
+    touches the postings of its own terms, and top-k retrieval skips most of
+    the postings of common terms with max-score pruning.
+
+    Documents are added and deleted incrementally. Additions go to an
+    in-memory delta that compact() (or save()) merges into the main arrays;
+    deletions are tombstones until the next compaction. Saved indexes are
+    loaded with memory-mapped postings, without re-tokenizing anything.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25, compact_threshold: int = 50000):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.compact_threshold = compact_threshold
+
+        self.vocab: Dict[str, int] = {}
+        self.terms: List[str] = []
+        self._df = _GrowableArray(np.int64)
+        self._max_tf = _GrowableArray(np.int32)
+
+        # Compacted postings: term t owns docs/tfs[offsets[t]:offsets[t + 1]], sorted by doc
+        self._post_offsets = np.zeros(1, dtype=np.int64)
+        self._post_docs = np.empty(0, dtype=np.int32)
+        self._post_tfs = np.empty(0, dtype=np.int32)
+        # Compacted forward index (unique term ids per doc), needed to update df on delete
+        self._fwd_offsets = np.zeros(1, dtype=np.int64)
+        self._fwd_terms = np.empty(0, dtype=np.int32)
+        self._compacted_docs = 0
+
+        # Delta since the last compaction
+        self._delta_postings: Dict[int, Tuple[List[int], List[int]]] = {}
+        self._delta_forward: List[np.ndarray] = []
+
+        # Per-document columns, indexed by internal document number
+        self._doc_ids = _GrowableArray(np.int64)
+        self._lengths = _GrowableArray(np.int32)
+        self._deleted = _GrowableArray(np.bool_)
+        self._id_map: Optional[Dict[int, int]] = None
+
+        self.live_docs = 0
+        self.total_length = 0
+        self._idf_cache = None
+
+    def __len__(self) -> int:
+        return self.live_docs
+
+    # --- Updates ---
+
+    def add_documents(self, doc_ids: Iterable[int], documents: Iterable[Union[str, Sequence[str]]]) -> None:
+        """
+        Add documents to the index. Re-adding an existing id replaces it.
+
+        Args:
+            doc_ids: External integer ids (e.g. chunk ids)
+            documents: Texts, or already tokenized documents
+        """
+        for doc_id, document in zip(doc_ids, documents):
+            doc_id = int(doc_id)
+            tokens = tokenize(document) if isinstance(document, str) else document
+            self.delete(doc_id)
+
+            internal = len(self._doc_ids)
+            counts = Counter(tokens)
+            term_ids = np.empty(len(counts), dtype=np.int32)
+            tfs = np.empty(len(counts), dtype=np.int32)
+            for i, (term, tf) in enumerate(counts.items()):
+                term_id = self.vocab.get(term)
+                if term_id is None:
+                    term_id = len(self.terms)
+                    self.vocab[term] = term_id
+                    self.terms.append(term)
+                    self._df.extend([0])
+                    self._max_tf.extend([0])
+                docs, term_tfs = self._delta_postings.setdefault(term_id, ([], []))
+                docs.append(internal)
+                term_tfs.append(tf)
+                term_ids[i] = term_id
+                tfs[i] = tf
+
+            self._df.view()[term_ids] += 1
+            max_tf = self._max_tf.view()
+            max_tf[term_ids] = np.maximum(max_tf[term_ids], tfs)
+            self._delta_forward.append(term_ids)
+
+            self._doc_ids.extend([doc_id])
+            self._lengths.extend([len(tokens)])
+            self._deleted.extend([False])
+            if self._id_map is not None:
+                self._id_map[doc_id] = internal
+            self.live_docs += 1
+            self.total_length += len(tokens)
+
+        self._idf_cache = None
+        if len(self._delta_forward) >= self.compact_threshold:
+            self.compact()
+
+    def add(self, doc_id: int, document: Union[str, Sequence[str]]) -> None:
+        """Add a single document"""
+        self.add_documents([doc_id], [document])
+
+    def delete(self, doc_id: int) -> bool:
+        """
+        Delete a document.
+
+        Args:
+            doc_id: External id passed to add_documents
+
+        Returns:
+            True if the document was in the index
+        """
+        if self._id_map is None:
+            self._id_map = {int(d): i for i, d in enumerate(self._doc_ids.view()) if not self._deleted.view()[i]}
+        internal = self._id_map.pop(int(doc_id), None)
+        if internal is None:
+            return False
+
+        self._deleted.view()[internal] = True
+        self._df.view()[self._doc_terms(internal)] -= 1
+        self.live_docs -= 1
+        self.total_length -= int(self._lengths.view()[internal])
+        self._idf_cache = None
+        return True
+
+    def _doc_terms(self, internal: int) -> np.ndarray:
+        if internal < self._compacted_docs:
+            return self._fwd_terms[self._fwd_offsets[internal]:self._fwd_offsets[internal + 1]]
+        return self._delta_forward[internal - self._compacted_docs]
+
+    def compact(self) -> None:
+        """Merge the delta into the main arrays and drop deleted documents"""
+        num_terms = len(self.terms)
+        base_counts = np.diff(self._post_offsets)
+        base_terms = np.repeat(np.arange(len(base_counts), dtype=np.int32), base_counts)
+        delta_terms = [np.full(len(docs), t, dtype=np.int32) for t, (docs, _) in self._delta_postings.items()]
+        delta_docs = [np.asarray(docs, dtype=np.int32) for docs, _ in self._delta_postings.values()]
+        delta_tfs = [np.asarray(tfs, dtype=np.int32) for _, tfs in self._delta_postings.values()]
+        terms = np.concatenate([base_terms] + delta_terms)
+        docs = np.concatenate([np.asarray(self._post_docs)] + delta_docs)
+        tfs = np.concatenate([np.asarray(self._post_tfs)] + delta_tfs)
+
+        # Drop deleted documents and renumber the survivors densely
+        live = ~self._deleted.view()
+        renumber = np.cumsum(live, dtype=np.int64) - 1
+        keep = live[docs]
+        terms, docs, tfs = terms[keep], renumber[docs[keep]].astype(np.int32), tfs[keep]
+
+        order = np.lexsort((docs, terms))
+        self._post_docs = docs[order]
+        self._post_tfs = tfs[order]
+        self._post_offsets = np.zeros(num_terms + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=num_terms), out=self._post_offsets[1:])
+
+        live_count = int(live.sum())
+        order = np.lexsort((terms, docs))
+        self._fwd_terms = terms[order]
+        self._fwd_offsets = np.zeros(live_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(docs, minlength=live_count), out=self._fwd_offsets[1:])
+        self._compacted_docs = live_count
+
+        max_tf = np.zeros(num_terms, dtype=np.int32)
+        np.maximum.at(max_tf, terms, tfs)
+        self._max_tf = _GrowableArray(np.int32, max_tf)
+
+        self._doc_ids = _GrowableArray(np.int64, self._doc_ids.view()[live])
+        self._lengths = _GrowableArray(np.int32, self._lengths.view()[live])
+        self._deleted = _GrowableArray(np.bool_, np.zeros(live_count, dtype=np.bool_))
+        self._delta_postings = {}
+        self._delta_forward = []
+        self._id_map = None
+
+    # --- Scoring ---
+
+    def _idf(self) -> np.ndarray:
+        """Per-term idf with BM25Okapi's epsilon floor for negative values"""
+        if self._idf_cache is None:
+            df = self._df.view()
+            present = df > 0
+            idf = np.zeros(len(df), dtype=np.float64)
+            idf[present] = np.log(self.live_docs - df[present] + 0.5) - np.log(df[present] + 0.5)
+            average_idf = idf[present].sum() / present.sum() if present.any() else 0.0
+            idf[present & (idf < 0)] = self.epsilon * average_idf
+            self._idf_cache = idf
+        return self._idf_cache
+
+    def _postings(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Postings of a term, sorted by internal document number"""
+        docs = self._post_docs[self._post_offsets[term_id]:self._post_offsets[term_id + 1]] \
+            if term_id < len(self._post_offsets) - 1 else np.empty(0, dtype=np.int32)
+        tfs = self._post_tfs[self._post_offsets[term_id]:self._post_offsets[term_id + 1]] \
+            if term_id < len(self._post_offsets) - 1 else np.empty(0, dtype=np.int32)
+        delta = self._delta_postings.get(term_id)
+        if delta:
+            # Delta documents are numbered after every compacted one, so order is preserved
+            docs = np.concatenate([docs, np.asarray(delta[0], dtype=np.int32)])
+            tfs = np.concatenate([tfs, np.asarray(delta[1], dtype=np.int32)])
+        return docs, tfs
+
+    def _query_weights(self, query: Union[str, Sequence[str]]) -> Dict[int, float]:
+        """idf weight per query term; repeated tokens count repeatedly, like BM25Okapi"""
+        tokens = tokenize(query) if isinstance(query, str) else query
+        idf = self._idf()
+        weights = {}
+        for token in tokens:
+            term_id = self.vocab.get(token)
+            if term_id is not None and self._df.view()[term_id] > 0:
+                weights[term_id] = weights.get(term_id, 0.0) + idf[term_id]
+        return weights
+
+    def _term_scores(self, weight: float, docs: np.ndarray, tfs: np.ndarray, avgdl: float) -> np.ndarray:
+        lengths = self._lengths.view()[docs]
+        return weight * (tfs * (self.k1 + 1) / (tfs + self.k1 * (1 - self.b + self.b * lengths / avgdl)))
+
+    def get_scores(self, query: Union[str, Sequence[str]]) -> np.ndarray:
+        """
+        Exhaustive BM25 scores, equivalent to BM25Okapi.get_scores.
+
+        Args:
+            query: Query text or tokens
+
+        Returns:
+            Score per live document, in insertion order
+        """
+        scores = np.zeros(len(self._doc_ids), dtype=np.float64)
+        if self.live_docs:
+            avgdl = self.total_length / self.live_docs
+            for term_id, weight in self._query_weights(query).items():
+                docs, tfs = self._postings(term_id)
+                scores[docs] += self._term_scores(weight, docs, tfs, avgdl)
+        return scores[~self._deleted.view()]
+
+    def search(self, query: Union[str, Sequence[str]], top_k: int = 10) -> List[Tuple[int, float]]:
+        """
+        Top-k BM25 search with max-score pruning.
+
+        Terms are processed from the highest score upper bound down. Once the
+        upper bounds of the remaining terms add up to less than the current
+        k-th best score, no unseen document can enter the top k, so the
+        remaining (typically very common) terms only update existing
+        candidates through binary search instead of scanning their postings.
+
+        Args:
+            query: Query text or tokens
+            top_k: Number of results
+
+        Returns:
+            List of (doc_id, score) tuples, best first; only documents that
+            match at least one query term are returned
+        """
+        weights = self._query_weights(query)
+        if not weights or not self.live_docs or top_k <= 0:
+            return []
+        if any(weight < 0 for weight in weights.values()):
+            # Bounds only hold for non-negative weights (possible on tiny corpora)
+            return self._exhaustive_search(query, top_k)
+
+        avgdl = self.total_length / self.live_docs
+        min_length = int(self._lengths.view().min())
+        max_tf = self._max_tf.view()
+        term_ids = list(weights)
+        upper_bounds = np.array([
+            weights[t] * max_tf[t] * (self.k1 + 1)
+            / (max_tf[t] + self.k1 * (1 - self.b + self.b * min_length / avgdl))
+            for t in term_ids
+        ])
+        order = np.argsort(-upper_bounds)
+        remaining = np.concatenate([np.cumsum(upper_bounds[order][::-1])[::-1][1:], [0.0]])
+
+        deleted = self._deleted.view()
+        cand_docs = np.empty(0, dtype=np.int32)
+        cand_scores = np.empty(0, dtype=np.float64)
+        pruning = False
+        for position, i in enumerate(order):
+            term_id = term_ids[i]
+            docs, tfs = self._postings(term_id)
+            if not pruning:
+                live = ~deleted[docs]
+                docs, tfs = docs[live], tfs[live]
+                all_docs = np.concatenate([cand_docs, docs])
+                all_scores = np.concatenate([cand_scores, self._term_scores(weights[term_id], docs, tfs, avgdl)])
+                cand_docs, inverse = np.unique(all_docs, return_inverse=True)
+                cand_scores = np.bincount(inverse, weights=all_scores, minlength=len(cand_docs))
+                threshold = np.partition(cand_scores, -top_k)[-top_k] if len(cand_scores) >= top_k else 0.0
+                pruning = remaining[position] < threshold
+            elif len(docs):
+                idx = np.searchsorted(docs, cand_docs)
+                found = idx < len(docs)
+                found[found] = docs[idx[found]] == cand_docs[found]
+                cand_scores[found] += self._term_scores(weights[term_id], cand_docs[found], tfs[idx[found]], avgdl)
+
+        return self._top_k(cand_docs, cand_scores, top_k)
+
+    def _exhaustive_search(self, query, top_k: int) -> List[Tuple[int, float]]:
+        scores = np.zeros(len(self._doc_ids), dtype=np.float64)
+        matched = np.zeros(len(self._doc_ids), dtype=np.bool_)
+        avgdl = self.total_length / self.live_docs
+        for term_id, weight in self._query_weights(query).items():
+            docs, tfs = self._postings(term_id)
+            scores[docs] += self._term_scores(weight, docs, tfs, avgdl)
+            matched[docs] = True
+        cand_docs = np.flatnonzero(matched & ~self._deleted.view())
+        return self._top_k(cand_docs, scores[cand_docs], top_k)
+
+    def _top_k(self, cand_docs: np.ndarray, cand_scores: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        if len(cand_docs) > top_k:
+            best = np.argpartition(-cand_scores, top_k - 1)[:top_k]
+        else:
+            best = np.arange(len(cand_docs))
+        best = best[np.argsort(-cand_scores[best], kind="stable")]
+        doc_ids = self._doc_ids.view()
+        return [(int(doc_ids[cand_docs[i]]), float(cand_scores[i])) for i in best]
+
+    # --- Persistence ---
+
+    def save(self, path: str) -> None:
+        """
+        Compact and write the index to a directory.
+
+        Args:
+            path: Output directory
+        """
+        self.compact()
+        os.makedirs(path, exist_ok=True)
+        arrays = {
+            "post_offsets": self._post_offsets,
+            "post_docs": self._post_docs,
+            "post_tfs": self._post_tfs,
+            "fwd_offsets": self._fwd_offsets,
+            "fwd_terms": self._fwd_terms,
+            "df": self._df.view(),
+            "max_tf": self._max_tf.view(),
+            "doc_ids": self._doc_ids.view(),
+            "lengths": self._lengths.view(),
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(path, f"{name}.npy"), array)
+        with open(os.path.join(path, "terms.json"), "w") as f:
+            json.dump(self.terms, f)
+        # Written last, so a partially written index is never loadable
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({
+                "version": FORMAT_VERSION,
+                "k1": self.k1,
+                "b": self.b,
+                "epsilon": self.epsilon,
+                "live_docs": self.live_docs,
+                "total_length": self.total_length
+            }, f)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "LexicalIndex":
+        """
+        Load an index written by save().
+
+        Args:
+            path: Index directory
+            mmap: Memory-map the postings and forward index instead of reading them
+
+        Returns:
+            LexicalIndex ready for queries and further updates
+        """
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported lexical index version: {meta['version']}")
+
+        def load_array(name, mapped):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap and mapped else None)
+
+        index = cls(k1=meta["k1"], b=meta["b"], epsilon=meta["epsilon"])
+        with open(os.path.join(path, "terms.json")) as f:
+            index.terms = json.load(f)
+        index.vocab = {term: i for i, term in enumerate(index.terms)}
+        index._post_offsets = load_array("post_offsets", True)
+        index._post_docs = load_array("post_docs", True)
+        index._post_tfs = load_array("post_tfs", True)
+        index._fwd_offsets = load_array("fwd_offsets", True)
+        index._fwd_terms = load_array("fwd_terms", True)
+        index._df = _GrowableArray(np.int64, load_array("df", False))
+        index._max_tf = _GrowableArray(np.int32, load_array("max_tf", False))
+        index._doc_ids = _GrowableArray(np.int64, load_array("doc_ids", False))
+        index._lengths = _GrowableArray(np.int32, load_array("lengths", False))
+        index._deleted = _GrowableArray(np.bool_, np.zeros(len(index._doc_ids), dtype=np.bool_))
+        index._compacted_docs = len(index._doc_ids)
+        index.live_docs = meta["live_docs"]
+        index.total_length = meta["total_length"]
+        return index
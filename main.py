@@ -1,11 +1,49 @@
+from ann_index import (
+    BINARY_INDEX, EMBEDDING_INDEX, STORAGE_TYPES, describe_embedding_index,
+    rebuild_binary_index, rebuild_embedding_index, set_embedding_storage
+)
+from batch_ask import BatchAsker
 import click
 from config import Config
+from db import DBSession, get_engine
+from metrics import METRICS, profile_run
 from rag import RAG
+from worker import QueueWorker, share_quotas
+import json
+import os
 
-@click.command()
+def parse_filters(filters) -> dict:
+    """Turn KEY=VALUE options into a metadata filter; values are parsed as JSON when possible"""
+    parsed = {}
+    for item in filters:
+        key, sep, value = item.partition("=")
+        if not sep or not key:
+            raise click.BadParameter(f"expected KEY=VALUE, got {item!r}", param_hint="--filter")
+        try:
+            parsed[key] = json.loads(value)
+        except ValueError:
+            parsed[key] = value
+    return parsed or None
+
+@click.group(invoke_without_command=True)
 @click.option('--process-docs', is_flag=True, help='Process and store documents in the database.')
+@click.option('--process-pdf', type=click.Path(exists=True), help='Process and store a PDF file, or every PDF in a directory.')
+@click.option('--resume', type=int, metavar='JOB_ID', help='Continue an interrupted --process-docs/--process-pdf ingestion job.')
 @click.option('--ask', type=str, help='Search for similar chunks to the given query.')
-def main(process_docs, ask):
+@click.option('--ask-file', type=click.Path(exists=True, dir_okay=False), help='Answer every question in a JSONL file ({"id": ..., "question": ...} per line).')
+@click.option('--output', type=click.Path(dir_okay=False), help='JSONL file --ask-file appends answers to; questions already in it are skipped (default: <ask-file>.answers.jsonl).')
+@click.option('--filter', 'filters', multiple=True, metavar='KEY=VALUE', help='Only retrieve chunks whose metadata has this value (repeatable).')
+@click.option('--search-mode', type=click.Choice(['vector', 'hybrid', 'binary']), help='Retrieval mode for --ask and --ask-file (default: SEARCH_MODE).')
+@click.option('--metrics-report', type=click.Path(dir_okay=False), help='Write stage timings, API/token counts and DB throughput of this run to a JSON file.')
+@click.option('--profile', type=click.Path(dir_okay=False), help='Profile this run with cProfile, print the hottest functions and dump the profile to this file.')
+@click.pass_context
+def main(ctx, process_docs, process_pdf, resume, ask, ask_file, output, filters, search_mode, metrics_report, profile):
+    if metrics_report:
+        ctx.call_on_close(lambda: METRICS.write_report(metrics_report))
+    if profile:
+        ctx.with_resource(profile_run(profile))
+    if ctx.invoked_subcommand is not None:
+        return
     config = Config()
     if not config.GEMINI_API_KEY:
         raise ValueError("GEMINI_API_KEY is not set in the environment variables.")
@@ -52,13 +90,163 @@ def main(process_docs, ask):
         )
     ]
 
+    filters = parse_filters(filters)
     rag_processor = RAG(config)
     if process_docs:
         rag_processor.process_documents(raw_documents)
+    if process_pdf:
+        rag_processor.process_pdfs(process_pdf)
+    if resume:
+        rag_processor.resume_job(resume, raw_documents)
     if ask:
-        contexts = rag_processor.search_similar(ask, top_k=5)
+        contexts = rag_processor.search_similar(ask, top_k=5, mode=search_mode, filters=filters)
         answer = rag_processor.ask_llm(ask, contexts)
         print(f"Answer: {answer}")
+    if ask_file:
+        output = output or os.path.splitext(ask_file)[0] + ".answers.jsonl"
+        asker = BatchAsker(
+            rag_processor,
+            batch_size=config.ASK_BATCH_SIZE,
+            concurrency=config.ASK_CONCURRENCY,
+            mode=search_mode,
+            filters=filters)
+        stats = asker.run(ask_file, output)
+        print(f"Wrote answers to {output}: {stats['answered']} answered, "
+              f"{stats['failed']} failed, {stats['skipped']} already done.")
+
+@main.command()
+@click.option('--host', default='127.0.0.1', show_default=True, help='Interface to bind.')
+@click.option('--port', default=8080, show_default=True, help='Port to listen on.')
+def serve(host, port):
+    """Run the HTTP/JSON query server (/search, /ask)."""
+    from server import serve as run_server
+    config = Config()
+    if not config.GEMINI_API_KEY:
+        raise ValueError("GEMINI_API_KEY is not set in the environment variables.")
+    run_server(config, host=host, port=port)
+
+@main.group()
+def index():
+    """Manage the chunk embedding (ANN) index."""
+
+@index.command()
+@click.option('--method', type=click.Choice(['ivfflat', 'hnsw']), help='Index type (default: ANN_INDEX_METHOD).')
+@click.option('--lists', type=int, help='ivfflat lists (default: rows/1000, or sqrt(rows) above 1M rows).')
+@click.option('--m', type=int, help='HNSW connections per node (default: HNSW_M).')
+@click.option('--ef-construction', type=int, help='HNSW build candidate list size (default: HNSW_EF_CONSTRUCTION).')
+@click.option('--concurrently', is_flag=True, help='Build next to the existing index without blocking writes.')
+def rebuild(method, lists, m, ef_construction, concurrently):
+    """Rebuild the embedding index after a bulk load."""
+    config = Config()
+    info = rebuild_embedding_index(
+        config.DATABASE_URL,
+        method=method or config.ANN_INDEX_METHOD,
+        lists=lists,
+        m=m or config.HNSW_M,
+        ef_construction=ef_construction or config.HNSW_EF_CONSTRUCTION,
+        maintenance_work_mem=config.INDEX_MAINTENANCE_WORK_MEM or None,
+        concurrently=concurrently)
+    print(f"Indexed {info['rows']} rows ({info['size']}): {info['definition']}")
+
+@index.command('rebuild-binary')
+@click.option('--m', type=int, help='HNSW connections per node (default: HNSW_M).')
+@click.option('--ef-construction', type=int, help='HNSW build candidate list size (default: HNSW_EF_CONSTRUCTION).')
+def rebuild_binary(m, ef_construction):
+    """Build (or rebuild) the binary-quantized index used by --search-mode binary."""
+    config = Config()
+    info = rebuild_binary_index(
+        config.DATABASE_URL,
+        config.EMBEDDING_DIMENSION,
+        m=m or config.HNSW_M,
+        ef_construction=ef_construction or config.HNSW_EF_CONSTRUCTION)
+    print(f"{info['definition']} ({info['size']})")
+
+@index.command()
+@click.argument('storage', type=click.Choice(list(STORAGE_TYPES)))
+def storage(storage):
+    """Convert stored embeddings to vector (float32) or halfvec (float16)."""
+    config = Config()
+    with get_engine(config.DATABASE_URL).begin() as connection:
+        converted = set_embedding_storage(connection, storage, config.EMBEDDING_DIMENSION)
+    print(f"Embeddings {'converted to' if converted else 'already stored as'} {storage}.")
+    if converted and storage != config.EMBEDDING_STORAGE:
+        print(f"Set EMBEDDING_STORAGE={storage} to match.")
+
+@index.command()
+def info():
+    """Show the current embedding indexes."""
+    config = Config()
+    for name in (EMBEDDING_INDEX, BINARY_INDEX):
+        info = describe_embedding_index(config.DATABASE_URL, name)
+        if info is None:
+            print(f"No {name} index.")
+        else:
+            print(f"{info['definition']} ({info['size']})")
+
+@main.command()
+@click.argument('job_id', type=int)
+def job(job_id):
+    """Show the status and progress of an ingestion job."""
+    info = RAG(Config()).get_job(job_id)
+    if info is None:
+        raise click.ClickException(f"No ingestion job {job_id}")
+    print(json.dumps(info, indent=2, default=str))
+
+@main.group()
+def queue():
+    """Queue documents for `worker` processes."""
+
+@queue.command('add')
+@click.argument('path', type=click.Path(exists=True))
+def queue_add(path):
+    """Queue a PDF file, or every PDF in a directory, as one ingestion job."""
+    RAG(Config()).enqueue_pdfs(path)
+
+@queue.command('status')
+def queue_status():
+    """Show queued tasks by status."""
+    config = Config()
+    with DBSession(config.DATABASE_URL) as session:
+        counts = session.queue_counts()
+    for status in ("pending", "running", "done", "failed"):
+        print(f"{status:<8} {counts.get(status, 0)}")
+
+@main.command()
+@click.option('--batch-size', type=int, help='Documents claimed at a time (default: WORKER_BATCH_SIZE).')
+@click.option('--lease', type=int, help='Lease in seconds (default: WORKER_LEASE_SECONDS).')
+@click.option('--max-tasks', type=int, help='Exit after claiming this many documents.')
+@click.option('--exit-when-empty', is_flag=True, help='Exit when the queue is empty instead of waiting for work.')
+@click.option('--name', help='Worker name recorded on claimed tasks (default: host:pid).')
+@click.option('--workers', type=int, help='Worker processes sharing the API quotas; each keeps to its share (default: WORKER_COUNT).')
+def worker(batch_size, lease, max_tasks, exit_when_empty, name, workers):
+    """Ingest queued documents; run any number of these, on any hosts."""
+    config = share_quotas(Config(), workers or Config.WORKER_COUNT)
+    if not config.GEMINI_API_KEY:
+        raise ValueError("GEMINI_API_KEY is not set in the environment variables.")
+    QueueWorker(
+        RAG(config),
+        name=name,
+        batch_size=batch_size or config.WORKER_BATCH_SIZE,
+        lease_seconds=lease or config.WORKER_LEASE_SECONDS,
+        poll_seconds=config.WORKER_POLL_SECONDS
+    ).run(max_tasks=max_tasks, exit_when_empty=exit_when_empty)
+
+@main.group()
+def snapshot():
+    """Move a knowledge base between Postgres and snapshot files."""
+
+@snapshot.command('export')
+@click.argument('path', type=click.Path(exists=False))
+@click.option('--dtype', type=click.Choice(['float32', 'float16']), default='float32', show_default=True, help='Embedding precision in the snapshot.')
+def export_snapshot(path, dtype):
+    """Write every stored chunk to a new snapshot directory."""
+    RAG(Config()).export_snapshot(path, embedding_dtype=dtype)
+
+@snapshot.command('import')
+@click.argument('path', type=click.Path(exists=True, file_okay=False))
+def import_snapshot(path):
+    """Load a snapshot directory into Postgres."""
+    RAG(Config()).import_snapshot(path)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
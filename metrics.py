@@ -0,0 +1,208 @@
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+
+PREFIX = "rag"
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in key)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(key, escaped)) + "}"
+
+class Metrics:
+    """
+    Thread-safe registry of counters and stage timers.
+
+    Counters are named, labelled totals (API calls, retries, tokens, rows).
+    Stage timers record the count, total and maximum duration of every timed
+    section. The registry renders as Prometheus text exposition format or as
+    a JSON run report.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        # stage -> [count, total seconds, max seconds]
+        self._stages: Dict[str, list] = {}
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started_at = time.time()
+            self._counters.clear()
+            self._stages.clear()
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """
+        Add to a counter.
+
+        Args:
+            name: Counter name (without the "rag_" prefix and "_total" suffix)
+            value: Amount to add
+            labels: Label values
+        """
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def counter(self, name: str, **labels) -> float:
+        """Current value of a counter (0 if never incremented)"""
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Record one timed run of a stage"""
+        with self._lock:
+            stats = self._stages.setdefault(stage, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+
+    @contextmanager
+    def timer(self, stage: str):
+        """Time the body of a with block as one run of a stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def timed_iter(self, stage: str, iterable: Iterable) -> Iterator:
+        """Yield from an iterable, timing each step as one run of a stage"""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.observe(stage, time.perf_counter() - start)
+            yield item
+
+    def stage(self, stage: str) -> Dict[str, float]:
+        """Count, total and max seconds of a stage"""
+        with self._lock:
+            count, total, longest = self._stages.get(stage, (0, 0.0, 0.0))
+        return {'count': count, 'seconds': total, 'max_seconds': longest}
+
+    # --- Export ---
+
+    def to_prometheus(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        Returns:
+            Exposition text
+        """
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            stages = {stage: list(stats) for stage, stats in self._stages.items()}
+
+        lines = []
+        for name in sorted(counters):
+            metric = f"{PREFIX}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for key, value in sorted(counters[name].items()):
+                lines.append(f"{metric}{_format_labels(key)} {value:g}")
+
+        if stages:
+            metric = f"{PREFIX}_stage_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            for stage in sorted(stages):
+                labels = _format_labels((("stage", stage),))
+                lines.append(f"{metric}_count{labels} {stages[stage][0]}")
+                lines.append(f"{metric}_sum{labels} {stages[stage][1]:.6f}")
+            lines.append(f"# TYPE {metric}_max gauge")
+            for stage in sorted(stages):
+                lines.append(f"{metric}_max{_format_labels((('stage', stage),))} {stages[stage][2]:.6f}")
+        return "\n".join(lines) + "\n"
+
+    def report(self) -> Dict:
+        """
+        Build a JSON-serializable run report: stage timings, counters and
+        derived rates.
+
+        Returns:
+            Report dictionary
+        """
+        with self._lock:
+            counters = {
+                name: {",".join(f"{k}={v}" for k, v in key) or "total": value for key, value in series.items()}
+                for name, series in self._counters.items()
+            }
+            stages = {
+                stage: {'count': count, 'seconds': round(total, 6), 'max_seconds': round(longest, 6)}
+                for stage, (count, total, longest) in self._stages.items()
+            }
+        rows = self.counter("db_rows", operation="write")
+        write_seconds = stages.get("db_write", {}).get("seconds", 0)
+        return {
+            'started_at': self.started_at,
+            'elapsed_seconds': round(time.time() - self.started_at, 6),
+            'stages': stages,
+            'counters': counters,
+            'rates': {
+                'db_rows_per_second': rows / write_seconds if write_seconds else None
+            }
+        }
+
+    def write_report(self, path: str) -> None:
+        """Write report() to a JSON file"""
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+# Process-wide registry used by the instrumented modules
+METRICS = Metrics()
+
+@contextmanager
+def profile_run(path: Optional[str] = None, limit: int = 30):
+    """
+    Profile the body of a with block with cProfile, including threads started
+    inside it (pipeline stages, executor workers), whose profiles are merged.
+
+    Args:
+        path: File to dump the merged profile to (readable with pstats or
+            snakeviz); None to only print the summary
+        limit: Functions listed in the printed summary, by cumulative time
+    """
+    profilers = [cProfile.Profile()]
+    lock = threading.Lock()
+
+    def profile_thread(frame, event, arg):
+        # Runs on the first event of each new thread and replaces itself
+        profiler = cProfile.Profile()
+        with lock:
+            profilers.append(profiler)
+        profiler.enable()
+
+    threading.setprofile(profile_thread)
+    profilers[0].enable()
+    try:
+        yield
+    finally:
+        profilers[0].disable()
+        threading.setprofile(None)
+        with lock:
+            stats = pstats.Stats(profilers[0], stream=io.StringIO())
+            for profiler in profilers[1:]:
+                stats.add(profiler)
+        if path:
+            stats.dump_stats(path)
+            print(f"Wrote profile to {path}")
+        output = io.StringIO()
+        stats.stream = output
+        stats.sort_stats("cumulative").print_stats(limit)
+        print(output.getvalue())
@@ -1,4 +1,6 @@
 from .base import Base
 from .chunk import Chunk
+from .document import Document
+from .job import IngestionJob, IngestionJobItem, IngestionTask
 
-__all__ = ["Base", "Chunk"]
\ No newline at end of file
+__all__ = ["Base", "Chunk", "Document", "IngestionJob", "IngestionJobItem", "IngestionTask"]
@@ -1,27 +1,39 @@
 from .base import Base
-from sqlalchemy import Column, Integer, Text, TIMESTAMP, func, Index
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import Column, Computed, Integer, String, Text, TIMESTAMP, ForeignKey, func, Index
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from pgvector.sqlalchemy import Vector
 
 class Chunk(Base):
     __tablename__ = "chunks"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=True)
     chunk_index = Column(Integer, nullable=False)
     original_text = Column(Text, nullable=False)
     context = Column(Text, nullable=False)
     contextualized_text = Column(Text, nullable=False)
 
-    # 768-dimension vector (Gemini text-embedding-004)
+    # SHA-256 of original_text, used to diff chunks on re-ingestion
+    chunk_hash = Column(String(64))
+
+    # 768-dimension vector (Gemini text-embedding-004). `main.py index storage
+    # halfvec` converts the column to half precision; queries cast to the
+    # configured EMBEDDING_STORAGE type, so the model stays Vector
     embedding = Column(Vector(768))
 
 
     meta = Column("metadata", JSONB)
+
+    # Full-text index over the contextualized text for hybrid search
+    search_vector = Column(TSVECTOR, Computed("to_tsvector('english', contextualized_text)", persisted=True))
     created_at = Column(TIMESTAMP, server_default=func.now())
 
     # --- Indexes (matching your SQL) ---
     __table_args__ = (
-        # vector similarity search (ivfflat + cosine)
+        # vector similarity search (ivfflat + cosine); rebuild it after bulk
+        # loads with `main.py index rebuild`, which sizes lists or switches to HNSW.
+        # The binary-quantized chunks_embedding_bq_idx is an expression index
+        # built with `main.py index rebuild-binary`
         Index(
             "chunks_embedding_idx",
             "embedding",
@@ -36,4 +48,13 @@ class Chunk(Base):
             "metadata",
             postgresql_using="gin"
         ),
+
+        Index("chunks_document_id_idx", "document_id"),
+
+        # full-text GIN index
+        Index(
+            "chunks_search_vector_idx",
+            "search_vector",
+            postgresql_using="gin"
+        ),
     )
\ No newline at end of file
@@ -0,0 +1,18 @@
+from .base import Base
+from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, func
+from sqlalchemy.dialects.postgresql import JSONB
+
+class Document(Base):
+    __tablename__ = "documents"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+
+    # Stable identity of the document (file path, URL or metadata "source")
+    source = Column(Text, nullable=False, unique=True)
+
+    # SHA-256 of the full document text, used to skip unchanged documents
+    content_hash = Column(String(64), nullable=False)
+
+    meta = Column("metadata", JSONB)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,73 @@
+from .base import Base
+from sqlalchemy import Column, ForeignKey, Index, Integer, String, Text, TIMESTAMP, func, text
+from sqlalchemy.dialects.postgresql import JSONB
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+
+    # What was ingested ("documents" or "pdf") and its inputs (e.g. the PDF
+    # path), enough to run the job again with --resume
+    kind = Column(String(32), nullable=False)
+    params = Column(JSONB, nullable=False, server_default="{}")
+
+    # running, completed or failed
+    status = Column(String(16), nullable=False, server_default="running")
+    stats = Column(JSONB)
+    error = Column(Text)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
+class IngestionJobItem(Base):
+    __tablename__ = "ingestion_job_items"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_id = Column(Integer, ForeignKey("ingestion_jobs.id", ondelete="CASCADE"), nullable=False)
+
+    # Document source, as in documents.source
+    source = Column(Text, nullable=False)
+
+    # running until every chunk is written, then done (committed together
+    # with the document fingerprint)
+    status = Column(String(16), nullable=False, server_default="running")
+    chunks_total = Column(Integer, nullable=False, server_default="0")
+
+    # Committed in the same transaction as the chunk rows it counts
+    chunks_written = Column(Integer, nullable=False, server_default="0")
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ingestion_job_items_job_source_idx", "job_id", "source", unique=True),
+    )
+
+class IngestionTask(Base):
+    __tablename__ = "ingestion_tasks"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_id = Column(Integer, ForeignKey("ingestion_jobs.id", ondelete="CASCADE"), nullable=False)
+
+    # Document source, and what a worker needs to read it: {"path": ...} for
+    # a PDF, {"text": ..., "metadata": ...} for a text document
+    source = Column(Text, nullable=False)
+    payload = Column(JSONB, nullable=False)
+
+    # pending, running (leased to worker until lease_until), done or failed
+    status = Column(String(16), nullable=False, server_default="pending")
+    attempts = Column(Integer, nullable=False, server_default="0")
+    max_attempts = Column(Integer, nullable=False, server_default="3")
+    worker = Column(Text)
+    lease_until = Column(TIMESTAMP)
+    error = Column(Text)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ingestion_tasks_job_source_idx", "job_id", "source", unique=True),
+        # Claiming scans only unfinished tasks
+        Index(
+            "ingestion_tasks_claim_idx",
+            "status", "id",
+            postgresql_where=text("status IN ('pending', 'running')")
+        ),
+    )
@@ -1,5 +1,103 @@
 from pypdf import PdfReader
-from typing import Generator
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from typing import Callable, Generator, Iterable, List, Tuple
+import os
+
+def _extract_pages(file_path: str, start: int, end: int) -> List[str]:
+    """Extract the text of pages [start, end) of a PDF (runs in a worker process)"""
+    with PdfReader(file_path) as reader:
+        return [reader.pages[i].extract_text() + "\n" for i in range(start, end)]
+
+def _iter_shards(file_paths: Iterable[str], pages_per_shard: int) -> Generator[Tuple[str, int, int], None, None]:
+    """Split PDFs into (file_path, start, end) page ranges"""
+    for file_path in file_paths:
+        with PdfReader(file_path) as reader:
+            total_pages = len(reader.pages)
+        if total_pages == 0:
+            yield file_path, 0, 0
+        for start in range(0, total_pages, pages_per_shard):
+            yield file_path, start, min(total_pages, start + pages_per_shard)
+
+def _ordered_map(fn: Callable, items: Iterable[Tuple], workers: int) -> Generator:
+    """
+    Run fn(*item) across a process pool and yield (item, result) in input order.
+    At most 2 * workers items are in flight, which bounds buffered results.
+    """
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending = deque()
+        for item in items:
+            pending.append((item, executor.submit(fn, *item)))
+            if len(pending) >= workers * 2:
+                item, future = pending.popleft()
+                yield item, future.result()
+        while pending:
+            item, future = pending.popleft()
+            yield item, future.result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def iter_pdf_texts(
+    file_paths: Iterable[str],
+    workers: int = None,
+    pages_per_shard: int = 16
+) -> Generator[Tuple[str, str], None, None]:
+    """
+    Extract the text of several PDFs in parallel.
+    
+    Page ranges of every file are sharded across one process pool, so both a
+    single large file and a directory of small files keep all workers busy.
+    
+    Args:
+        file_paths: PDF file paths
+        workers: Number of worker processes (default: CPU count)
+        pages_per_shard: Pages extracted per task
+    
+    Yields:
+        (file_path, text) tuples in input order
+    """
+    workers = workers or os.cpu_count() or 1
+    current_path = None
+    pages = []
+    for (file_path, _, _), shard_pages in _ordered_map(
+            _extract_pages, _iter_shards(file_paths, pages_per_shard), workers):
+        if file_path != current_path:
+            if current_path is not None:
+                yield current_path, "".join(pages)
+            current_path = file_path
+            pages = []
+        pages.extend(shard_pages)
+    if current_path is not None:
+        yield current_path, "".join(pages)
+
+def pdf_metadata(file_path: str) -> dict:
+    """Document metadata of an ingested PDF"""
+    return {
+        "source": file_path,
+        "file_name": os.path.basename(file_path),
+        "document_type": "pdf"
+    }
+
+def iter_pdf_paths(path: str) -> Generator[str, None, None]:
+    """
+    Yield PDF file paths: the path itself if it is a file, otherwise every
+    .pdf file under the directory in sorted order.
+    
+    Args:
+        path: PDF file or directory
+    
+    Yields:
+        Absolute PDF file paths
+    """
+    if os.path.isfile(path):
+        yield os.path.abspath(path)
+        return
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(".pdf"):
+                yield os.path.abspath(os.path.join(root, name))
 
 class PdfParser:
     def __init__(self, file_path: str):
@@ -39,4 +137,21 @@ class PdfParser:
         """
         with PdfReader(self.file_path) as reader:
             for page in reader.pages:
-                yield page.extract_text() + "\n"
\ No newline at end of file
+                yield page.extract_text() + "\n"
+    
+    def read_pages_parallel(self, workers: int = None, pages_per_shard: int = 16) -> Generator[str, None, None]:
+        """
+        Generator that yields text from each PDF page individually, extracting
+        page ranges in a pool of worker processes.
+        
+        Args:
+            workers: Number of worker processes (default: CPU count)
+            pages_per_shard: Pages extracted per task
+        
+        Yields:
+            Text content from one page at a time, in page order
+        """
+        workers = workers or os.cpu_count() or 1
+        for _, shard_pages in _ordered_map(
+                _extract_pages, _iter_shards([self.file_path], pages_per_shard), workers):
+            yield from shard_pages
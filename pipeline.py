@@ -0,0 +1,389 @@
+from cache import hash_text
+from db import DBSession
+from text_chunk import DocumentContextSession
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import queue
+import threading
+import time
+
+# Sentinel marking the end of a stage's input
+_DONE = object()
+
+class PipelineStopped(Exception):
+    """Raised inside a stage when another stage has failed"""
+
+@dataclass(eq=False)
+class DocumentJob:
+    """A document being ingested, shared by every stage that handles its chunks"""
+    source: str
+    text: str
+    metadata: Dict
+    content_hash: str
+    document_id: int
+    kept: List[Dict] = field(default_factory=list)
+    stale_ids: List[int] = field(default_factory=list)
+    remaining: int = 0
+    pending_groups: int = 0
+    missing_contexts: int = 0
+    context_session: Optional[DocumentContextSession] = None
+
+class IngestionPipeline:
+    """
+    Streaming ingestion: document -> chunk -> context -> embed -> database.
+
+    The caller's thread fingerprints and diffs each document against the
+    database; context generation, embedding and writing run in their own
+    threads connected by bounded queues, so a slow stage blocks the ones
+    feeding it instead of letting work pile up in memory. Only the document
+    currently being planned (its full text, which context generation needs)
+    and the chunks in flight are held at any time.
+
+    A document's fingerprint is only recorded once all of its chunks have been
+    written, so an interrupted run re-processes (and, thanks to chunk diffing,
+    only completes) the documents it did not finish.
+
+    With a job_id, progress is checkpointed in the job's items: every write
+    commits the chunk rows together with the per-document count of chunks
+    written, at least every checkpoint_seconds, and a finished document is
+    marked done with its fingerprint. Documents already done in the job are
+    skipped without being chunked.
+    """
+
+    def __init__(self, rag, queue_size: int = 256, job_id: int = None, checkpoint_seconds: float = 5.0):
+        self.rag = rag
+        self.preprocessor = rag.preprocessor
+        self.config = rag.config
+        self.context_queue = queue.Queue(maxsize=queue_size)
+        self.embed_queue = queue.Queue(maxsize=queue_size)
+        self.write_queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._flush_on_stop = True
+        self._lock = threading.Lock()
+        self._active_context_workers = 0
+        # Context sessions (and their cached documents) of documents with
+        # context requests still to run
+        self._open_sessions = set()
+        self.job_id = job_id
+        self.checkpoint_seconds = checkpoint_seconds
+        self.error = None
+        self.stats = {'documents': 0, 'skipped': 0, 'chunks_written': 0, 'chunks_deleted': 0}
+
+    def _put(self, q: queue.Queue, item: Any) -> None:
+        """Put with backpressure, giving up if the pipeline is stopping"""
+        while True:
+            if self._stop.is_set():
+                raise PipelineStopped()
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q: queue.Queue, timeout: float = None) -> Any:
+        """Get, giving up if the pipeline is stopping; raises queue.Empty after timeout"""
+        waited = 0.0
+        while True:
+            if self._stop.is_set():
+                raise PipelineStopped()
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                waited += 0.1
+                if timeout is not None and waited >= timeout:
+                    raise
+
+    def stop(self, error: BaseException, flush: bool = True) -> None:
+        """
+        Stop the pipeline from any thread; run() then raises error.
+
+        Args:
+            error: Exception for run() to raise (the first one given wins)
+            flush: Write the chunks already embedded before stopping; pass
+                False when they may no longer be written
+        """
+        with self._lock:
+            if self.error is None:
+                self.error = error
+            if not flush:
+                self._flush_on_stop = False
+        self._stop.set()
+
+    def _run_stage(self, target, *args) -> None:
+        try:
+            target(*args)
+        except PipelineStopped:
+            pass
+        except BaseException as e:
+            self.stop(e)
+
+    def run(self, documents: Iterable[Tuple[str, Dict]]) -> Dict[str, int]:
+        """
+        Ingest documents.
+
+        Args:
+            documents: Iterable of (document_text, metadata) tuples; it is
+                consumed lazily, one document at a time
+
+        Returns:
+            Dictionary of counters (documents, skipped, chunks_written, chunks_deleted)
+        """
+        workers = self.preprocessor.max_concurrency
+        self._active_context_workers = workers
+        threads = [
+            threading.Thread(target=self._run_stage, args=(self._context_stage,), daemon=True)
+            for _ in range(workers)
+        ]
+        threads.append(threading.Thread(target=self._run_stage, args=(self._embed_stage,), daemon=True))
+        threads.append(threading.Thread(target=self._run_stage, args=(self._write_stage,), daemon=True))
+        for thread in threads:
+            thread.start()
+
+        def plan():
+            with DBSession(self.config.DATABASE_URL) as session:
+                done = session.get_job_sources(self.job_id) if self.job_id is not None else set()
+                for i, (text, metadata) in enumerate(documents):
+                    metadata = metadata or {}
+                    source = metadata.get('source') or hash_text(text)
+                    print(f"\n=== Processing document {i+1}: {source} ===")
+                    if source in done:
+                        print(f"Already ingested by job {self.job_id}, skipping.")
+                        self.stats['skipped'] += 1
+                        continue
+                    self._plan_document(session, source, text, metadata)
+            for _ in range(workers):
+                self._put(self.context_queue, _DONE)
+
+        self._run_stage(plan)
+        for thread in threads:
+            thread.join()
+        # A stopped pipeline leaves the sessions of unfinished documents open
+        for context_session in self._open_sessions:
+            context_session.close()
+        self._open_sessions.clear()
+
+        if self.error is not None:
+            raise self.error
+        return self.stats
+
+    def _plan_document(self, session: DBSession, source: str, text: str, metadata: Dict) -> None:
+        """Diff a document against the database and feed its new chunks to the pipeline"""
+        content_hash = hash_text(text)
+        document = session.get_document(source)
+        if document is not None and document.content_hash == content_hash:
+            print("Document unchanged, skipping.")
+            self.stats['skipped'] += 1
+            if self.job_id is not None:
+                session.finish_job_item(self.job_id, source)
+                session.commit()
+            return
+
+        if document is None:
+            # An empty fingerprint marks the document as not fully ingested yet
+            document = session.upsert_document(source, "", metadata)
+            session.commit()
+
+        # The whole text is kept either way: it is hashed above and every
+        # context request for the document sends it as the prompt prefix, so
+        # chunking it in place costs no more than streaming it through
+        # iter_chunks would
+        chunks = self.preprocessor.chunk_document(text, metadata)
+
+        # Match current chunks against stored ones by hash; a repeated chunk
+        # text consumes one stored row per occurrence. Rows stored without a
+        # context (a failed request) are replaced, so their context is retried
+        stored = {}
+        uncontextualized = []
+        for chunk_id, chunk_hash, has_context in session.get_chunk_hashes(document.id):
+            if has_context:
+                stored.setdefault(chunk_hash, []).append(chunk_id)
+            else:
+                uncontextualized.append(chunk_id)
+        session.commit()
+
+        job = DocumentJob(
+            source=source,
+            text=text,
+            metadata=metadata,
+            content_hash=content_hash,
+            document_id=document.id
+        )
+        new_chunks = []
+        for chunk in chunks:
+            ids = stored.get(hash_text(chunk['text']))
+            if ids:
+                job.kept.append({'id': ids.pop(0), 'chunk_index': chunk['chunk_index'], 'meta': chunk['metadata']})
+            else:
+                new_chunks.append(chunk)
+        job.stale_ids = [chunk_id for ids in stored.values() for chunk_id in ids] + uncontextualized
+        job.remaining = len(new_chunks)
+        if self.job_id is not None:
+            session.start_job_item(self.job_id, source, len(new_chunks))
+            session.commit()
+
+        print(f"{len(chunks)} chunks: {len(job.kept)} unchanged, {len(new_chunks)} new, {len(job.stale_ids)} stale.")
+
+        if not new_chunks:
+            self._put(self.write_queue, (job, None, None))
+            return
+
+        contexts = self.preprocessor.cached_contexts(text, new_chunks)
+        pending = [chunk for chunk, context in zip(new_chunks, contexts) if context is None]
+        size = self.preprocessor.chunks_per_request
+        groups = [pending[i:i + size] for i in range(0, len(pending), size)]
+        if groups:
+            job.pending_groups = len(groups)
+            job.context_session = self.preprocessor.open_context_session(text)
+            with self._lock:
+                self._open_sessions.add(job.context_session)
+
+        for chunk, context in zip(new_chunks, contexts):
+            if context is not None:
+                self._put(self.embed_queue, (job, self.preprocessor.build_contextualized_chunk(chunk, context)))
+        for group in groups:
+            self._put(self.context_queue, (job, group))
+
+    def _context_stage(self) -> None:
+        try:
+            while True:
+                item = self._get(self.context_queue)
+                if item is _DONE:
+                    break
+                job, group = item
+                try:
+                    contexts = job.context_session.generate_contexts(group)
+                finally:
+                    with self._lock:
+                        job.pending_groups -= 1
+                        last_group = job.pending_groups == 0
+                        if last_group:
+                            self._open_sessions.discard(job.context_session)
+                    if last_group:
+                        job.context_session.close()
+                with self._lock:
+                    job.missing_contexts += sum(1 for context in contexts if not context)
+                self.preprocessor.store_contexts(job.text, group, contexts)
+                for chunk, context in zip(group, contexts):
+                    self._put(self.embed_queue, (job, self.preprocessor.build_contextualized_chunk(chunk, context)))
+        finally:
+            with self._lock:
+                self._active_context_workers -= 1
+                last_worker = self._active_context_workers == 0
+            if last_worker and not self._stop.is_set():
+                self._put(self.embed_queue, _DONE)
+
+    def _embed_stage(self) -> None:
+        batch_size = self.preprocessor.embedder.batch_size
+        done = False
+        while not done:
+            item = self._get(self.embed_queue)
+            if item is _DONE:
+                break
+            batch = [item]
+            # Take whatever else is already waiting, up to one API batch
+            while len(batch) < batch_size:
+                try:
+                    item = self.embed_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _DONE:
+                    done = True
+                    break
+                batch.append(item)
+
+            embeddings = self.preprocessor.create_embeddings([chunk for _, chunk in batch])
+            for (job, chunk), embedding in zip(batch, embeddings):
+                self._put(self.write_queue, (job, chunk, embedding))
+        self._put(self.write_queue, _DONE)
+
+    def _write_stage(self) -> None:
+        with DBSession(
+                self.config.DATABASE_URL,
+                write_method=self.config.DB_WRITE_METHOD,
+                copy_batch_size=self.config.DB_COPY_BATCH_SIZE) as session:
+            rows = []
+            jobs = {}
+            last_flush = time.monotonic()
+
+            def flush():
+                nonlocal last_flush
+                last_flush = time.monotonic()
+                if rows:
+                    session.store_chunks(rows)
+                    if self.job_id is not None:
+                        session.add_job_progress(
+                            self.job_id, {job.source: count for job, count in jobs.items() if count})
+                    session.commit()
+                    self.stats['chunks_written'] += len(rows)
+                    rows.clear()
+                for job, count in jobs.items():
+                    job.remaining -= count
+                    if job.remaining == 0:
+                        self._finalize_document(session, job)
+                jobs.clear()
+
+            def add(item):
+                job, chunk, embedding = item
+                jobs[job] = jobs.get(job, 0)
+                if chunk is not None:
+                    jobs[job] += 1
+                    rows.append({
+                        "document_id": job.document_id,
+                        "chunk_index": chunk['chunk_index'],
+                        "original_text": chunk['original_text'],
+                        "context": chunk['context'],
+                        "contextualized_text": chunk['contextualized_text'],
+                        "chunk_hash": hash_text(chunk['original_text']),
+                        "embedding": embedding,
+                        "meta": chunk['metadata']
+                    })
+
+            try:
+                while True:
+                    try:
+                        item = self._get(self.write_queue, timeout=0.5)
+                    except queue.Empty:
+                        flush()
+                        continue
+                    if item is _DONE:
+                        flush()
+                        break
+                    add(item)
+                    if (len(rows) >= self.config.DB_COPY_BATCH_SIZE
+                            or time.monotonic() - last_flush >= self.checkpoint_seconds):
+                        flush()
+            except PipelineStopped:
+                # Another stage failed: keep the chunks that were already
+                # paid for, so a resumed run does not redo them
+                if not self._flush_on_stop:
+                    raise
+                while True:
+                    try:
+                        item = self.write_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not _DONE:
+                        add(item)
+                flush()
+                raise
+
+    def _finalize_document(self, session: DBSession, job: DocumentJob) -> None:
+        """
+        Remove stale chunks, renumber kept ones and record the new fingerprint.
+        While any chunk has no context the fingerprint stays empty (and the
+        job item unfinished), so the next run plans the document again and
+        retries those contexts.
+        """
+        session.delete_chunks(job.stale_ids)
+        session.update_chunks(job.kept)
+        complete = job.missing_contexts == 0
+        session.upsert_document(job.source, job.content_hash if complete else "", job.metadata)
+        if self.job_id is not None and complete:
+            session.finish_job_item(self.job_id, job.source)
+        session.commit()
+        self.stats['documents'] += 1
+        self.stats['chunks_deleted'] += len(job.stale_ids)
+        if complete:
+            print(f"Stored {job.source}.")
+        else:
+            print(f"Stored {job.source}; {job.missing_contexts} chunks have no context and will be retried on the next run.")
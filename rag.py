@@ -1,69 +1,901 @@
 from text_chunk import GeminiContextualRetrieval
-from db import DBSession
+from ann_index import ITERATIVE_SCAN_VERSION, ann_settings_statement, pgvector_version
+from cache import ContentCache, QueryCache, hash_text
+from cachetools import LRUCache
+from chunker import POSITION_KEYS
+from db import DBSession, get_engine
 from models.chunk import Chunk
+from models.document import Document
+from pdf_parser import iter_pdf_paths, iter_pdf_texts, pdf_metadata
+from lexical_index import LexicalIndex
+from metrics import METRICS
+from pipeline import IngestionPipeline
+from pgvector.sqlalchemy import HALFVEC, Vector
+from scheduler import INTERACTIVE
+from snapshot import Snapshot
+from sqlalchemy import bindparam, cast, delete, select, text
+from vector_index import VectorIndex
+import json
+import numpy as np
+import os
+
+# Reciprocal rank fusion of the nearest vector neighbours and the best
+# full-text matches, in one round trip. plainto_tsquery ANDs the query terms;
+# rewriting it as an OR query gives BM25-like "any term matches" recall.
+# {vector_filter} and {lexical_filter} are filled with metadata conditions,
+# {vector_type} with the embedding column type.
+HYBRID_SEARCH_SQL = """
+WITH vector_hits AS (
+    SELECT id, ROW_NUMBER() OVER (ORDER BY distance) AS rank
+    FROM (
+        SELECT id, embedding <=> CAST(:embedding AS {vector_type}) AS distance
+        FROM chunks
+        {vector_filter}
+        ORDER BY embedding <=> CAST(:embedding AS {vector_type})
+        LIMIT :candidates
+    ) nearest
+),
+lexical_hits AS (
+    SELECT id, ROW_NUMBER() OVER (ORDER BY lexical_rank DESC) AS rank
+    FROM (
+        SELECT id, ts_rank_cd(search_vector, q) AS lexical_rank
+        FROM chunks,
+             CAST(replace(CAST(plainto_tsquery('english', :query) AS text), '&', '|') AS tsquery) AS q
+        WHERE search_vector @@ q {lexical_filter}
+        ORDER BY lexical_rank DESC
+        LIMIT :candidates
+    ) matches
+),
+fused AS (
+    SELECT COALESCE(v.id, l.id) AS id,
+           COALESCE(CAST(:vector_weight AS float8) / (CAST(:rrf_k AS float8) + v.rank), 0)
+             + COALESCE(CAST(:lexical_weight AS float8) / (CAST(:rrf_k AS float8) + l.rank), 0) AS score
+    FROM vector_hits v
+    FULL OUTER JOIN lexical_hits l ON v.id = l.id
+)
+SELECT c.id, c.chunk_index, c.original_text, c.context, c.contextualized_text,
+       c.chunk_hash, c.metadata, c.created_at, f.score,
+       1 - (c.embedding <=> CAST(:embedding AS {vector_type})) AS similarity
+FROM fused f
+JOIN chunks c ON c.id = f.id
+ORDER BY f.score DESC
+LIMIT :top_k
+"""
+
+# Nearest neighbours for many query embeddings in one statement: each query
+# vector drives its own index scan through a LATERAL subquery. {vector_filter}
+# is filled with metadata conditions, {vector_type} with the embedding column type.
+MULTI_VECTOR_SEARCH_SQL = """
+SELECT q.ord - 1 AS query_index, c.*
+FROM unnest(CAST(:embeddings AS text[])) WITH ORDINALITY AS q(query_embedding, ord)
+CROSS JOIN LATERAL (
+    SELECT id, chunk_index, original_text, context, contextualized_text, chunk_hash,
+           metadata, created_at,
+           1 - (embedding <=> CAST(q.query_embedding AS {vector_type})) AS similarity
+    FROM chunks
+    {vector_filter}
+    ORDER BY embedding <=> CAST(q.query_embedding AS {vector_type})
+    LIMIT :top_k
+) c
+ORDER BY q.ord, c.similarity DESC
+"""
+
+# Candidates by Hamming distance between binary-quantized vectors (served by
+# chunks_embedding_bq_idx), re-ranked by exact cosine distance on the stored
+# embeddings. {vector_filter}, {vector_type} and {dimension} are filled in.
+BINARY_SEARCH_SQL = """
+SELECT c.id, c.chunk_index, c.original_text, c.context, c.contextualized_text,
+       c.chunk_hash, c.metadata, c.created_at,
+       1 - (c.embedding <=> CAST(:embedding AS {vector_type})) AS similarity
+FROM (
+    SELECT id
+    FROM chunks
+    {vector_filter}
+    ORDER BY binary_quantize(embedding)::bit({dimension})
+             <~> binary_quantize(CAST(:embedding AS vector({dimension})))
+    LIMIT :candidates
+) candidates
+JOIN chunks c ON c.id = candidates.id
+ORDER BY c.embedding <=> CAST(:embedding AS {vector_type})
+LIMIT :top_k
+"""
+
+# Metadata containment (metadata @> filter), served by chunks_metadata_idx
+METADATA_FILTER_SQL = "metadata @> CAST(:filter AS jsonb)"
+
+def json_contains(value, pattern) -> bool:
+    """Python equivalent of JSONB containment (value @> pattern)"""
+    if isinstance(pattern, dict):
+        return isinstance(value, dict) and all(
+            key in value and json_contains(value[key], item) for key, item in pattern.items())
+    if isinstance(pattern, list):
+        return isinstance(value, list) and all(
+            any(json_contains(element, item) for element in value) for item in pattern)
+    return value == pattern
+
+class RetrievalBackend:
+    """
+    Where search_similar looks chunks up. Implementations return chunk
+    dictionaries in the format of RAG.row_to_result.
+    """
+
+    def search(self, query: str, query_embedding, top_k: int, mode: str, filters: dict = None) -> list:
+        """
+        Retrieve the chunks most relevant to one query.
+        
+        Args:
+            query: Search query
+            query_embedding: Embedding of the query
+            top_k: Number of chunks to return
+            mode: Search mode
+            filters: Optional metadata every returned chunk must contain
+            
+        Returns:
+            List of chunk dictionaries, best match first
+        """
+        raise NotImplementedError
+
+    def search_many(self, queries: list, query_embeddings: list, top_k: int, mode: str, filters: dict = None) -> list:
+        """Retrieve chunks for many queries; one list of results per query"""
+        return [
+            self.search(query, embedding, top_k, mode, filters)
+            for query, embedding in zip(queries, query_embeddings)
+        ]
+
+class PostgresBackend(RetrievalBackend):
+    """Searches the chunks table with pgvector and full-text search"""
+
+    def __init__(self, rag):
+        self.rag = rag
+        self.config = rag.config
+
+    def search(self, query: str, query_embedding, top_k: int, mode: str, filters: dict = None) -> list:
+        statement, params = self.rag.build_search_statement(query, query_embedding, top_k, mode, filters)
+        with DBSession(self.config.DATABASE_URL) as session:
+            self.rag.apply_ann_settings(session.session, filtered=bool(filters), mode=mode)
+            rows = session.session.execute(statement, params).mappings().all()
+            return [self.rag.row_to_result(row) for row in rows]
+
+    def search_many(self, queries: list, query_embeddings: list, top_k: int, mode: str, filters: dict = None) -> list:
+        results = [[] for _ in queries]
+        with DBSession(self.config.DATABASE_URL) as session:
+            self.rag.apply_ann_settings(session.session, filtered=bool(filters), mode=mode)
+            if mode == "vector":
+                sql = MULTI_VECTOR_SEARCH_SQL.format(
+                    vector_filter=f"WHERE {METADATA_FILTER_SQL}" if filters else "",
+                    vector_type=f"{self.config.EMBEDDING_STORAGE}({self.config.EMBEDDING_DIMENSION})")
+                rows = session.session.execute(text(sql), {
+                    "embeddings": ["[" + ",".join(map(str, embedding)) + "]" for embedding in query_embeddings],
+                    "top_k": top_k,
+                    **({"filter": json.dumps(filters)} if filters else {})
+                }).mappings().all()
+                for row in rows:
+                    results[row['query_index']].append(self.rag.row_to_result(row))
+            else:
+                for i, (query, embedding) in enumerate(zip(queries, query_embeddings)):
+                    statement, params = self.rag.build_search_statement(query, embedding, top_k, mode, filters)
+                    rows = session.session.execute(statement, params).mappings().all()
+                    results[i] = [self.rag.row_to_result(row) for row in rows]
+        return results
+
+class FileBackend(RetrievalBackend):
+    """
+    Searches a snapshot written by save_preprocessed_data (or export_snapshot),
+    without a database.
+    
+    The embedding matrix is normalized once into a VectorIndex stored in the
+    snapshot's vectors/ directory, partitioned into IVF lists when the corpus
+    has at least ivf_min_rows rows, and memory-mapped from then on; it is
+    rebuilt when the snapshot grows. Hybrid mode fuses it with the snapshot's
+    lexical index by weighted RRF, as the Postgres query does. Chunk ids are
+    snapshot row numbers.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ivf_lists: int = 0,
+        ivf_min_rows: int = 50000,
+        ivf_probes: int = 8,
+        hybrid_candidates: int = 50,
+        vector_weight: float = 1.0,
+        lexical_weight: float = 1.0,
+        rrf_k: int = 60
+    ):
+        self.path = path
+        self.hybrid_candidates = hybrid_candidates
+        self.vector_weight = vector_weight
+        self.lexical_weight = lexical_weight
+        self.rrf_k = rrf_k
+
+        data = GeminiContextualRetrieval.load_preprocessed_data(path)
+        self.chunks = data['chunks']
+        self.snapshot = data.get('snapshot')
+        if self.snapshot is None:
+            for chunk in self.chunks:
+                chunk.setdefault('chunk_hash', hash_text(chunk['original_text']))
+        self.vector_index = self._load_vector_index(data['embeddings'], ivf_lists, ivf_min_rows, ivf_probes)
+        self.lexical_index = data['bm25_index']
+        self._filter_ids = LRUCache(maxsize=64)
+
+    def _load_vector_index(self, embeddings, ivf_lists: int, ivf_min_rows: int, ivf_probes: int) -> VectorIndex:
+        if self.snapshot is not None:
+            index_path = os.path.join(self.path, "vectors")
+        else:
+            index_path = f"{self.path}_vectors"
+        if os.path.exists(os.path.join(index_path, "meta.json")):
+            index = VectorIndex.load(index_path, probes=ivf_probes)
+            if len(index) == len(embeddings):
+                return index
+
+        print(f"Building vector index in {index_path}...")
+        index = VectorIndex(embeddings, probes=ivf_probes)
+        if ivf_lists or len(index) >= ivf_min_rows:
+            index.build_ivf(ivf_lists or None)
+        index.save(index_path)
+        return VectorIndex.load(index_path, probes=ivf_probes)
+
+    def _allowed_ids(self, filters: dict):
+        if not filters:
+            return None
+        key = json.dumps(filters, sort_keys=True)
+        ids = self._filter_ids.get(key)
+        if ids is None:
+            if self.snapshot is not None:
+                metadata = (self.snapshot.metadata(i) for i in range(len(self.snapshot)))
+            else:
+                metadata = (chunk.get('metadata') for chunk in self.chunks)
+            ids = np.array([
+                i for i, meta in enumerate(metadata) if json_contains(meta, filters)
+            ], dtype=np.int64)
+            self._filter_ids[key] = ids
+        return ids
+
+    def _result(self, chunk_id: int, similarity: float, score: float = None) -> dict:
+        chunk = self.chunks[chunk_id]
+        result = {
+            'id': chunk_id,
+            'chunk_index': chunk['chunk_index'],
+            'original_text': chunk['original_text'],
+            'context': chunk['context'],
+            'contextualized_text': chunk['contextualized_text'],
+            'chunk_hash': chunk['chunk_hash'],
+            'metadata': chunk.get('metadata'),
+            'similarity': similarity,
+            'created_at': None
+        }
+        if score is not None:
+            result['score'] = score
+        return result
+
+    def search(self, query: str, query_embedding, top_k: int, mode: str, filters: dict = None) -> list:
+        allowed = self._allowed_ids(filters)
+        if allowed is not None and len(allowed) == 0:
+            return []
+
+        if mode == "vector":
+            hits = self.vector_index.search(query_embedding, top_k, allowed)
+            return [self._result(chunk_id, similarity) for chunk_id, similarity in hits]
+
+        if mode == "hybrid":
+            if self.lexical_index is None:
+                raise ValueError(f"Hybrid search needs a lexical index in {self.path}")
+            candidates = max(top_k, self.hybrid_candidates)
+            vector_hits = self.vector_index.search(query_embedding, candidates, allowed)
+            lexical_hits = self.lexical_index.search(query, len(self.chunks) if allowed is not None else candidates)
+            if allowed is not None:
+                allowed_set = set(allowed.tolist())
+                lexical_hits = [hit for hit in lexical_hits if hit[0] in allowed_set][:candidates]
+
+            scores = {}
+            for weight, hits in ((self.vector_weight, vector_hits), (self.lexical_weight, lexical_hits)):
+                for rank, (chunk_id, _) in enumerate(hits, 1):
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + weight / (self.rrf_k + rank)
+            best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+            query_vector = np.asarray(query_embedding, dtype=np.float32)
+            query_vector /= np.linalg.norm(query_vector) or 1.0
+            rows = self.vector_index.rows_for_ids(np.array([chunk_id for chunk_id, _ in best], dtype=np.int64))
+            similarities = self.vector_index.vectors[rows] @ query_vector
+            return [
+                self._result(chunk_id, float(similarity), score)
+                for (chunk_id, score), similarity in zip(best, similarities)
+            ]
+
+        raise ValueError(f"Search mode {mode!r} is not supported by the file backend")
 
 class RAG:
     def __init__(self, config):
         self.config = config
+        self.cache = None
+        if self.config.CACHE_PATH:
+            self.cache = ContentCache(
+                self.config.CACHE_PATH,
+                max_bytes=self.config.CACHE_MAX_MB * 1024 * 1024)
         self.preprocessor = GeminiContextualRetrieval(
             google_api_key=self.config.GEMINI_API_KEY,
             google_model=self.config.GEMINI_MODEL,
             google_embedding_model=self.config.GEMINI_EMBEDDING_MODEL,
             chunk_size=800,
-            chunk_overlap=100)
+            chunk_overlap=100,
+            max_concurrency=self.config.CONTEXT_CONCURRENCY,
+            chunks_per_request=self.config.CONTEXT_CHUNKS_PER_REQUEST,
+            context_cache_min_chars=self.config.CONTEXT_CACHE_MIN_CHARS,
+            context_cache_ttl_minutes=self.config.CONTEXT_CACHE_TTL_MINUTES,
+            embedding_batch_size=self.config.EMBEDDING_BATCH_SIZE,
+            embedding_batch_tokens=self.config.EMBEDDING_BATCH_TOKENS,
+            embedding_concurrency=self.config.EMBEDDING_CONCURRENCY,
+            embedding_dimension=self.config.EMBEDDING_DIMENSION,
+            generate_rpm=self.config.GEMINI_RPM,
+            generate_tpm=self.config.GEMINI_TPM,
+            generate_concurrency=self.config.GEMINI_MAX_CONCURRENCY,
+            embedding_rpm=self.config.EMBEDDING_RPM,
+            embedding_tpm=self.config.EMBEDDING_TPM,
+            cache=self.cache)
+        self.query_cache = QueryCache(
+            model=self.config.GEMINI_MODEL,
+            embedding_model=self.config.GEMINI_EMBEDDING_MODEL,
+            max_embeddings=self.config.QUERY_CACHE_SIZE,
+            max_answers=self.config.QUERY_CACHE_SIZE,
+            answer_ttl=self.config.ANSWER_CACHE_TTL,
+            disk=self.cache)
+        self.backend = self.create_backend()
+        self._iterative_scan = None
 
-    def process_documents(self, raw_documents):
-        documents = []
-        for page_text in raw_documents:
-            documents.append((page_text[0], page_text[1]))
+    def process_documents(self, raw_documents, job_id: int = None):
+        """
+        Ingest documents incrementally through the streaming pipeline.
         
-        preprocessed_data = self.preprocessor.preprocess_knowledge_base(documents)
+        Each document is identified by its source (metadata "source", falling
+        back to the content hash) and fingerprinted by a hash of its text.
+        Unchanged documents are skipped. For changed documents only new or
+        modified chunks are contextualized, embedded and stored; chunks that no
+        longer exist are deleted.
+        
+        The run is recorded as an ingestion job whose progress is checkpointed
+        as chunks are written; an interrupted job is continued with
+        resume_job().
+        
+        Args:
+            raw_documents: Iterable of (document_text, metadata) tuples
+            job_id: Job to continue (a new "documents" job by default)
+        """
+        if job_id is None:
+            job_id = self.create_job("documents", {})
+        stats = self.run_job(job_id, raw_documents)
+        
+        print(f"Successfully processed and stored chunks in the database: "
+              f"{stats['documents']} documents updated, {stats['skipped']} unchanged, "
+              f"{stats['chunks_written']} chunks written, {stats['chunks_deleted']} deleted.")
+        if self.cache is not None:
+            stats = self.cache.stats()
+            print(f"Cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
+
+    def process_pdfs(self, path: str, job_id: int = None):
+        """
+        Ingest a PDF file, or every PDF file under a directory.
+        
+        Args:
+            path: Path to a PDF file or a directory
+            job_id: Job to continue (a new "pdf" job by default); files it
+                already ingested are skipped before text extraction
+        """
+        if job_id is None:
+            job_id = self.create_job("pdf", {'path': os.path.abspath(path)})
+        with DBSession(self.config.DATABASE_URL) as session:
+            done = session.get_job_sources(job_id)
+        
+        def documents():
+            texts = iter_pdf_texts(
+                (file_path for file_path in iter_pdf_paths(path) if file_path not in done),
+                workers=self.config.PDF_WORKERS,
+                pages_per_shard=self.config.PDF_PAGES_PER_SHARD)
+            for file_path, text in METRICS.timed_iter("extract", texts):
+                yield text, pdf_metadata(file_path)
+        
+        self.process_documents(documents(), job_id=job_id)
+
+    def create_job(self, kind: str, params: dict) -> int:
+        """
+        Record a new ingestion job.
+        
+        Args:
+            kind: "documents" or "pdf"
+            params: Inputs needed to run the job again
+            
+        Returns:
+            Job id
+        """
+        with DBSession(self.config.DATABASE_URL) as session:
+            job_id = session.create_job(kind, params).id
+            session.commit()
+        print(f"Started ingestion job {job_id} (resume with --resume {job_id}).")
+        return job_id
 
+    def get_job(self, job_id: int):
+        """
+        Look up an ingestion job and its progress.
+        
+        Args:
+            job_id: Job id
+            
+        Returns:
+            Dictionary with id, kind, params, status, stats, error, the
+            documents done and queued tasks by status; None if there is no
+            such job
+        """
         with DBSession(self.config.DATABASE_URL) as session:
-            for (c, e) in zip(
-                preprocessed_data['chunks'],
-                preprocessed_data['embeddings']):
-                db_chunk = {
-                    "chunk_index": c['chunk_index'],
-                    "original_text": c['original_text'],
-                    "context": c['context'],
-                    "contextualized_text": c['contextualized_text'],
-                    "embedding": e,
-                    "metadata": c['metadata']
-                }
-                session.store_chunk(db_chunk)
+            job = session.get_job(job_id)
+            if job is None:
+                return None
+            return {
+                'id': job.id,
+                'kind': job.kind,
+                'params': job.params,
+                'status': job.status,
+                'stats': job.stats,
+                'error': job.error,
+                'documents_done': len(session.get_job_sources(job_id)),
+                'tasks': session.queue_counts(job_id)
+            }
+
+    def run_job(self, job_id: int, raw_documents) -> dict:
+        """
+        Run the ingestion pipeline for a job, recording whether it completed
+        or failed.
+        
+        Args:
+            job_id: Job id
+            raw_documents: Iterable of (document_text, metadata) tuples
+            
+        Returns:
+            Pipeline counters
+        """
+        with DBSession(self.config.DATABASE_URL) as session:
+            session.update_job(job_id, "running")
+            session.commit()
+        pipeline = IngestionPipeline(
+            self,
+            queue_size=self.config.PIPELINE_QUEUE_SIZE,
+            job_id=job_id,
+            checkpoint_seconds=self.config.INGEST_CHECKPOINT_SECONDS)
+        try:
+            stats = pipeline.run(raw_documents)
+        except BaseException as e:
+            with DBSession(self.config.DATABASE_URL) as session:
+                session.update_job(job_id, "failed", stats=pipeline.stats, error=repr(e))
+                session.commit()
+            print(f"Ingestion job {job_id} stopped; resume with --resume {job_id}.")
+            raise
+        finally:
+            self.query_cache.invalidate_answers()
+        with DBSession(self.config.DATABASE_URL) as session:
+            session.update_job(job_id, "completed", stats=stats)
             session.commit()
+        return stats
+
+    def enqueue_documents(self, raw_documents) -> int:
+        """
+        Queue documents for `main.py worker` processes instead of ingesting
+        them here. The text is stored with each task.
+        
+        Args:
+            raw_documents: Iterable of (document_text, metadata) tuples
+            
+        Returns:
+            Job id
+        """
+        def tasks():
+            for text, metadata in raw_documents:
+                metadata = metadata or {}
+                yield metadata.get('source') or hash_text(text), {'text': text, 'metadata': metadata}
         
-        print("Successfully processed and stored chunks in the database.")
+        return self._enqueue({'documents': True}, tasks())
 
-    def search_similar(self, query: str, top_k: int = 5):
-        query_embedding = self.preprocessor.create_embedding([query])[0]
+    def enqueue_pdfs(self, path: str) -> int:
+        """
+        Queue a PDF file, or every PDF file under a directory, for
+        `main.py worker` processes; workers read the files themselves, so the
+        path must be reachable from every worker host.
+        
+        Args:
+            path: Path to a PDF file or a directory
+            
+        Returns:
+            Job id
+        """
+        return self._enqueue(
+            {'path': os.path.abspath(path)},
+            ((file_path, {'path': file_path}) for file_path in iter_pdf_paths(path)))
 
+    def _enqueue(self, params: dict, tasks) -> int:
         with DBSession(self.config.DATABASE_URL) as session:
-            results = session.session.query(
-                Chunk,
-                (1 - Chunk.embedding.cosine_distance(query_embedding)).label('similarity')
-            ).order_by(
-                Chunk.embedding.cosine_distance(query_embedding)
-            ).limit(top_k).all()
+            job_id = session.create_job("queue", params).id
+            added = session.enqueue_tasks(job_id, tasks, max_attempts=self.config.WORKER_MAX_ATTEMPTS)
+            session.commit()
+        print(f"Queued {added} documents as ingestion job {job_id}.")
+        return job_id
+
+    def resume_job(self, job_id: int, raw_documents=None) -> None:
+        """
+        Continue an interrupted ingestion job where it stopped: documents it
+        finished are skipped, and of the others only chunks not yet written
+        are processed.
+        
+        Args:
+            job_id: Job id
+            raw_documents: The documents of a "documents" job (PDF jobs
+                re-read their path; queued jobs get their failed tasks
+                requeued for the workers)
+        """
+        job = self.get_job(job_id)
+        if job is None:
+            raise ValueError(f"No ingestion job {job_id}")
+        if job['status'] == "completed":
+            print(f"Ingestion job {job_id} already completed.")
+            return
+        if job['kind'] == "queue":
+            with DBSession(self.config.DATABASE_URL) as session:
+                requeued = session.requeue_failed_tasks(job_id)
+                session.update_job(job_id, "running")
+                session.commit()
+            print(f"Requeued {requeued} failed tasks of job {job_id}; run `main.py worker` to process them.")
+            return
+        print(f"Resuming ingestion job {job_id} ({job['kind']}, {job['documents_done']} documents done).")
+        if job['kind'] == "pdf":
+            self.process_pdfs(job['params']['path'], job_id=job_id)
+        elif raw_documents is None:
+            raise ValueError(f"Ingestion job {job_id} needs its documents to resume")
+        else:
+            self.process_documents(raw_documents, job_id=job_id)
+
+    def export_snapshot(self, path: str, embedding_dtype: str = "float32", batch_size: int = 10000) -> int:
+        """
+        Write every stored chunk to a new snapshot directory, streaming rows
+        from Postgres in batches, and build its BM25 index.
+        
+        Args:
+            path: Snapshot directory to create
+            embedding_dtype: "float32" or "float16" for the stored embeddings
+            batch_size: Rows fetched and appended per batch
             
-            return [
-                {
-                    'id': chunk.id,
-                    'chunk_index': chunk.chunk_index,
-                    'original_text': chunk.original_text,
-                    'context': chunk.context,
-                    'contextualized_text': chunk.contextualized_text,
-                    'metadata': chunk.meta,
-                    'similarity': float(similarity),
-                    'created_at': chunk.created_at
-                }
-                for chunk, similarity in results
-            ]
+        Returns:
+            Number of chunks exported
+        """
+        snapshot = Snapshot.create(path, self.config.EMBEDDING_DIMENSION, embedding_dtype)
+        statement = select(
+            Chunk.chunk_index,
+            Chunk.original_text,
+            Chunk.context,
+            Chunk.contextualized_text,
+            Chunk.chunk_hash,
+            # halfvec columns are read back at full precision
+            cast(Chunk.embedding, Vector(self.config.EMBEDDING_DIMENSION)).label('embedding'),
+            Chunk.meta,
+            Document.source,
+            Document.content_hash
+        ).outerjoin(Document, Chunk.document_id == Document.id).where(
+            Chunk.embedding.is_not(None)
+        ).order_by(Chunk.document_id, Chunk.chunk_index, Chunk.id)
         
-        return results
+        bm25_index = LexicalIndex()
+        with DBSession(self.config.DATABASE_URL) as session:
+            result = session.session.execute(statement.execution_options(yield_per=batch_size))
+            for rows in result.partitions():
+                chunks = [{
+                    'original_text': row.original_text,
+                    'context': row.context,
+                    'contextualized_text': row.contextualized_text,
+                    'chunk_index': row.chunk_index,
+                    'metadata': row.meta,
+                    'chunk_hash': row.chunk_hash,
+                    'source': row.source,
+                    'document_hash': row.content_hash
+                } for row in rows]
+                embeddings = np.array([row.embedding for row in rows], dtype=np.float32)
+                first_row = len(snapshot)
+                snapshot.append(chunks, embeddings)
+                bm25_index.add_documents(
+                    range(first_row, len(snapshot)),
+                    (chunk['contextualized_text'] for chunk in chunks))
+                print(f"Exported {len(snapshot)} chunks...")
+        
+        bm25_index.save(os.path.join(path, "bm25"))
+        print(f"Exported {len(snapshot)} chunks to {path}")
+        return len(snapshot)
+
+    def import_snapshot(self, path: str) -> int:
+        """
+        Load a snapshot into Postgres with binary COPY.
+        
+        Chunks are grouped into documents by their source. An existing
+        document with the same source has its chunks replaced; chunks without
+        a source are stored without a document.
+        
+        Args:
+            path: Snapshot directory
+            
+        Returns:
+            Number of chunks imported
+        """
+        snapshot = Snapshot.open(path)
+        
+        with DBSession(
+                self.config.DATABASE_URL,
+                write_method="copy",
+                copy_batch_size=self.config.DB_COPY_BATCH_SIZE) as session:
+            document_ids = {}
+            
+            def rows():
+                embeddings = snapshot.embeddings
+                for i, chunk in enumerate(snapshot.iter_chunks()):
+                    source = chunk['source']
+                    if source and source not in document_ids:
+                        # Chunk metadata is the document's plus the chunk's position
+                        metadata = {
+                            key: value for key, value in (chunk['metadata'] or {}).items()
+                            if key not in POSITION_KEYS
+                        }
+                        document = session.upsert_document(source, chunk['document_hash'], metadata)
+                        session.session.execute(delete(Chunk).where(Chunk.document_id == document.id))
+                        document_ids[source] = document.id
+                    yield {
+                        'document_id': document_ids.get(source),
+                        'chunk_index': chunk['chunk_index'],
+                        'original_text': chunk['original_text'],
+                        'context': chunk['context'],
+                        'contextualized_text': chunk['contextualized_text'],
+                        'chunk_hash': chunk['chunk_hash'],
+                        'embedding': embeddings[i],
+                        'metadata': chunk['metadata']
+                    }
+            
+            total = session.bulk_load_chunks(rows())
+        
+        self.query_cache.invalidate_answers()
+        print(f"Imported {total} chunks from {path} ({len(document_ids)} documents)")
+        return total
+
+    def create_backend(self):
+        """Create the retrieval backend selected by Config.RETRIEVAL_BACKEND"""
+        if self.config.RETRIEVAL_BACKEND == "postgres":
+            return PostgresBackend(self)
+        if self.config.RETRIEVAL_BACKEND == "file":
+            if not self.config.RETRIEVAL_DATA_PATH:
+                raise ValueError("RETRIEVAL_DATA_PATH must be set for the file retrieval backend.")
+            return FileBackend(
+                self.config.RETRIEVAL_DATA_PATH,
+                ivf_lists=self.config.VECTOR_IVF_LISTS,
+                ivf_min_rows=self.config.VECTOR_IVF_MIN_ROWS,
+                ivf_probes=self.config.VECTOR_IVF_PROBES,
+                hybrid_candidates=self.config.HYBRID_CANDIDATES,
+                vector_weight=self.config.HYBRID_VECTOR_WEIGHT,
+                lexical_weight=self.config.HYBRID_LEXICAL_WEIGHT,
+                rrf_k=self.config.HYBRID_RRF_K)
+        raise ValueError(f"Unknown retrieval backend: {self.config.RETRIEVAL_BACKEND}")
+
+    def search_similar(self, query: str, top_k: int = 5, mode: str = None, filters: dict = None):
+        """
+        Retrieve the chunks most relevant to a query.
+        
+        Args:
+            query: Search query
+            top_k: Number of chunks to return
+            mode: "vector" for embedding similarity only, "hybrid" to fuse
+                vector and full-text search with reciprocal rank fusion, or
+                "binary" for a binary-quantized first pass re-ranked by cosine
+                (defaults to Config.SEARCH_MODE)
+            filters: Optional metadata the chunks must contain, e.g.
+                {"company": "ACME Corp"} (JSONB containment)
+            
+        Returns:
+            List of chunk dictionaries, best match first
+        """
+        query_embedding = self.embed_query(query)
+        with METRICS.timer("search"):
+            return self.backend.search(query, query_embedding, top_k, mode or self.config.SEARCH_MODE, filters)
 
-    def ask_llm(self, question: str, contexts: list) -> str:
+    def ann_settings(self, filtered: bool = False, mode: str = None):
+        """
+        Per-query ANN parameters (ivfflat.probes, hnsw.ef_search) from Config,
+        as a statement to run in the search transaction. On pgvector 0.8+,
+        filtered searches also enable iterative index scans, so the index
+        keeps scanning until top_k rows pass the filter.
+        
+        Args:
+            filtered: Whether the search has metadata filters
+            mode: Search mode; "binary" raises hnsw.ef_search to at least
+                BINARY_CANDIDATES, since an HNSW scan returns at most ef_search rows
+            
+        Returns:
+            (statement, params) tuple, or None when the server defaults apply
+        """
+        ef_search = self.config.HNSW_EF_SEARCH
+        if (mode or self.config.SEARCH_MODE) == "binary":
+            ef_search = max(ef_search, self.config.BINARY_CANDIDATES)
+        iterative_scan = None
+        if filtered and self.config.ANN_ITERATIVE_SCAN and self.supports_iterative_scan():
+            iterative_scan = self.config.ANN_ITERATIVE_SCAN
+        return ann_settings_statement(self.config.IVFFLAT_PROBES, ef_search, iterative_scan)
+
+    def supports_iterative_scan(self) -> bool:
+        """Whether the database's pgvector has iterative index scans (checked once)"""
+        if self._iterative_scan is None:
+            with get_engine(self.config.DATABASE_URL).connect() as connection:
+                self._iterative_scan = pgvector_version(connection) >= ITERATIVE_SCAN_VERSION
+        return self._iterative_scan
+
+    def apply_ann_settings(self, connection, filtered: bool = False, mode: str = None) -> None:
+        """Apply the ANN parameters to the current transaction of a session or connection"""
+        settings = self.ann_settings(filtered, mode)
+        if settings is not None:
+            connection.execute(*settings)
+
+    def embed_query(self, query: str):
+        """
+        Embed a search query, served from the query cache when possible.
+        
+        Args:
+            query: Search query
+            
+        Returns:
+            Query embedding
+        """
+        embedding = self.query_cache.get_embedding(query)
+        if embedding is None:
+            embedding = self.preprocessor.create_embedding(query)
+            self.query_cache.put_embedding(query, embedding)
+        return embedding
+
+    def embed_queries(self, queries: list) -> list:
+        """
+        Embed many search queries in batched API calls, using the query cache
+        for any already seen.
+        
+        Args:
+            queries: Search queries
+            
+        Returns:
+            List of query embeddings, in input order
+        """
+        embeddings = [self.query_cache.get_embedding(query) for query in queries]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            vectors = self.preprocessor.embedder.embed(
+                [queries[i] for i in missing], task_type="retrieval_document")
+            for i, vector in zip(missing, vectors):
+                embeddings[i] = vector.tolist()
+                self.query_cache.put_embedding(queries[i], embeddings[i])
+        return embeddings
+
+    def search_similar_many(self, queries: list, top_k: int = 5, mode: str = None, filters: dict = None):
+        """
+        Retrieve the most relevant chunks for many queries at once.
+        
+        Queries are embedded in batched API calls and handed to the backend
+        together (with Postgres, vector searches run as a single LATERAL
+        statement).
+        
+        Args:
+            queries: Search queries
+            top_k: Number of chunks to return per query
+            mode: "vector", "hybrid" or "binary" (defaults to Config.SEARCH_MODE)
+            filters: Optional metadata every returned chunk must contain
+            
+        Returns:
+            List with one list of chunk dictionaries per query, best match first
+        """
+        if not queries:
+            return []
+        embeddings = self.embed_queries(queries)
+        with METRICS.timer("search"):
+            return self.backend.search_many(queries, embeddings, top_k, mode or self.config.SEARCH_MODE, filters)
+
+    def build_search_statement(self, query: str, query_embedding, top_k: int, mode: str = None, filters: dict = None):
+        """
+        Build the retrieval statement for a query, shared by the synchronous
+        search path and the async query server.
+        
+        Args:
+            query: Search query
+            query_embedding: Embedding of the query
+            top_k: Number of chunks to return
+            mode: "vector", "hybrid" or "binary" (defaults to Config.SEARCH_MODE)
+            filters: Optional metadata every returned chunk must contain
+            
+        Returns:
+            (statement, params) tuple; rows are mappings accepted by row_to_result
+        """
+        mode = mode or self.config.SEARCH_MODE
+        if mode == "vector":
+            # Compare in the column's type so a halfvec column still uses its index
+            if self.config.EMBEDDING_STORAGE == "halfvec":
+                query_embedding = cast(query_embedding, HALFVEC(self.config.EMBEDDING_DIMENSION))
+            distance = Chunk.embedding.cosine_distance(query_embedding)
+            statement = select(
+                Chunk.id,
+                Chunk.chunk_index,
+                Chunk.original_text,
+                Chunk.context,
+                Chunk.contextualized_text,
+                Chunk.chunk_hash,
+                Chunk.meta.label('metadata'),
+                Chunk.created_at,
+                (1 - distance).label('similarity')
+            ).order_by(distance).limit(top_k)
+            if filters:
+                # Iterative scans may return neighbours slightly out of order;
+                # re-sort the top_k rows they produce
+                nearest = statement.where(Chunk.meta.contains(filters)).subquery()
+                statement = select(nearest).order_by(nearest.c.similarity.desc())
+            return statement, {}
+        
+        if mode == "hybrid":
+            # Vector and full-text candidates fused with weighted RRF in a single statement
+            sql = HYBRID_SEARCH_SQL.format(
+                vector_filter=f"WHERE {METADATA_FILTER_SQL}" if filters else "",
+                lexical_filter=f"AND {METADATA_FILTER_SQL}" if filters else "",
+                vector_type=f"{self.config.EMBEDDING_STORAGE}({self.config.EMBEDDING_DIMENSION})")
+            statement = text(sql).bindparams(
+                bindparam("embedding", type_=Vector(self.config.EMBEDDING_DIMENSION)))
+            params = {"filter": json.dumps(filters)} if filters else {}
+            return statement, {
+                **params,
+                "embedding": query_embedding,
+                "query": query,
+                "candidates": max(top_k, self.config.HYBRID_CANDIDATES),
+                "vector_weight": self.config.HYBRID_VECTOR_WEIGHT,
+                "lexical_weight": self.config.HYBRID_LEXICAL_WEIGHT,
+                "rrf_k": self.config.HYBRID_RRF_K,
+                "top_k": top_k
+            }
+        
+        if mode == "binary":
+            # Hamming-distance candidates from the binary index, re-ranked by exact cosine
+            dimension = self.config.EMBEDDING_DIMENSION
+            sql = BINARY_SEARCH_SQL.format(
+                vector_filter=f"WHERE {METADATA_FILTER_SQL}" if filters else "",
+                vector_type=f"{self.config.EMBEDDING_STORAGE}({dimension})",
+                dimension=dimension)
+            statement = text(sql).bindparams(bindparam("embedding", type_=Vector(dimension)))
+            params = {"filter": json.dumps(filters)} if filters else {}
+            return statement, {
+                **params,
+                "embedding": query_embedding,
+                "candidates": max(top_k, self.config.BINARY_CANDIDATES),
+                "top_k": top_k
+            }
+        
+        raise ValueError(f"Unknown search mode: {mode}")
+
+    @staticmethod
+    def row_to_result(row) -> dict:
+        """Convert a search result row into the chunk dictionary returned by search_similar"""
+        result = {
+            'id': row['id'],
+            'chunk_index': row['chunk_index'],
+            'original_text': row['original_text'],
+            'context': row['context'],
+            'contextualized_text': row['contextualized_text'],
+            'chunk_hash': row['chunk_hash'],
+            'metadata': row['metadata'],
+            'similarity': float(row['similarity']),
+            'created_at': row['created_at']
+        }
+        if 'score' in row:
+            result['score'] = float(row['score'])
+        return result
+
+    def ask_llm(self, question: str, contexts: list, priority: str = INTERACTIVE) -> str:
+        answer = self.query_cache.get_answer(question, contexts)
+        if answer is None:
+            prompt = self.build_answer_prompt(question, contexts)
+            with METRICS.timer("answer"):
+                answer = self.preprocessor.ask_gemini(prompt, priority=priority)
+            self.query_cache.put_answer(question, contexts, answer)
+        return answer
+
+    def build_answer_prompt(self, question: str, contexts: list) -> str:
         context = "\n\n".join(
             f"Chunk {c['chunk_index']}:\n{c['contextualized_text']}"
             for c in contexts
@@ -79,6 +911,4 @@ class RAG:
             Question:
             {question}
         """
-
-        answer = self.preprocessor.ask_gemini(prompt)
-        return answer
\ No newline at end of file
+        return prompt
\ No newline at end of file
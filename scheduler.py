@@ -0,0 +1,216 @@
+from metrics import METRICS
+from typing import Callable, Tuple, Type
+import heapq
+import itertools
+import math
+import random
+import threading
+import time
+
+# Priority lanes, most urgent first: interactive queries are admitted ahead of
+# any queued bulk work (ingestion, --ask-file)
+INTERACTIVE = "interactive"
+BULK = "bulk"
+LANES = {INTERACTIVE: 0, BULK: 1}
+
+class TokenBucket:
+    """
+    Token bucket sized so that no sliding window of `window` seconds admits
+    more than `limit` units: it holds 1/60 of the quota as burst and refills at
+    the rate of the remainder.
+    """
+
+    def __init__(self, limit: int, window: float = 60.0):
+        self.capacity = max(1.0, limit / 60)
+        self.rate = max(limit - self.capacity, 1.0) / window
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken (0 if it can be taken now)"""
+        self._refill(now)
+        # A request larger than the bucket only needs a full bucket and
+        # leaves it in debt
+        needed = min(amount, self.capacity)
+        return 0.0 if self.level >= needed else (needed - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.level -= amount
+
+    def drain(self, now: float) -> None:
+        """Empty the bucket, e.g. after the server reported the quota exhausted"""
+        self._refill(now)
+        self.level = min(self.level, 0.0)
+
+class RateLimitScheduler:
+    """
+    Central admission control for calls to one rate-limited API.
+
+    Every call waits for a request and a token from two token buckets
+    (requests/min and tokens/min, each optional) and for a concurrency slot,
+    then runs in the caller's thread. Waiting calls are admitted in priority
+    order, interactive before bulk and FIFO within a lane; interactive calls
+    may also use `interactive_slots` slots above the concurrency limit, so
+    they never wait for in-flight bulk calls.
+
+    The concurrency limit adapts (AIMD): it is halved when the API throttles a
+    call and grows by one after `limit` consecutive successes, up to
+    max_concurrency. A throttled call also pauses all admissions for an
+    exponential backoff with jitter and is then retried, keeping its place in
+    the queue.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rpm: int = 0,
+        tpm: int = 0,
+        max_concurrency: int = 8,
+        min_concurrency: int = 1,
+        interactive_slots: int = 2,
+        max_retries: int = 6,
+        initial_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        retryable: Tuple[Type[BaseException], ...] = (),
+        window: float = 60.0
+    ):
+        """
+        Args:
+            name: API name, used as the metrics label
+            rpm: Requests per window quota (0 for none)
+            tpm: Tokens per window quota (0 for none)
+            max_concurrency: Upper bound of the adaptive concurrency limit
+            min_concurrency: Lower bound of the adaptive concurrency limit
+            interactive_slots: Extra concurrency reserved for interactive calls
+            max_retries: Retries of a throttled call before giving up
+            initial_backoff: First backoff delay in seconds
+            max_backoff: Longest backoff delay in seconds
+            retryable: Exception types meaning "throttled, try again later"
+            window: Quota window in seconds
+        """
+        self.name = name
+        self.requests = TokenBucket(rpm, window) if rpm else None
+        self.tokens = TokenBucket(tpm, window) if tpm else None
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.interactive_slots = interactive_slots
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.retryable = retryable
+
+        self.limit = self.max_concurrency
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._successes = 0
+        self._last_decrease = 0.0
+        self._waiting = []   # heap of (lane, sequence)
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    # --- Admission ---
+
+    def _wait_time(self, lane: int, tokens: int, now: float) -> float:
+        """Seconds the head of the queue still has to wait (0 to admit it now)"""
+        slots = self.limit + (self.interactive_slots if lane == LANES[INTERACTIVE] else 0)
+        if self.in_flight >= slots:
+            return math.inf   # woken when a call finishes
+        wait = self.paused_until - now
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1, now))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(tokens, now))
+        return max(wait, 0.0)
+
+    def _acquire(self, entry: Tuple[int, int], tokens: int) -> None:
+        with self._condition:
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    if self._waiting[0] == entry:
+                        wait = self._wait_time(entry[0], tokens, time.monotonic())
+                        if wait == 0:
+                            break
+                    else:
+                        wait = math.inf
+                    self._condition.wait(None if wait == math.inf else wait)
+            except BaseException:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._condition.notify_all()
+                raise
+            heapq.heappop(self._waiting)
+            if self.requests is not None:
+                self.requests.take(1)
+            if self.tokens is not None:
+                self.tokens.take(tokens)
+            self.in_flight += 1
+            # The next in line may be admissible too
+            self._condition.notify_all()
+
+    def _release(self, throttled: bool, delay: float = 0.0) -> None:
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                self._successes = 0
+                if now - self._last_decrease >= self.initial_backoff:
+                    self.limit = max(self.min_concurrency, self.limit // 2)
+                    self._last_decrease = now
+                self.paused_until = max(self.paused_until, now + delay)
+                for bucket in (self.requests, self.tokens):
+                    if bucket is not None:
+                        bucket.drain(now)
+            else:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_concurrency:
+                    self.limit += 1
+                    self._successes = 0
+            self._condition.notify_all()
+
+    # --- Calls ---
+
+    def call(self, fn: Callable, *args, tokens: int = 0, priority: str = BULK, **kwargs):
+        """
+        Run fn(*args, **kwargs) once admitted, retrying it while throttled.
+
+        Args:
+            fn: API call
+            tokens: Estimated tokens the call consumes
+            priority: INTERACTIVE or BULK
+
+        Returns:
+            fn's return value
+        """
+        entry = (LANES[priority], next(self._sequence))
+        for attempt in range(self.max_retries + 1):
+            self._acquire(entry, tokens)
+            try:
+                result = fn(*args, **kwargs)
+            except self.retryable as e:
+                delay = min(self.max_backoff, self.initial_backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+                self._release(throttled=True, delay=delay)
+                if attempt == self.max_retries:
+                    METRICS.inc("api_errors", api=self.name, error=e.__class__.__name__)
+                    raise
+                METRICS.inc("api_retries", api=self.name, error=e.__class__.__name__)
+                print(f"  {self.name} request throttled ({e.__class__.__name__}), "
+                      f"concurrency {self.limit}, retrying in {delay:.1f}s...")
+                continue
+            except BaseException:
+                self._release(throttled=False)
+                raise
+            self._release(throttled=False)
+            return result
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                'limit': self.limit,
+                'in_flight': self.in_flight,
+                'waiting': len(self._waiting)
+            }
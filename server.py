@@ -0,0 +1,188 @@
+from aiohttp import web
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import event, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from metrics import METRICS
+from rag import PostgresBackend, RAG
+import asyncio
+import time
+
+def async_database_url(db_url: str) -> str:
+    """Rewrite a database URL to use the asyncpg driver"""
+    return make_url(db_url).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+async def register_vector_text_codec(connection):
+    """
+    Exchange pgvector values as text on an asyncpg connection. SQLAlchemy's
+    Vector type already serializes bound values to pgvector's text form and
+    parses text results, so the codec passes strings straight through.
+    """
+    await connection.set_type_codec(
+        'vector', encoder=str, decoder=str, format='text')
+
+def create_search_engine(config) -> AsyncEngine:
+    """
+    Create the async engine used for query serving, with the pgvector type
+    registered on every new asyncpg connection.
+    """
+    engine = create_async_engine(
+        config.ASYNC_DATABASE_URL or async_database_url(config.DATABASE_URL),
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_MAX_OVERFLOW,
+        pool_pre_ping=config.DB_POOL_PRE_PING,
+        pool_recycle=config.DB_POOL_RECYCLE
+    )
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        dbapi_connection.run_async(register_vector_text_codec)
+
+    return engine
+
+class RAGServer:
+    """
+    Long-running HTTP/JSON query server.
+
+    The RAG instance (Gemini client, embedding cache) and the async database
+    pool are created once and stay warm across requests. Database access is
+    async; blocking Gemini calls run on a bounded thread pool so they never
+    stall the event loop, and at most SERVER_LLM_CONCURRENCY answers are
+    generated at once.
+
+    Endpoints (POST, JSON body):
+        /search  {"query": str, "top_k": int, "mode": "vector" | "hybrid" | "binary", "filter": {...}}
+        /ask     {"question": str, "top_k": int, "mode": "vector" | "hybrid" | "binary", "filter": {...}}
+
+    "filter" restricts results to chunks whose metadata contains it.
+    
+    GET /stats returns cache hit rates; GET /metrics returns stage timers and
+    API/DB counters in the Prometheus text format.
+    """
+
+    def __init__(self, rag: RAG):
+        self.rag = rag
+        self.config = rag.config
+        self.engine = None
+        self.executor = ThreadPoolExecutor(max_workers=self.config.SERVER_WORKER_THREADS)
+        self.llm_semaphore = None
+
+    async def _run_blocking(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def search(self, query: str, top_k: int = 5, mode: str = None, filters: dict = None) -> list:
+        """Async counterpart of RAG.search_similar"""
+        if self.engine is None:
+            # In-process backends are searched on the thread pool
+            return await self._run_blocking(self.rag.search_similar, query, top_k, mode, filters)
+        query_embedding = await self._run_blocking(self.rag.embed_query, query)
+        mode = mode or self.config.SEARCH_MODE
+        statement, params = self.rag.build_search_statement(query, query_embedding, top_k, mode, filters)
+        settings = self.rag.ann_settings(filtered=bool(filters), mode=mode)
+        start = time.perf_counter()
+        async with self.engine.connect() as connection:
+            if settings is not None:
+                await connection.execute(*settings)
+            result = await connection.execute(statement, params)
+            rows = result.mappings().all()
+        METRICS.observe("search", time.perf_counter() - start)
+        return [self.rag.row_to_result(row) for row in rows]
+
+    async def ask(self, question: str, top_k: int = 5, mode: str = None, filters: dict = None) -> dict:
+        """Retrieve contexts and answer a question"""
+        contexts = await self.search(question, top_k, mode, filters)
+        answer = await self._run_blocking(self.rag.query_cache.get_answer, question, contexts)
+        if answer is None:
+            prompt = self.rag.build_answer_prompt(question, contexts)
+            async with self.llm_semaphore:
+                start = time.perf_counter()
+                answer = await self._run_blocking(self.rag.preprocessor.ask_gemini, prompt)
+                METRICS.observe("answer", time.perf_counter() - start)
+            await self._run_blocking(self.rag.query_cache.put_answer, question, contexts, answer)
+        return {'answer': answer, 'contexts': contexts}
+
+    @staticmethod
+    def _serialize(contexts: list) -> list:
+        return [
+            {**c, 'created_at': c['created_at'].isoformat() if c.get('created_at') else None}
+            for c in contexts
+        ]
+
+    @staticmethod
+    def _filters(body: dict) -> dict:
+        filters = body.get('filter')
+        if filters is not None and not isinstance(filters, dict):
+            raise web.HTTPBadRequest(text='"filter" must be an object')
+        return filters
+
+    @staticmethod
+    async def _body(request: web.Request) -> dict:
+        try:
+            body = await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest(text='Request body must be valid JSON')
+        if not isinstance(body, dict):
+            raise web.HTTPBadRequest(text='Request body must be a JSON object')
+        return body
+
+    async def handle_search(self, request: web.Request) -> web.Response:
+        body = await self._body(request)
+        query = body.get('query')
+        if not query:
+            raise web.HTTPBadRequest(text='"query" is required')
+        try:
+            contexts = await self.search(
+                query, int(body.get('top_k', 5)), body.get('mode'), self._filters(body))
+        except ValueError as e:
+            raise web.HTTPBadRequest(text=str(e))
+        return web.json_response({'results': self._serialize(contexts)})
+
+    async def handle_ask(self, request: web.Request) -> web.Response:
+        body = await self._body(request)
+        question = body.get('question')
+        if not question:
+            raise web.HTTPBadRequest(text='"question" is required')
+        try:
+            result = await self.ask(
+                question, int(body.get('top_k', 5)), body.get('mode'), self._filters(body))
+        except ValueError as e:
+            raise web.HTTPBadRequest(text=str(e))
+        return web.json_response({'answer': result['answer'], 'contexts': self._serialize(result['contexts'])})
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        stats = {'query_cache': self.rag.query_cache.stats()}
+        if self.rag.cache is not None:
+            stats['content_cache'] = self.rag.cache.stats()
+        return web.json_response(stats)
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=METRICS.to_prometheus(), content_type='text/plain', charset='utf-8')
+
+    async def _startup(self, app: web.Application):
+        if isinstance(self.rag.backend, PostgresBackend):
+            self.engine = create_search_engine(self.config)
+            if self.config.ANN_ITERATIVE_SCAN:
+                # Look the pgvector version up now rather than on the event loop
+                await self._run_blocking(self.rag.supports_iterative_scan)
+        self.llm_semaphore = asyncio.Semaphore(self.config.SERVER_LLM_CONCURRENCY)
+
+    async def _cleanup(self, app: web.Application):
+        if self.engine is not None:
+            await self.engine.dispose()
+        self.executor.shutdown(wait=False)
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.add_routes([
+            web.post('/search', self.handle_search),
+            web.post('/ask', self.handle_ask),
+            web.get('/stats', self.handle_stats),
+            web.get('/metrics', self.handle_metrics),
+        ])
+        app.on_startup.append(self._startup)
+        app.on_cleanup.append(self._cleanup)
+        return app
+
+def serve(config, host: str = "127.0.0.1", port: int = 8080):
+    """Run the query server until interrupted"""
+    server = RAGServer(RAG(config))
+    web.run_app(server.create_app(), host=host, port=port)
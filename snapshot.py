@@ -0,0 +1,273 @@
+from cache import hash_text
+from collections.abc import Sequence
+from typing import Dict, Iterator, Optional
+import json
+import os
+import numpy as np
+
+FORMAT_VERSION = 1
+
+# Variable-length columns: UTF-8 blobs addressed by an int64 end-offset array
+TEXT_COLUMNS = ("original_text", "context", "contextualized_text", "source", "metadata")
+# Fixed-width columns: name -> numpy dtype
+FIXED_COLUMNS = {"chunk_index": np.int32, "chunk_hash": "S64", "document_hash": "S64"}
+EMBEDDING_DTYPES = ("float32", "float16")
+
+class _TextColumn:
+    """Read-only view of a text column: row i is blob[ends[i - 1]:ends[i]]"""
+
+    def __init__(self, blob: np.ndarray, ends: np.ndarray):
+        self.blob = blob
+        self.ends = ends
+
+    def __len__(self) -> int:
+        return len(self.ends)
+
+    def __getitem__(self, i: int) -> str:
+        start = self.ends[i - 1] if i > 0 else 0
+        return self.blob[start:self.ends[i]].tobytes().decode("utf-8")
+
+class SnapshotChunks(Sequence):
+    """Chunk dictionaries of a snapshot, decoded on access"""
+
+    def __init__(self, snapshot: "Snapshot"):
+        self.snapshot = snapshot
+
+    def __len__(self) -> int:
+        return len(self.snapshot)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self.snapshot.chunk(i)
+
+class Snapshot:
+    """
+    Columnar, versioned on-disk snapshot of a knowledge base.
+
+    A snapshot is a directory holding one file per column: the embedding
+    matrix as raw float32 or float16, fixed-width columns as raw arrays, and
+    text columns as a UTF-8 blob plus an array of end offsets. Metadata is
+    stored per row as a JSON text column. Opening a snapshot memory-maps every
+    file, so loading is instant and nothing is parsed until a row is read.
+
+    meta.json holds the committed row count and is replaced atomically after
+    every append. Appends only write past the end of each file, so they never
+    rewrite existing data; bytes left behind by an interrupted append are
+    ignored and truncated by the next one.
+    """
+
+    def __init__(self, path: str, meta: Dict, mmap: bool = True):
+        self.path = path
+        self.meta = meta
+        self.mmap = mmap
+        self._columns = None
+
+    # --- Creation and loading ---
+
+    @classmethod
+    def create(cls, path: str, dimension: int, embedding_dtype: str = "float32") -> "Snapshot":
+        """
+        Create an empty snapshot.
+
+        Args:
+            path: Snapshot directory (must not already contain a snapshot)
+            dimension: Embedding dimension
+            embedding_dtype: "float32" or "float16"
+
+        Returns:
+            Empty Snapshot
+        """
+        if embedding_dtype not in EMBEDDING_DTYPES:
+            raise ValueError(f"Unsupported embedding dtype: {embedding_dtype}")
+        if os.path.exists(os.path.join(path, "meta.json")):
+            raise FileExistsError(f"Snapshot already exists: {path}")
+        os.makedirs(path, exist_ok=True)
+
+        snapshot = cls(path, {
+            "version": FORMAT_VERSION,
+            "rows": 0,
+            "dimension": dimension,
+            "embedding_dtype": embedding_dtype,
+            "text_bytes": {column: 0 for column in TEXT_COLUMNS}
+        })
+        for name in snapshot._file_sizes():
+            open(os.path.join(path, name), "wb").close()
+        snapshot._write_meta()
+        return snapshot
+
+    @classmethod
+    def open(cls, path: str, mmap: bool = True) -> "Snapshot":
+        """
+        Open an existing snapshot.
+
+        Args:
+            path: Snapshot directory
+            mmap: Memory-map the columns instead of reading them into memory
+
+        Returns:
+            Snapshot
+        """
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot version: {meta['version']}")
+        return cls(path, meta, mmap=mmap)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.isfile(os.path.join(path, "meta.json"))
+
+    def _write_meta(self) -> None:
+        tmp_path = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.path, "meta.json"))
+
+    def _file_sizes(self) -> Dict[str, int]:
+        """Committed size in bytes of every column file"""
+        rows = self.meta["rows"]
+        itemsize = np.dtype(self.meta["embedding_dtype"]).itemsize
+        sizes = {"embeddings.bin": rows * self.meta["dimension"] * itemsize}
+        for column, dtype in FIXED_COLUMNS.items():
+            sizes[f"{column}.bin"] = rows * np.dtype(dtype).itemsize
+        for column in TEXT_COLUMNS:
+            sizes[f"{column}.bin"] = self.meta["text_bytes"][column]
+            sizes[f"{column}.ends"] = rows * 8
+        return sizes
+
+    def _array(self, name: str, dtype, shape=None) -> np.ndarray:
+        file_path = os.path.join(self.path, name)
+        count = self._file_sizes()[name] // np.dtype(dtype).itemsize
+        if count == 0:
+            array = np.empty(0, dtype=dtype)
+        elif self.mmap:
+            array = np.memmap(file_path, dtype=dtype, mode="r", shape=(count,))
+        else:
+            array = np.fromfile(file_path, dtype=dtype, count=count)
+        return array.reshape(shape) if shape is not None else array
+
+    @property
+    def columns(self) -> Dict:
+        if self._columns is None:
+            columns = {
+                "embeddings": self._array(
+                    "embeddings.bin", self.meta["embedding_dtype"], (self.meta["rows"], self.meta["dimension"]))
+            }
+            for column, dtype in FIXED_COLUMNS.items():
+                columns[column] = self._array(f"{column}.bin", dtype)
+            for column in TEXT_COLUMNS:
+                columns[column] = _TextColumn(
+                    self._array(f"{column}.bin", np.uint8), self._array(f"{column}.ends", np.int64))
+            self._columns = columns
+        return self._columns
+
+    # --- Reading ---
+
+    def __len__(self) -> int:
+        return self.meta["rows"]
+
+    @property
+    def dimension(self) -> int:
+        return self.meta["dimension"]
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        """Embedding matrix (rows x dimension), memory-mapped"""
+        return self.columns["embeddings"]
+
+    @property
+    def chunks(self) -> SnapshotChunks:
+        """Sequence of chunk dictionaries, decoded on access"""
+        return SnapshotChunks(self)
+
+    def metadata(self, i: int) -> Optional[Dict]:
+        """Metadata of row i"""
+        return json.loads(self.columns["metadata"][i])
+
+    def chunk(self, i: int) -> Dict:
+        """
+        Decode one row.
+
+        Args:
+            i: Row number
+
+        Returns:
+            Chunk dictionary in the format produced by build_contextualized_chunk,
+            plus chunk_hash, source and document_hash
+        """
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        columns = self.columns
+        return {
+            'original_text': columns["original_text"][i],
+            'context': columns["context"][i],
+            'contextualized_text': columns["contextualized_text"][i],
+            'chunk_index': int(columns["chunk_index"][i]),
+            'metadata': self.metadata(i),
+            'chunk_hash': columns["chunk_hash"][i].decode("ascii"),
+            'source': columns["source"][i],
+            'document_hash': columns["document_hash"][i].decode("ascii")
+        }
+
+    def iter_chunks(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self.chunk(i)
+
+    # --- Appending ---
+
+    def append(self, chunks: Sequence[Dict], embeddings: np.ndarray) -> None:
+        """
+        Append rows without rewriting existing data.
+
+        Args:
+            chunks: Chunk dictionaries (original_text, context,
+                contextualized_text, chunk_index, metadata; optionally
+                chunk_hash, source and document_hash)
+            embeddings: Matching embedding matrix
+        """
+        embeddings = np.asarray(embeddings, dtype=self.meta["embedding_dtype"])
+        if len(chunks) != len(embeddings):
+            raise ValueError("chunks and embeddings must have the same length")
+        if len(chunks) == 0:
+            return
+        if embeddings.shape[1] != self.meta["dimension"]:
+            raise ValueError(f"Expected {self.meta['dimension']}-dimensional embeddings, got {embeddings.shape[1]}")
+
+        sizes = self._file_sizes()
+        columns = {
+            "embeddings.bin": embeddings.tobytes(),
+            "chunk_index.bin": np.array([c['chunk_index'] for c in chunks], dtype=np.int32).tobytes(),
+            "chunk_hash.bin": np.array(
+                [c.get('chunk_hash') or hash_text(c['original_text']) for c in chunks], dtype="S64").tobytes(),
+            "document_hash.bin": np.array([c.get('document_hash') or "" for c in chunks], dtype="S64").tobytes(),
+        }
+        text_bytes = dict(self.meta["text_bytes"])
+        for column in TEXT_COLUMNS:
+            if column == "metadata":
+                values = [json.dumps(c.get('metadata')) for c in chunks]
+            elif column == "source":
+                values = [c.get('source') or (c.get('metadata') or {}).get('source') or "" for c in chunks]
+            else:
+                values = [c[column] for c in chunks]
+            encoded = [value.encode("utf-8") for value in values]
+            ends = text_bytes[column] + np.cumsum([len(value) for value in encoded], dtype=np.int64)
+            columns[f"{column}.bin"] = b"".join(encoded)
+            columns[f"{column}.ends"] = ends.tobytes()
+            text_bytes[column] = int(ends[-1])
+
+        for name, data in columns.items():
+            with open(os.path.join(self.path, name), "r+b") as f:
+                # Drop anything an interrupted append left past the committed end
+                f.truncate(sizes[name])
+                f.seek(sizes[name])
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+
+        self.meta["rows"] += len(chunks)
+        self.meta["text_bytes"] = text_bytes
+        self._write_meta()
+        self._columns = None
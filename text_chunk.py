@@ -1,8 +1,202 @@
 import google.generativeai as genai
-from typing import List, Dict, Tuple
+from google.generativeai import caching
+from embedder import BatchEmbedder, RETRYABLE_ERRORS, estimate_tokens
+from cache import ContentCache, hash_text, make_key
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, Iterable, Iterator, List, Tuple
 import numpy as np
-from rank_bm25 import BM25Okapi
+from chunker import StreamingChunker, iter_text_windows
+from lexical_index import LexicalIndex
+from metrics import METRICS
+from scheduler import BULK, INTERACTIVE, RateLimitScheduler
+from snapshot import Snapshot
 import json
+import os
+import re
+import shutil
+import threading
+import time
+
+def generate_content(
+    model,
+    prompt: str,
+    purpose: str,
+    scheduler: RateLimitScheduler = None,
+    priority: str = BULK
+) -> str:
+    """
+    Call model.generate_content, counting the call and its tokens.
+    
+    Args:
+        model: Gemini GenerativeModel
+        prompt: Prompt text
+        purpose: Metrics label for the call ("context" or "answer")
+        scheduler: Scheduler the call is admitted through (None calls directly)
+        priority: Scheduler lane, INTERACTIVE or BULK
+        
+    Returns:
+        Stripped response text
+    """
+    METRICS.inc("api_calls", api="generate", purpose=purpose)
+    if scheduler is None:
+        response = model.generate_content(prompt)
+    else:
+        response = scheduler.call(
+            model.generate_content, prompt, tokens=estimate_tokens(prompt), priority=priority)
+    text = response.text.strip()
+    # Use the reported usage when the response carries it
+    usage = getattr(response, "usage_metadata", None)
+    input_tokens = getattr(usage, "prompt_token_count", None) or estimate_tokens(prompt)
+    output_tokens = getattr(usage, "candidates_token_count", None) or estimate_tokens(text)
+    METRICS.inc("tokens", input_tokens, api="generate", purpose=purpose, direction="input")
+    METRICS.inc("tokens", output_tokens, api="generate", purpose=purpose, direction="output")
+    return text
+
+class DocumentContextSession:
+    """
+    Document-scoped context generation.
+    
+    The whole document is sent once per session: as Gemini cached content when
+    the document is large enough to be cached, otherwise as a prefix built once
+    and shared by every request. Several chunks are packed into each request and
+    the per-chunk contexts are parsed back out of the response.
+    """
+    
+    CONTEXT_PATTERN = re.compile(r'<context id="(\d+)">\s*(.*?)\s*</context>', re.DOTALL)
+    
+    def __init__(
+        self,
+        model_name: str,
+        model,
+        document: str,
+        chunks_per_request: int = 1,
+        cache_min_chars: int = 0,
+        cache_ttl_minutes: int = 10,
+        scheduler: RateLimitScheduler = None
+    ):
+        self.model = model
+        self.scheduler = scheduler
+        self.chunks_per_request = max(1, chunks_per_request)
+        self.prefix = f"<document>\n{document}\n</document>\n\n"
+        self.cached_content = None
+        self.cached_model = None
+        self.cache_ttl = timedelta(minutes=cache_ttl_minutes)
+        self._cache_lock = threading.Lock()
+        self._cache_refreshed = 0.0
+        
+        if cache_min_chars and len(document) >= cache_min_chars:
+            try:
+                self.cached_content = caching.CachedContent.create(
+                    model=model_name,
+                    contents=[self.prefix],
+                    ttl=self.cache_ttl
+                )
+                self._cache_refreshed = time.monotonic()
+                self.cached_model = genai.GenerativeModel.from_cached_content(
+                    cached_content=self.cached_content)
+            except Exception as e:
+                print(f"  Context caching unavailable, sending document inline: {e}")
+    
+    def _extend_cache(self) -> None:
+        """Push the cached document's expiry a full TTL out once half of it has passed"""
+        with self._cache_lock:
+            if (self.cached_content is None
+                    or time.monotonic() - self._cache_refreshed < self.cache_ttl.total_seconds() / 2):
+                return
+            self.cached_content.update(ttl=self.cache_ttl)
+            self._cache_refreshed = time.monotonic()
+    
+    def _send_inline(self, error: Exception) -> None:
+        """Stop using the cached document (e.g. it expired) and send it inline from now on"""
+        with self._cache_lock:
+            if self.cached_model is None:
+                return
+            print(f"  Cached document unavailable, sending it inline: {error}")
+            self.cached_model = None
+        self.close()
+    
+    def _ask(self, prompt: str) -> str:
+        cached_model = self.cached_model
+        if cached_model is not None:
+            try:
+                self._extend_cache()
+                with METRICS.timer("context"):
+                    return generate_content(cached_model, prompt, "context", self.scheduler)
+            except Exception as e:
+                self._send_inline(e)
+        with METRICS.timer("context"):
+            return generate_content(self.model, self.prefix + prompt, "context", self.scheduler)
+    
+    def generate_context(self, chunk: Dict) -> str:
+        """
+        Generate context for a single chunk, returning an empty context on error
+        so a single failed request does not discard the rest of the document.
+        """
+        prompt = f"""Here is the chunk we want to situate within the whole document
+<chunk>
+{chunk['text']}
+</chunk>
+
+Please give a short succinct context to situate this chunk within the overall document for the purposes of improving search retrieval of the chunk. Answer only with the succinct context and nothing else."""
+        try:
+            return self._ask(prompt)
+        except Exception as e:
+            print(f"  Context generation failed for chunk {chunk['chunk_index']}: {e}")
+            return ""
+    
+    def generate_contexts(self, chunks: List[Dict]) -> List[str]:
+        """
+        Generate contexts for a group of chunks in one request.
+        
+        Chunks missing from the response, or a failed request, fall back to one
+        request per chunk.
+        
+        Args:
+            chunks: Chunk dictionaries to contextualize together
+            
+        Returns:
+            Context strings in the same order as chunks
+        """
+        if len(chunks) == 1:
+            return [self.generate_context(chunks[0])]
+        
+        chunk_elements = "\n".join(
+            f'<chunk id="{i}">\n{chunk["text"]}\n</chunk>'
+            for i, chunk in enumerate(chunks)
+        )
+        prompt = f"""Here are the chunks we want to situate within the whole document
+{chunk_elements}
+
+Please give a short succinct context to situate each chunk within the overall document for the purposes of improving search retrieval of the chunk. Answer only with one <context id="N">...</context> element per chunk, using the id of the chunk, and nothing else."""
+        
+        try:
+            parsed = {int(i): text for i, text in self.CONTEXT_PATTERN.findall(self._ask(prompt))}
+        except Exception as e:
+            print(f"  Packed context request failed, retrying chunks individually: {e}")
+            parsed = {}
+        
+        return [
+            parsed.get(i) or self.generate_context(chunk)
+            for i, chunk in enumerate(chunks)
+        ]
+    
+    def close(self):
+        """Delete the cached document, if one was created"""
+        with self._cache_lock:
+            cached_content, self.cached_content = self.cached_content, None
+            self.cached_model = None
+        if cached_content is not None:
+            try:
+                cached_content.delete()
+            except Exception as e:
+                print(f"  Failed to delete cached content: {e}")
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
 
 class GeminiContextualRetrieval:
     """
@@ -17,52 +211,106 @@ class GeminiContextualRetrieval:
         google_model: str,
         google_embedding_model: str,
         chunk_size: int = 800,
-        chunk_overlap: int = 100
+        chunk_overlap: int = 100,
+        max_concurrency: int = 1,
+        chunks_per_request: int = 1,
+        context_cache_min_chars: int = 0,
+        context_cache_ttl_minutes: int = 10,
+        embedding_batch_size: int = 100,
+        embedding_batch_tokens: int = 32000,
+        embedding_concurrency: int = 4,
+        embedding_dimension: int = 768,
+        generate_rpm: int = 0,
+        generate_tpm: int = 0,
+        generate_concurrency: int = 16,
+        embedding_rpm: int = 0,
+        embedding_tpm: int = 0,
+        cache: ContentCache = None
     ):
         genai.configure(api_key=google_api_key)
+        self.google_model = google_model
         self.gemini_model = genai.GenerativeModel(google_model)
         self.google_embedding_model = google_embedding_model
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.max_concurrency = max(1, max_concurrency)
+        self.chunks_per_request = max(1, chunks_per_request)
+        self.context_cache_min_chars = context_cache_min_chars
+        self.context_cache_ttl_minutes = context_cache_ttl_minutes
+        self.cache = cache
+        # Every generate and embed request is admitted by its API's scheduler
+        self.generate_scheduler = RateLimitScheduler(
+            "generate",
+            rpm=generate_rpm,
+            tpm=generate_tpm,
+            max_concurrency=generate_concurrency,
+            retryable=RETRYABLE_ERRORS
+        )
+        self.embed_scheduler = RateLimitScheduler(
+            "embed",
+            rpm=embedding_rpm,
+            tpm=embedding_tpm,
+            max_concurrency=embedding_concurrency,
+            retryable=RETRYABLE_ERRORS
+        )
+        self.embedder = BatchEmbedder(
+            model=google_embedding_model,
+            dimension=embedding_dimension,
+            batch_size=embedding_batch_size,
+            max_batch_tokens=embedding_batch_tokens,
+            max_concurrency=embedding_concurrency,
+            cache=cache,
+            scheduler=self.embed_scheduler
+        )
     
     def chunk_document(self, document: str, doc_metadata: Dict = None) -> List[Dict]:
         """
-        Split document into overlapping chunks.
+        Split document into overlapping chunks of at most chunk_size estimated
+        tokens, at paragraph and sentence boundaries.
         
         Args:
             document: Full document text
             doc_metadata: Optional metadata (title, source, date, etc.)
             
         Returns:
-            List of chunk dictionaries with text and metadata
+            List of chunk dictionaries with text and metadata (including the
+            chunk's start_char and end_char in the document)
+        """
+        with METRICS.timer("chunk"):
+            return list(self.iter_chunks(iter_text_windows(document), doc_metadata, pages=False))
+    
+    def iter_chunks(self, pieces: Iterable[str], doc_metadata: Dict = None, pages: bool = True) -> Iterator[Dict]:
         """
-        chunks = []
-        words = document.split()
+        Chunk a streaming text source, such as PdfParser.read_pages_generator(),
+        holding only about one chunk and one piece in memory. Ingestion still
+        holds each whole document, since context generation prompts with it;
+        this is for consumers that only need the chunks.
         
-        for i in range(0, len(words), self.chunk_size - self.chunk_overlap):
-            chunk_words = words[i:i + self.chunk_size]
-            chunk_text = ' '.join(chunk_words)
-            
-            chunks.append({
-                'text': chunk_text,
-                'chunk_index': len(chunks),
-                'metadata': doc_metadata or {}
-            })
+        Args:
+            pieces: Iterable of text pieces whose concatenation is the document
+            doc_metadata: Optional metadata (title, source, date, etc.)
+            pages: Whether the pieces are pages; if so, page in the chunk
+                metadata is the index of the page the chunk starts in
             
-        return chunks
+        Yields:
+            Chunk dictionaries as returned by chunk_document
+        """
+        chunker = StreamingChunker(max_tokens=self.chunk_size, overlap_tokens=self.chunk_overlap)
+        return chunker.chunks(pieces, doc_metadata, pages=pages)
 
-    def ask_gemini(self, prompt: str) -> str:
+    def ask_gemini(self, prompt: str, purpose: str = "answer", priority: str = INTERACTIVE) -> str:
         """
         Use Gemini LLM to generate content based on a prompt.
         
         Args:
             prompt: The prompt string to send to Gemini
+            purpose: Metrics label for the call ("answer" or "context")
+            priority: Scheduler lane, INTERACTIVE (default) or BULK
             
         Returns:
             Generated text response from Gemini
         """
-        response = self.gemini_model.generate_content(prompt)
-        return response.text.strip()
+        return generate_content(self.gemini_model, prompt, purpose, self.generate_scheduler, priority)
     
     def generate_context_for_chunk(
         self,
@@ -79,6 +327,12 @@ class GeminiContextualRetrieval:
         Returns:
             Contextual description string (50-100 tokens)
         """
+        key = self._context_key(hash_text(whole_document), chunk_text)
+        if self.cache is not None:
+            cached = self.cache.get_texts([key])
+            if key in cached:
+                return cached[key]
+        
         prompt = f"""<document>
 {whole_document}
 </document>
@@ -90,9 +344,16 @@ Here is the chunk we want to situate within the whole document
 
 Please give a short succinct context to situate this chunk within the overall document for the purposes of improving search retrieval of the chunk. Answer only with the succinct context and nothing else."""
         
-        response = self.ask_gemini(prompt)
+        with METRICS.timer("context"):
+            response = self.ask_gemini(prompt, purpose="context", priority=BULK)
+        if self.cache is not None and response:
+            self.cache.put_texts({key: response})
         return response
     
+    def _context_key(self, document_hash: str, chunk_text: str) -> str:
+        """Cache key for the context of a chunk within a document"""
+        return make_key(self.google_model, "context", document_hash, chunk_text)
+    
     def process_document(self, document: str, doc_metadata: Dict = None) -> List[Dict]:
         """
         Complete preprocessing pipeline for a single document:
@@ -112,45 +373,140 @@ Please give a short succinct context to situate this chunk within the overall do
         
         print(f"Generated {len(chunks)} chunks. Generating contextual information with Gemini...")
         
-        contextualized_chunks = []
-        for i, chunk in enumerate(chunks):
-            print(f"Processing chunk {i+1}/{len(chunks)}...")
+        return self.contextualize_chunks(document, chunks)
+    
+    def open_context_session(self, document: str) -> DocumentContextSession:
+        """
+        Open a document-scoped session for generating chunk contexts.
+        
+        Args:
+            document: Full document text
+            
+        Returns:
+            DocumentContextSession; close it (or use it as a context manager) when done
+        """
+        return DocumentContextSession(
+            model_name=self.google_model,
+            model=self.gemini_model,
+            document=document,
+            chunks_per_request=self.chunks_per_request,
+            cache_min_chars=self.context_cache_min_chars,
+            cache_ttl_minutes=self.context_cache_ttl_minutes,
+            scheduler=self.generate_scheduler
+        )
+    
+    def cached_contexts(self, document: str, chunks: List[Dict]) -> List:
+        """
+        Look up previously generated contexts for chunks of a document.
+        
+        Args:
+            document: Full document text
+            chunks: Chunk dictionaries as returned by chunk_document
+            
+        Returns:
+            List with the cached context string, or None, for each chunk
+        """
+        if self.cache is None:
+            return [None] * len(chunks)
+        document_hash = hash_text(document)
+        keys = [self._context_key(document_hash, chunk['text']) for chunk in chunks]
+        cached = self.cache.get_texts(keys)
+        return [cached.get(key) for key in keys]
+    
+    def store_contexts(self, document: str, chunks: List[Dict], contexts: List[str]) -> None:
+        """
+        Cache generated contexts. Empty contexts (failed requests) are not cached.
+        
+        Args:
+            document: Full document text
+            chunks: Chunk dictionaries the contexts belong to
+            contexts: Generated context for each chunk
+        """
+        if self.cache is None:
+            return
+        document_hash = hash_text(document)
+        self.cache.put_texts({
+            self._context_key(document_hash, chunk['text']): context
+            for chunk, context in zip(chunks, contexts)
+            if context
+        })
+    
+    @staticmethod
+    def build_contextualized_chunk(chunk: Dict, context: str) -> Dict:
+        """
+        Prepend a generated context to a chunk.
+        
+        Args:
+            chunk: Chunk dictionary as returned by chunk_document
+            context: Generated context (may be empty)
             
-            # Generate context
-            context = self.generate_context_for_chunk(
-                whole_document=document,
-                chunk_text=chunk['text']
-            )
+        Returns:
+            Processed chunk with contextualized text
+        """
+        return {
+            'original_text': chunk['text'],
+            'context': context,
+            'contextualized_text': f"{context}\n\n{chunk['text']}" if context else chunk['text'],
+            'chunk_index': chunk['chunk_index'],
+            'metadata': chunk['metadata']
+        }
+    
+    def contextualize_chunks(self, document: str, chunks: List[Dict]) -> List[Dict]:
+        """
+        Generate context for each chunk and prepend it to the chunk text.
+        
+        The document is sent once per session and chunks_per_request chunks are
+        packed into each request. Up to max_concurrency requests are kept in
+        flight at once. Results are returned in the same order as the input chunks.
+        
+        Args:
+            document: Full document text
+            chunks: Chunk dictionaries as returned by chunk_document
             
-            # Create contextualized version
-            contextualized_text = f"{context}\n\n{chunk['text']}"
+        Returns:
+            List of processed chunks with contextualized text
+        """
+        contexts = self.cached_contexts(document, chunks)
+        
+        pending = [i for i, context in enumerate(contexts) if context is None]
+        if pending:
+            groups = [
+                [chunks[i] for i in pending[j:j + self.chunks_per_request]]
+                for j in range(0, len(pending), self.chunks_per_request)
+            ]
+            print(f"Processing {len(pending)} chunks in {len(groups)} requests "
+                  f"with up to {self.max_concurrency} in flight...")
             
-            contextualized_chunks.append({
-                'original_text': chunk['text'],
-                'context': context,
-                'contextualized_text': contextualized_text,
-                'chunk_index': chunk['chunk_index'],
-                'metadata': chunk['metadata']
-            })
+            with self.open_context_session(document) as session:
+                with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                    # map() yields results in submission order, preserving chunk_index order
+                    generated = [
+                        context
+                        for group_contexts in executor.map(session.generate_contexts, groups)
+                        for context in group_contexts
+                    ]
             
-        return contextualized_chunks
+            for i, context in zip(pending, generated):
+                contexts[i] = context
+            self.store_contexts(document, [chunks[i] for i in pending], generated)
+        
+        return [
+            self.build_contextualized_chunk(chunk, context)
+            for chunk, context in zip(chunks, contexts)
+        ]
     
-    def create_embedding(self, text: str) -> List[float]:
+    def create_embedding(self, text: str, priority: str = INTERACTIVE) -> List[float]:
         """
         Generate embedding for a single text using Gemini.
         
         Args:
             text: Text to embed
+            priority: Scheduler lane, INTERACTIVE (default) or BULK
             
         Returns:
             Embedding vector as list of floats
         """
-        result = genai.embed_content(
-            model="models/text-embedding-004",
-            content=text,
-            task_type="retrieval_document"
-        )
-        return result['embedding']
+        return self.embedder.embed([text], task_type="retrieval_document", priority=priority)[0].tolist()
     
     def create_embeddings(self, chunks: List[Dict]) -> np.ndarray:
         """
@@ -160,28 +516,12 @@ Please give a short succinct context to situate this chunk within the overall do
             chunks: List of chunk dictionaries with 'contextualized_text'
             
         Returns:
-            Numpy array of embeddings
+            float32 numpy array of embeddings
         """
         texts = [chunk['contextualized_text'] for chunk in chunks]
-        
-        print(f"Generating Gemini embeddings for {len(texts)} chunks...")
-        
-        # Gemini embedding API
-        embeddings = []
-        for i, text in enumerate(texts):
-            if i % 10 == 0:
-                print(f"  Embedding chunk {i+1}/{len(texts)}...")
-            
-            result = genai.embed_content(
-                model=self.google_embedding_model,
-                content=text,
-                task_type="retrieval_document"
-            )
-            embeddings.append(result['embedding'])
-        
-        return np.array(embeddings)
+        return self.embedder.embed(texts, task_type="retrieval_document")
     
-    def create_bm25_index(self, chunks: List[Dict]) -> BM25Okapi:
+    def create_bm25_index(self, chunks: List[Dict]) -> LexicalIndex:
         """
         Create BM25 index from contextualized chunks for exact term matching.
         
@@ -189,28 +529,35 @@ Please give a short succinct context to situate this chunk within the overall do
             chunks: List of chunk dictionaries with 'contextualized_text'
             
         Returns:
-            BM25Okapi index object
+            LexicalIndex keyed by the position of each chunk in chunks
         """
         print(f"Creating BM25 index...")
         
-        # Tokenize the contextualized text
-        tokenized_chunks = [
-            chunk['contextualized_text'].lower().split()
-            for chunk in chunks
-        ]
-        
-        bm25_index = BM25Okapi(tokenized_chunks)
+        bm25_index = LexicalIndex()
+        bm25_index.add_documents(
+            range(len(chunks)),
+            (chunk['contextualized_text'] for chunk in chunks)
+        )
+        bm25_index.compact()
         return bm25_index
     
     def preprocess_knowledge_base(
         self,
-        documents: List[Tuple[str, Dict]]
+        documents: List[Tuple[str, Dict]],
+        checkpoint_path: str = None
     ) -> Dict:
         """
         Complete preprocessing pipeline for entire knowledge base.
         
+        With a checkpoint_path, each document's chunks and embeddings are
+        appended to a snapshot there as soon as the document is done, so an
+        interrupted run loses at most one document; running again with the
+        same path skips the documents (by source) already in it.
+        The snapshot and its BM25 index are then the saved output.
+        
         Args:
             documents: List of (document_text, metadata) tuples
+            checkpoint_path: Snapshot directory to checkpoint into
             
         Returns:
             Dictionary containing all processed data:
@@ -218,6 +565,9 @@ Please give a short succinct context to situate this chunk within the overall do
             - embeddings: Numpy array of embeddings
             - bm25_index: BM25 index object
         """
+        if checkpoint_path is not None:
+            return self._preprocess_with_checkpoints(documents, checkpoint_path)
+        
         all_chunks = []
         
         for i, (doc_text, doc_metadata) in enumerate(documents):
@@ -228,9 +578,8 @@ Please give a short succinct context to situate this chunk within the overall do
         print(f"\nTotal chunks processed: {len(all_chunks)}")
         
         # Create embeddings
+        print(f"Generating Gemini embeddings for {len(all_chunks)} chunks...")
         embeddings = self.create_embeddings(all_chunks)
-
-        print(all_chunks)
         
         # Create BM25 index
         bm25_index = self.create_bm25_index(all_chunks)
@@ -241,19 +590,121 @@ Please give a short succinct context to situate this chunk within the overall do
             'bm25_index': bm25_index
         }
     
-    def save_preprocessed_data(self, data: Dict, output_path: str):
+    def _preprocess_with_checkpoints(self, documents: List[Tuple[str, Dict]], checkpoint_path: str) -> Dict:
+        """preprocess_knowledge_base, appending each document to a snapshot"""
+        if Snapshot.exists(checkpoint_path):
+            snapshot = Snapshot.open(checkpoint_path)
+        else:
+            snapshot = Snapshot.create(checkpoint_path, self.embedder.dimension)
+        sources = snapshot.columns["source"]
+        done = {sources[i] for i in range(len(snapshot))}
+        
+        for i, (doc_text, doc_metadata) in enumerate(documents):
+            source = (doc_metadata or {}).get('source') or hash_text(doc_text)
+            print(f"\n=== Processing document {i+1}/{len(documents)}: {source} ===")
+            if source in done:
+                print("Already in the checkpoint, skipping.")
+                continue
+            chunks = self.process_document(doc_text, doc_metadata)
+            document_hash = hash_text(doc_text)
+            for chunk in chunks:
+                chunk['source'] = source
+                chunk['document_hash'] = document_hash
+            if chunks:
+                print(f"Generating Gemini embeddings for {len(chunks)} chunks...")
+                snapshot.append(chunks, self.create_embeddings(chunks))
+            done.add(source)
+        
+        print(f"\nTotal chunks processed: {len(snapshot)}")
+        bm25_index = self.create_bm25_index(snapshot.chunks)
+        bm25_index.save(os.path.join(checkpoint_path, "bm25"))
+        return {
+            'chunks': snapshot.chunks,
+            'embeddings': snapshot.embeddings,
+            'bm25_index': bm25_index,
+            'snapshot': snapshot
+        }
+    
+    def save_preprocessed_data(
+        self,
+        data: Dict,
+        output_path: str,
+        embedding_dtype: str = "float32",
+        append: bool = False
+    ):
         """
-        Save preprocessed data to disk for later use.
+        Save preprocessed data to disk for later use, as a columnar snapshot
+        directory (see snapshot.Snapshot) with the BM25 index in its bm25/
+        subdirectory. An existing snapshot at output_path is replaced unless
+        append is set.
         
         Args:
             data: Preprocessed data dictionary
-            output_path: Base path for output files
+            output_path: Snapshot directory
+            embedding_dtype: "float32" or "float16" for the stored embeddings
+            append: Add the chunks to an existing snapshot at output_path
+                instead of replacing it
         """
-        # Save embeddings
-        np.save(f"{output_path}_embeddings.npy", data['embeddings'])
+        source = data.get('snapshot')
+        if source is not None and os.path.realpath(source.path) == os.path.realpath(output_path):
+            # Checkpointed output is already saved in place
+            print(f"Preprocessed data is already saved to {output_path}")
+            return
         
-        # Save chunks
-        with open(f"{output_path}_chunks.json", 'w') as f:
-            json.dump(data['chunks'], f, indent=2)
+        if append and Snapshot.exists(output_path):
+            snapshot = Snapshot.open(output_path)
+        else:
+            if Snapshot.exists(output_path):
+                shutil.rmtree(output_path)
+            snapshot = Snapshot.create(output_path, data['embeddings'].shape[1], embedding_dtype)
+        first_row = len(snapshot)
+        snapshot.append(data['chunks'], data['embeddings'])
+        
+        # Save BM25 index, keyed by snapshot row
+        bm25_path = os.path.join(output_path, "bm25")
+        bm25_index = data.get('bm25_index')
+        if first_row and os.path.isdir(bm25_path):
+            bm25_index = LexicalIndex.load(bm25_path, mmap=False)
+            bm25_index.add_documents(
+                range(first_row, len(snapshot)),
+                (chunk['contextualized_text'] for chunk in data['chunks']))
+        elif first_row and bm25_index is not None:
+            # data's index is keyed from 0, not by snapshot row; index every row
+            bm25_index = self.create_bm25_index(snapshot.chunks)
+        if bm25_index is not None:
+            bm25_index.save(bm25_path)
         
         print(f"Saved preprocessed data to {output_path}")
+    
+    @staticmethod
+    def load_preprocessed_data(path: str) -> Dict:
+        """
+        Load data written by save_preprocessed_data. Embeddings are memory-mapped
+        and chunks are decoded on access, so loading does not depend on size.
+        Files in the older "{path}_embeddings.npy" / "{path}_chunks.json" layout
+        are read as well.
+        
+        Args:
+            path: Snapshot directory (or base path of the older layout)
+            
+        Returns:
+            Dictionary with chunks (a sequence of chunk dictionaries), embeddings
+            and bm25_index (None when no index was saved)
+        """
+        if Snapshot.exists(path):
+            snapshot = Snapshot.open(path)
+            bm25_path = os.path.join(path, "bm25")
+            return {
+                'chunks': snapshot.chunks,
+                'embeddings': snapshot.embeddings,
+                'bm25_index': LexicalIndex.load(bm25_path) if os.path.isdir(bm25_path) else None,
+                'snapshot': snapshot
+            }
+        
+        with open(f"{path}_chunks.json") as f:
+            chunks = json.load(f)
+        return {
+            'chunks': chunks,
+            'embeddings': np.load(f"{path}_embeddings.npy", mmap_mode="r"),
+            'bm25_index': LexicalIndex.load(f"{path}_bm25") if os.path.isdir(f"{path}_bm25") else None
+        }
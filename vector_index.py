@@ -0,0 +1,204 @@
+from typing import List, Optional, Sequence, Tuple
+import json
+import os
+import numpy as np
+
+FORMAT_VERSION = 1
+
+def normalize_rows(matrix: np.ndarray, block_size: int = 65536) -> np.ndarray:
+    """
+    L2-normalize the rows of a (possibly memory-mapped) matrix into a new
+    float32 array, a block at a time.
+
+    Args:
+        matrix: 2-D array of vectors
+        block_size: Rows processed per block
+
+    Returns:
+        Normalized float32 matrix
+    """
+    out = np.empty(matrix.shape, dtype=np.float32)
+    for start in range(0, len(matrix), block_size):
+        block = np.asarray(matrix[start:start + block_size], dtype=np.float32)
+        norms = np.linalg.norm(block, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        out[start:start + block_size] = block / norms
+    return out
+
+def _top_k(ids: np.ndarray, scores: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+    """Best top_k (id, score) pairs, highest score first"""
+    if len(scores) > top_k:
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        best = np.arange(len(scores))
+    best = best[np.argsort(-scores[best], kind="stable")]
+    return [(int(ids[i]), float(scores[i])) for i in best]
+
+class VectorIndex:
+    """
+    In-process cosine-similarity index.
+
+    Vectors are L2-normalized once, so scoring a query is a single
+    matrix-vector product and top-k selection an argpartition. For large
+    corpora an IVF partitioning groups the vectors by their nearest k-means
+    centroid and stores each list contiguously; a query then only scores the
+    `probes` lists whose centroids are closest to it.
+
+    Saved indexes are loaded memory-mapped, so opening one costs nothing and
+    the OS page cache is shared between processes.
+    """
+
+    def __init__(self, vectors: np.ndarray, ids: Sequence[int] = None, normalized: bool = False, probes: int = 8):
+        """
+        Args:
+            vectors: Embedding matrix, one row per item
+            ids: Id of each row (defaults to the row number)
+            normalized: Whether the rows are already unit length
+            probes: IVF lists scanned per query
+        """
+        self.vectors = vectors if normalized else normalize_rows(vectors)
+        self.ids = np.arange(len(vectors), dtype=np.int64) if ids is None else np.asarray(ids, dtype=np.int64)
+        self.probes = probes
+        # IVF partitioning: list l owns rows offsets[l]:offsets[l + 1]
+        self.centroids: Optional[np.ndarray] = None
+        self.offsets: Optional[np.ndarray] = None
+        self._rows_by_id: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    @property
+    def dimension(self) -> int:
+        return self.vectors.shape[1]
+
+    def build_ivf(self, n_lists: int = None, iterations: int = 10, sample_size: int = None, seed: int = 0) -> None:
+        """
+        Partition the vectors with spherical k-means and reorder them by list.
+
+        Args:
+            n_lists: Number of lists (defaults to sqrt of the row count)
+            iterations: k-means iterations
+            sample_size: Vectors used to train the centroids (defaults to 64 per list)
+            seed: Random seed
+        """
+        n = len(self.vectors)
+        n_lists = max(1, min(n, n_lists or int(np.sqrt(n))))
+        rng = np.random.default_rng(seed)
+        sample_size = min(n, sample_size or max(64 * n_lists, 10000))
+        sample = np.asarray(self.vectors[np.sort(rng.choice(n, size=sample_size, replace=False))])
+
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=n_lists)
+            empty = counts == 0
+            # Re-seed empty lists with random sample points
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            centroids = normalize_rows(sums)
+
+        assignment = np.empty(n, dtype=np.int32)
+        for start in range(0, n, 65536):
+            block = np.asarray(self.vectors[start:start + 65536])
+            assignment[start:start + 65536] = np.argmax(block @ centroids.T, axis=1)
+        order = np.argsort(assignment, kind="stable")
+
+        self.vectors = np.ascontiguousarray(self.vectors[order])
+        self.ids = self.ids[order]
+        self.centroids = centroids
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=n_lists))]).astype(np.int64)
+        self._rows_by_id = None
+
+    def rows_for_ids(self, ids: np.ndarray) -> np.ndarray:
+        """Row positions of the given ids"""
+        if self._rows_by_id is None:
+            rows_by_id = np.full(int(self.ids.max()) + 1 if len(self.ids) else 0, -1, dtype=np.int64)
+            rows_by_id[self.ids] = np.arange(len(self.ids))
+            self._rows_by_id = rows_by_id
+        rows = self._rows_by_id[ids]
+        return rows[rows >= 0]
+
+    def search(self, query: np.ndarray, top_k: int = 10, allowed_ids: np.ndarray = None) -> List[Tuple[int, float]]:
+        """
+        Find the most similar vectors to a query.
+
+        Args:
+            query: Query embedding
+            top_k: Number of results
+            allowed_ids: Optional ids to restrict the search to; searched
+                exactly, since a filter can leave the probed lists short of top_k
+
+        Returns:
+            List of (id, cosine similarity) tuples, best first
+        """
+        query = np.asarray(query, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+
+        if allowed_ids is not None:
+            rows = self.rows_for_ids(np.asarray(allowed_ids, dtype=np.int64))
+            return _top_k(self.ids[rows], self.vectors[rows] @ query, top_k)
+
+        if self.centroids is None:
+            return _top_k(self.ids, self.vectors @ query, top_k)
+
+        probes = min(self.probes, len(self.centroids))
+        lists = np.argpartition(-(self.centroids @ query), probes - 1)[:probes]
+        ids, scores = [], []
+        for l in lists:
+            start, end = self.offsets[l], self.offsets[l + 1]
+            if end > start:
+                ids.append(self.ids[start:end])
+                scores.append(self.vectors[start:end] @ query)
+        if not ids:
+            return []
+        return _top_k(np.concatenate(ids), np.concatenate(scores), top_k)
+
+    # --- Persistence ---
+
+    def save(self, path: str) -> None:
+        """
+        Write the index to a directory.
+
+        Args:
+            path: Output directory
+        """
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "vectors.npy"), self.vectors)
+        np.save(os.path.join(path, "ids.npy"), self.ids)
+        if self.centroids is not None:
+            np.save(os.path.join(path, "centroids.npy"), self.centroids)
+            np.save(os.path.join(path, "offsets.npy"), self.offsets)
+        # Written last, so a partially written index is never loadable
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({
+                "version": FORMAT_VERSION,
+                "rows": len(self.vectors),
+                "dimension": self.dimension,
+                "ivf": self.centroids is not None
+            }, f)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True, probes: int = 8) -> "VectorIndex":
+        """
+        Load an index written by save().
+
+        Args:
+            path: Index directory
+            mmap: Memory-map the vectors instead of reading them
+            probes: IVF lists scanned per query
+
+        Returns:
+            VectorIndex ready for queries
+        """
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported vector index version: {meta['version']}")
+
+        vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r" if mmap else None)
+        index = cls(vectors, np.load(os.path.join(path, "ids.npy")), normalized=True, probes=probes)
+        if meta["ivf"]:
+            index.centroids = np.load(os.path.join(path, "centroids.npy"))
+            index.offsets = np.load(os.path.join(path, "offsets.npy"))
+        return index
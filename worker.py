@@ -0,0 +1,213 @@
+from db import DBSession
+from pdf_parser import iter_pdf_texts, pdf_metadata
+from pipeline import IngestionPipeline
+from typing import Dict, Iterator, List, Tuple
+import os
+import socket
+import threading
+import time
+
+# Config settings holding API quotas shared by every worker process
+QUOTA_SETTINGS = ("GEMINI_RPM", "GEMINI_TPM", "EMBEDDING_RPM", "EMBEDDING_TPM")
+
+def share_quotas(config, workers: int):
+    """
+    Give config an equal share of each API quota, for one of `workers`
+    processes calling the API with the same key. Each process's schedulers
+    then keep to their share, so together they stay within the quota.
+
+    Args:
+        config: Config instance, modified in place
+        workers: Number of processes sharing the quotas
+
+    Returns:
+        config
+    """
+    if workers > 1:
+        for name in QUOTA_SETTINGS:
+            limit = getattr(config, name)
+            if limit:
+                setattr(config, name, max(1, limit // workers))
+    return config
+
+class LeaseLost(Exception):
+    """Raised in a worker's pipeline when tasks it holds were taken from it"""
+
+class QueueWorker:
+    """
+    Worker draining the ingestion work queue (the ingestion_tasks table).
+
+    Any number of workers, on any number of hosts, can run against the same
+    database: each claims a batch of documents with FOR UPDATE SKIP LOCKED,
+    holds a lease on them that a heartbeat thread renews while it works, and
+    runs them through its own IngestionPipeline under the tasks' job, so
+    progress is checkpointed as with a local job.
+
+    When the pipeline fails, the documents the job finished are completed and
+    the rest are given back to the queue, to be retried by any worker until
+    their attempts run out. A worker that dies simply stops renewing its
+    leases; its tasks are claimed again once they expire. A worker that finds
+    it could not renew a lease (it stalled past its expiry and the task was
+    claimed again or failed) stops its pipeline without writing what it has
+    in flight and gives its remaining tasks back, so two workers never keep
+    ingesting the same document.
+    """
+
+    def __init__(
+        self,
+        rag,
+        name: str = None,
+        batch_size: int = 8,
+        lease_seconds: float = 300,
+        poll_seconds: float = 2.0
+    ):
+        """
+        Args:
+            rag: RAG instance whose preprocessor and database are used
+            name: Worker name recorded on claimed tasks (default host:pid)
+            batch_size: Documents claimed and pipelined together
+            lease_seconds: Lease duration; tasks of a worker that stops
+                renewing it are claimed by others after this long
+            poll_seconds: Wait between claims while the queue is empty
+        """
+        self.rag = rag
+        self.config = rag.config
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.batch_size = max(1, batch_size)
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.stats = {'tasks_done': 0, 'tasks_retried': 0, 'documents': 0, 'chunks_written': 0}
+        # Leased tasks not settled yet, and the pipeline working on them;
+        # _lock orders lease renewals against settling tasks
+        self._held = set()
+        self._pipeline = None
+        self._lease_lost = threading.Event()
+        self._lock = threading.Lock()
+
+    def run(self, max_tasks: int = None, exit_when_empty: bool = False) -> Dict[str, int]:
+        """
+        Claim and process tasks until stopped.
+
+        Args:
+            max_tasks: Stop after claiming this many tasks (None for no limit)
+            exit_when_empty: Stop when no task can be claimed instead of polling
+
+        Returns:
+            Dictionary of counters (tasks_done, tasks_retried, documents,
+            chunks_written)
+        """
+        print(f"Worker {self.name} started.")
+        claimed = 0
+        while max_tasks is None or claimed < max_tasks:
+            limit = self.batch_size if max_tasks is None else min(self.batch_size, max_tasks - claimed)
+            with DBSession(self.config.DATABASE_URL) as session:
+                tasks = session.claim_tasks(self.name, limit, self.lease_seconds)
+                session.commit()
+            if not tasks:
+                if exit_when_empty:
+                    break
+                time.sleep(self.poll_seconds)
+                continue
+            claimed += len(tasks)
+            self._process(tasks)
+        print(f"Worker {self.name} stopped: {self.stats['tasks_done']} tasks done, "
+              f"{self.stats['tasks_retried']} given back, {self.stats['chunks_written']} chunks written.")
+        return self.stats
+
+    def _heartbeat(self, stop: threading.Event) -> None:
+        """Renew the leases on held tasks every third of a lease until stopped or a lease is lost"""
+        while not stop.wait(self.lease_seconds / 3):
+            try:
+                with self._lock, DBSession(self.config.DATABASE_URL) as session:
+                    task_ids = list(self._held)
+                    held = session.renew_leases(self.name, task_ids, self.lease_seconds)
+                    session.commit()
+            except Exception as e:
+                print(f"  Failed to renew leases: {e}")
+                continue
+            if held < len(task_ids):
+                error = LeaseLost(f"lost the lease on {len(task_ids) - held} of {len(task_ids)} tasks")
+                print(f"  Worker {self.name} {error}, stopping.")
+                self._lease_lost.set()
+                pipeline = self._pipeline
+                if pipeline is not None:
+                    pipeline.stop(error, flush=False)
+                return
+
+    def _process(self, tasks: List[Dict]) -> None:
+        self._held = {task['id'] for task in tasks}
+        self._lease_lost.clear()
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(stop,), daemon=True)
+        heartbeat.start()
+        try:
+            jobs = {}
+            for task in tasks:
+                jobs.setdefault(task['job_id'], []).append(task)
+            for job_id, job_tasks in jobs.items():
+                self._process_job(job_id, job_tasks)
+        finally:
+            stop.set()
+            heartbeat.join()
+        with DBSession(self.config.DATABASE_URL) as session:
+            session.finish_drained_jobs(list(jobs))
+            session.commit()
+
+    def _process_job(self, job_id: int, tasks: List[Dict]) -> None:
+        """Run one job's claimed tasks through the pipeline and settle them"""
+        pipeline = IngestionPipeline(
+            self.rag,
+            queue_size=self.config.PIPELINE_QUEUE_SIZE,
+            job_id=job_id,
+            checkpoint_seconds=self.config.INGEST_CHECKPOINT_SECONDS)
+        self._pipeline = pipeline
+        if self._lease_lost.is_set():
+            pipeline.stop(LeaseLost("batch stopped after a lost lease"), flush=False)
+        try:
+            pipeline.run(self._documents(tasks))
+        except BaseException as e:
+            self._settle(job_id, tasks, e)
+            if not isinstance(e, Exception):
+                raise
+        else:
+            self._settle(job_id, tasks)
+        finally:
+            self._pipeline = None
+            self.stats['documents'] += pipeline.stats['documents']
+            self.stats['chunks_written'] += pipeline.stats['chunks_written']
+            self.rag.query_cache.invalidate_answers()
+
+    def _settle(self, job_id: int, tasks: List[Dict], error: BaseException = None) -> None:
+        """
+        Complete a job's tasks, or after an error complete the documents the
+        job finished and give the rest back to the queue.
+        """
+        with self._lock, DBSession(self.config.DATABASE_URL) as session:
+            if error is None:
+                finished, failed = [task['id'] for task in tasks], []
+            else:
+                done = session.get_job_sources(job_id)
+                finished = [task['id'] for task in tasks if task['source'] in done]
+                failed = [task['id'] for task in tasks if task['source'] not in done]
+            completed = session.complete_tasks(self.name, finished)
+            released = session.release_tasks(self.name, failed, repr(error))
+            session.commit()
+            self._held.difference_update(finished + failed)
+        self.stats['tasks_done'] += completed
+        self.stats['tasks_retried'] += released
+        if failed:
+            print(f"Job {job_id}: {len(failed)} tasks failed, {released} given back: {error!r}")
+
+    def _documents(self, tasks: List[Dict]) -> Iterator[Tuple[str, Dict]]:
+        """(text, metadata) of each task: stored text, or text extracted from a PDF"""
+        for task in tasks:
+            if 'text' in task['payload']:
+                yield task['payload']['text'], {**(task['payload'].get('metadata') or {}), 'source': task['source']}
+        paths = [task['payload']['path'] for task in tasks if 'path' in task['payload']]
+        if paths:
+            texts = iter_pdf_texts(
+                iter(paths),
+                workers=self.config.PDF_WORKERS,
+                pages_per_shard=self.config.PDF_PAGES_PER_SHARD)
+            for file_path, text in texts:
+                yield text, pdf_metadata(file_path)